@@ -23,8 +23,6 @@ r file format.
 Let's start out with some imports to get rolling.
 """
 
-import numpy as np
-
 import pylook.calc as lc
 from pylook.cbook import get_test_data
 from pylook.io import read_binary
@@ -41,11 +39,11 @@ data, _ = read_binary(data_path)
 ##############################
 # The time column in these data files is really the sample rate in Hz. We want to turn that
 # into a delta time and cumulatively sum to get experiment elapsed time. Notice that we are
-# assigning units by multiplying them - easy! We have to take the magnitude of time for
-# `cumsum` because numpy silently drops our units. We'll fix that with a `cumsum` wrapper
-# in pylook soon.
+# assigning units by multiplying them - easy! The file labels the rate column in seconds,
+# so we take its magnitude before assigning the right units. pylook's `cumsum` gives
+# exactly the same times as `StreamingCumsum` does for files read a chunk at a time.
 
-data['Time'] = np.cumsum(1 / data['Time'].m) * units('s')
+data['Time'] = lc.cumsum(1 / data['Time'].m) * units('s')
 
 ##############################
 # Now we need to apply calibrations and units to the data - the calibrations are determined
@@ -159,11 +157,12 @@ show(p)
 ##############################
 # Looks like we had two offsets - rows 18593 to 19058 and rows 66262 to 67830.
 # Let's remove those and set the values between to the final value to that data look nice.
+# With several offsets `remove_offsets` takes them all at once and only has to go through
+# the data one time.
 
-data['Shear Displacement'] = lc.remove_offset(data['Shear Displacement'],
-                                              18593, 19058, set_between=True)
-data['Shear Displacement'] = lc.remove_offset(data['Shear Displacement'],
-                                              66262, 67830, set_between=True)
+data['Shear Displacement'] = lc.remove_offsets(data['Shear Displacement'],
+                                               [(18593, 19058), (66262, 67830)],
+                                               set_between=True)
 
 ##############################
 # For the normal displacement we assume that half of it is in each of the two layers of a
@@ -195,7 +194,7 @@ data['Friction'] = lc.friction(data['Shear Stress'], data['Normal Stress'])
 
 
 def make_runplot(data, x_var='Time', y_vars=None,
-                 tools='pan,wheel_zoom,box_zoom,reset,save,box_select,hover'):
+                 tools='pan,wheel_zoom,box_zoom,reset,save,box_select,hover', n_points=2000):
     plots = []
     for col_name in list(data):
         if col_name == x_var:
@@ -209,10 +208,13 @@ def make_runplot(data, x_var='Time', y_vars=None,
         else:
             p = figure(title=col_name, tools=tools, x_range=plots[0].x_range)
 
-        # Plot the data and set the labels
+        # Plot the data and set the labels. Sending every point to the browser is slow for
+        # long experiments, so we only send the peaks and troughs of each bucket of data,
+        # which looks the same on screen.
         p.xaxis.axis_label = str(data[x_var].units)
         p.yaxis.axis_label = str(data[col_name].units)
-        p.line(data[x_var].m, data[col_name].m)
+        x, y = lc.decimate_for_display(data[x_var], data[col_name], n_points)
+        p.line(x.m, y.m)
 
         plots.append(p)
     show(gridplot(plots, ncols=1, plot_width=600, plot_height=175))
@@ -238,3 +240,23 @@ make_runplot(data, x_var='Shear Displacement', y_vars=['Shear Stress', 'Normal S
 # minimum of installation and learning pain. Being in Python also means we can seamlessly
 # transfer these data into machine learning tools or just about any other analysis library
 # you're interested in!
+
+##############################
+# Once a reduction is worked out, the steps can be recorded in a `pylook.Pipeline`, much like
+# an r file, and replayed on other experiments. Here is the start of the reduction above.
+# Pipelines can also reduce a list of experiments in parallel with `run_many`.
+
+from pylook import Pipeline
+
+reduction = (Pipeline()
+             .scale('Vert_Load', 1.597778959e-3 * units('MPa / bit'))
+             .scale('Hor_Load.', 3.31712805707e-3 * units('MPa / bit'))
+             .rename('Vert_Load', 'Shear Stress')
+             .rename('Hor_Load.', 'Normal Stress')
+             .add('remove_offset', 'Shear Stress', 4075, 4089, set_between=True)
+             .add('zero', 'Normal Stress', 42, mode='before')
+             .add('zero', 'Shear Stress', 1518, mode='before')
+             .add('friction', ['Shear Stress', 'Normal Stress'], output='Friction'))
+reduction
+
+reduced = reduction.run(read_binary(data_path)[0])
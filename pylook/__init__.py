@@ -16,3 +16,6 @@ if sys.version_info < (3,):
 from ._version import get_version  # noqa: E402
 __version__ = get_version()
 del get_version
+from .calc.backend import get_num_threads, set_num_threads  # noqa: E402, F401
+from .experiment import Experiment  # noqa: E402, F401
+from .pipeline import Pipeline  # noqa: E402, F401
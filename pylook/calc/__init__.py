@@ -4,6 +4,28 @@
 
 """Provide calculations and data processing aids."""
 
+from . import kernels  # noqa: F401
+from . import rsf  # noqa: F401
+from .backend import *  # noqa: F403
 from .basic import *  # noqa: F403
+from .cache import *  # noqa: F403
+from .correlation import *  # noqa: F403
+from .cumulative import *  # noqa: F403
+from .detection import *  # noqa: F403
+from .display import *  # noqa: F403
+from .filtering import *  # noqa: F403
+from .indexing import *  # noqa: F403
+from .resampling import *  # noqa: F403
+from .rolling import *  # noqa: F403
 
-__all__ = basic.__all__[:]  # noqa: F405
+__all__ = backend.__all__[:]  # noqa: F405
+__all__.extend(basic.__all__)  # noqa: F405
+__all__.extend(cache.__all__)  # noqa: F405
+__all__.extend(correlation.__all__)  # noqa: F405
+__all__.extend(cumulative.__all__)  # noqa: F405
+__all__.extend(detection.__all__)  # noqa: F405
+__all__.extend(display.__all__)  # noqa: F405
+__all__.extend(filtering.__all__)  # noqa: F405
+__all__.extend(indexing.__all__)  # noqa: F405
+__all__.extend(resampling.__all__)  # noqa: F405
+__all__.extend(rolling.__all__)  # noqa: F405
@@ -0,0 +1,251 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""
+Compiled versions of the loop heavy kernels, used by the numba backend.
+
+Every function here mirrors a NumPy reference implementation marked with
+`pylook.calc.backend.dispatch` and takes the same arguments.
+"""
+
+import numba
+import numpy as np
+
+from .rsf import _A, _E
+
+
+@numba.njit(cache=True)
+def _rsf_derivatives(y, load_velocity, a, b, dc, k, mu0, v0, slip_law, out):
+    """Calculate the time derivatives of friction and state into out."""
+    n_models, n_columns = y.shape
+    for m in range(n_models):
+        total = 0.
+        for j in range(1, n_columns):
+            total += b[m, j - 1] * y[m, j]
+        velocity = v0 * np.exp((y[m, 0] - mu0[m] - total) / a[m])
+        out[m, 0] = k[m] * (load_velocity - velocity)
+        for j in range(1, n_columns):
+            if slip_law:
+                out[m, j] = -velocity / dc[m, j - 1] * (y[m, j] + np.log(velocity / v0))
+            else:
+                out[m, j] = (v0 * np.exp(-y[m, j]) - velocity) / dc[m, j - 1]
+
+
+@numba.njit(cache=True)
+def _rsf_integrate(time, load_velocity, a, b, dc, k, mu0, v0, slip_law, rtol, atol,
+                   max_steps):
+    """Integrate a batch of spring-slider models with shared Dormand-Prince steps."""
+    n = len(time)
+    n_models = len(a)
+    n_columns = 1 + b.shape[1]
+    friction = np.empty((n_models, n))
+
+    y = np.empty((n_models, n_columns))
+    f = np.empty((n_models, n_columns))
+    y_stage = np.empty((n_models, n_columns))
+    error = np.empty((n_models, n_columns))
+    stages = np.empty((7, n_models, n_columns))
+
+    for m in range(n_models):
+        total_b = 0.
+        for j in range(1, n_columns):
+            y[m, j] = np.log(v0 / load_velocity[0])
+            total_b += b[m, j - 1]
+        y[m, 0] = mu0[m] + (a[m] - total_b) * np.log(load_velocity[0] / v0)
+        friction[m, 0] = y[m, 0]
+
+    steps = 0
+    start = 0
+    while start < n - 1:
+        # Each stretch of constant load point velocity is integrated separately
+        end = start + 1
+        while end < n - 1 and load_velocity[end] == load_velocity[start]:
+            end += 1
+        velocity = load_velocity[start]
+        t = time[start]
+        _rsf_derivatives(y, velocity, a, b, dc, k, mu0, v0, slip_law, f)
+
+        d0 = 0.
+        d1 = 0.
+        for m in range(n_models):
+            for j in range(n_columns):
+                scale = atol + rtol * abs(y[m, j])
+                d0 += (y[m, j] / scale) ** 2
+                d1 += (f[m, j] / scale) ** 2
+        d0 = np.sqrt(d0 / y.size)
+        d1 = np.sqrt(d1 / y.size)
+        h = 0.01 * d0 / d1 if (d0 > 1e-5 and d1 > 1e-5) else 1e-6
+        h = min(h, time[end] - t)
+        next_out = start + 1
+
+        while next_out <= end:
+            steps += 1
+            if steps > max_steps:
+                raise RuntimeError('Rate and state integration exceeded the maximum '
+                                   'number of steps.')
+            h = min(h, time[end] - t)
+
+            # Dormand-Prince stages, the last is at the new state (first same as last)
+            stages[0] = f
+            for i in range(1, 7):
+                for m in range(n_models):
+                    for j in range(n_columns):
+                        increment = 0.
+                        for s in range(i):
+                            increment += _A[i, s] * stages[s, m, j]
+                        y_stage[m, j] = y[m, j] + h * increment
+                _rsf_derivatives(y_stage, velocity, a, b, dc, k, mu0, v0, slip_law,
+                                 stages[i])
+
+            norm = 0.
+            for m in range(n_models):
+                model_norm = 0.
+                for j in range(n_columns):
+                    estimate = 0.
+                    for s in range(7):
+                        estimate += _E[s] * stages[s, m, j]
+                    error[m, j] = h * estimate
+                    scale = atol + rtol * max(abs(y[m, j]), abs(y_stage[m, j]))
+                    model_norm += (error[m, j] / scale) ** 2
+                norm = max(norm, model_norm / n_columns)
+            norm = np.sqrt(norm)
+
+            if not np.isfinite(norm) or norm > 1:
+                h *= 0.2 if not np.isfinite(norm) else max(0.2, 0.9 * norm ** -0.2)
+                if t + h == t:
+                    raise RuntimeError('Rate and state integration step size underflow.')
+                continue
+
+            # Cubic Hermite interpolation of friction at the output times in this step
+            t_new = time[end] if h == time[end] - t else t + h
+            last_out = min(np.searchsorted(time, t_new, side='right') - 1, end)
+            for out in range(next_out, last_out + 1):
+                theta = (time[out] - t) / h
+                h00 = (1 + 2 * theta) * (1 - theta) ** 2
+                h10 = theta * (1 - theta) ** 2
+                h01 = theta ** 2 * (3 - 2 * theta)
+                h11 = theta ** 2 * (theta - 1)
+                for m in range(n_models):
+                    friction[m, out] = (y[m, 0] * h00 + h * f[m, 0] * h10
+                                        + y_stage[m, 0] * h01 + h * stages[6, m, 0] * h11)
+            next_out = max(next_out, last_out + 1)
+
+            t = t_new
+            y[:] = y_stage
+            f[:] = stages[6]
+            h *= min(5, 0.9 * norm ** -0.2) if norm > 0 else 5
+
+        start = end
+
+    return friction
+
+
+def rsf_integrate(time, load_velocity, a, b, dc, k, mu0, v0, law='aging', rtol=1e-8,
+                  atol=1e-10, max_steps=1000000):
+    """Integrate a batch of spring-slider models. See `pylook.calc.rsf._integrate`."""
+    if law not in ('aging', 'slip'):
+        raise ValueError(f'Unknown state evolution law {law}. Valid laws are aging and slip.')
+
+    def contiguous(values):
+        return np.ascontiguousarray(values, dtype=float)
+
+    return _rsf_integrate(contiguous(time), contiguous(load_velocity), contiguous(a),
+                          contiguous(b), contiguous(dc), contiguous(k), contiguous(mu0),
+                          float(v0), law == 'slip', float(rtol), float(atol), max_steps)
+
+
+def threshold_groups(values, threshold, max_gap):
+    """Group the indices of values above a threshold. See `pylook.calc.detection`."""
+    return _threshold_groups(np.ascontiguousarray(values, dtype=float), float(threshold),
+                             int(max_gap))
+
+
+@numba.njit(cache=True)
+def _threshold_groups(values, threshold, max_gap):
+    """Group the indices of values above a threshold in two passes over the values."""
+    # Count first so the result is allocated once at its final size
+    n_groups = 0
+    last = -max_gap - 2
+    for i in range(len(values)):
+        if values[i] > threshold:
+            if i - last > max_gap + 1:
+                n_groups += 1
+            last = i
+
+    groups = np.empty((n_groups, 2), dtype=np.intp)
+    group = -1
+    last = -max_gap - 2
+    for i in range(len(values)):
+        if values[i] > threshold:
+            if i - last > max_gap + 1:
+                group += 1
+                groups[group, 0] = i
+            groups[group, 1] = i + 1
+            last = i
+    return groups
+
+
+def cumsum_scan(out):
+    """Accumulate an array in place. See `pylook.calc.kernels.cumsum`."""
+    _cumsum_scan(out)
+    return out
+
+
+@numba.njit(cache=True)
+def _cumsum_scan(out):
+    """Accumulate an array in place, one value after another."""
+    for i in range(1, len(out)):
+        out[i] += out[i - 1]
+
+
+def trapezoid_integral(y, x, step, carry):
+    """Integrate with the trapezoid rule. See `pylook.calc.cumulative`."""
+    y = np.ascontiguousarray(y, dtype=float)
+    if x is None:
+        return _trapezoid_even(y, 0.5 * float(step), float(carry))
+    return _trapezoid_uneven(y, np.ascontiguousarray(x, dtype=float), float(carry))
+
+
+@numba.njit(cache=True)
+def _trapezoid_even(y, half_step, total):
+    """Accumulate the areas of evenly spaced trapezoids in one pass."""
+    integral = np.empty(max(len(y) - 1, 0))
+    for i in range(len(integral)):
+        total += (y[i + 1] + y[i]) * half_step
+        integral[i] = total
+    return integral
+
+
+@numba.njit(cache=True)
+def _trapezoid_uneven(y, x, total):
+    """Accumulate the areas of trapezoids between sample points in one pass."""
+    integral = np.empty(max(len(y) - 1, 0))
+    for i in range(len(integral)):
+        total += (y[i + 1] + y[i]) * (0.5 * (x[i + 1] - x[i]))
+        integral[i] = total
+    return integral
+
+
+def running_mean(values, total, count):
+    """Average values from a running total. See `pylook.calc.cumulative`."""
+    return _running_mean(np.ascontiguousarray(values, dtype=float), float(total), count)
+
+
+@numba.njit(cache=True)
+def _running_mean(values, total, count):
+    """Accumulate and average values in one pass."""
+    mean = np.empty(len(values))
+    for i in range(len(values)):
+        total += values[i]
+        mean[i] = total / (count + i + 1)
+    return mean, total
+
+
+IMPLEMENTATIONS = {
+    'rsf.integrate': rsf_integrate,
+    'detection.threshold_groups': threshold_groups,
+    'kernels.cumsum': cumsum_scan,
+    'cumulative.trapezoid': trapezoid_integral,
+    'cumulative.running_mean': running_mean,
+}
@@ -0,0 +1,199 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""
+Select the implementation used for loop heavy calculations and how many threads they use.
+
+A few calculations, such as integrating rate and state friction models, grouping
+threshold crossings into events, and the running totals of the cumulative kernels, are
+naturally written as loops that NumPy can only express with many temporary arrays or
+Python level iteration. Each of these has a NumPy reference implementation and, when
+`numba` is installed, a compiled version. The compiled versions give the same results, to
+rounding, and are used after calling ``set_backend('numba')``.
+
+Elementwise and scan kernels on long records can also be split into chunks that are
+processed at the same time on a pool of threads, after calling ``set_num_threads``. NumPy
+releases the global interpreter lock while working on arrays, so the chunks run in
+parallel.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import importlib
+import threading
+
+from ..package_tools import Exporter
+
+exporter = Exporter(globals())
+
+_BACKENDS = {'numpy': None, 'numba': '._numba'}
+_state = {'name': 'numpy', 'implementations': {}, 'threads': 1, 'executor': None}
+_local = threading.local()
+
+# Chunks smaller than this are not worth handing to another thread
+MIN_CHUNK_ROWS = 2 ** 16
+
+
+@exporter.export
+def set_backend(name):
+    """
+    Choose the implementation of loop heavy calculations.
+
+    Parameters
+    ----------
+    name : str
+        'numpy' (default) for the pure NumPy implementations, or 'numba' for versions
+        compiled with numba, which must be installed.
+
+    Returns
+    -------
+    previous : str
+        Name of the backend in use before the call, so it can be restored.
+    """
+    if name not in _BACKENDS:
+        raise ValueError(f'Unknown backend {name}. Valid backends are numpy and numba.')
+
+    implementations = {}
+    if _BACKENDS[name] is not None:
+        try:
+            module = importlib.import_module(_BACKENDS[name], __package__)
+        except ImportError as e:
+            raise ImportError(f'The {name} backend requires {name} to be installed.') from e
+        implementations = module.IMPLEMENTATIONS
+
+    previous = _state['name']
+    _state['name'] = name
+    _state['implementations'] = implementations
+    return previous
+
+
+@exporter.export
+def get_backend():
+    """
+    Get the name of the implementation used for loop heavy calculations.
+
+    Returns
+    -------
+    name : str
+        'numpy' or 'numba'.
+    """
+    return _state['name']
+
+
+@exporter.export
+def set_num_threads(n):
+    """
+    Choose how many threads process long records.
+
+    Parameters
+    ----------
+    n : int
+        Number of threads, such as ``os.cpu_count()``. With 1 (the default) everything runs
+        in the calling thread.
+
+    Returns
+    -------
+    previous : int
+        Number of threads in use before the call, so it can be restored.
+
+    Notes
+    -----
+    Records of fewer than ``2 * MIN_CHUNK_ROWS`` rows are always processed in one piece.
+    Cumulative sums split across threads are added up in a different order, so they can
+    differ from the single threaded sums in the last bits.
+    """
+    n = int(n)
+    if n < 1:
+        raise ValueError('The number of threads must be at least 1.')
+
+    previous = _state['threads']
+    if n != previous and _state['executor'] is not None:
+        _state['executor'].shutdown()
+        _state['executor'] = None
+    _state['threads'] = n
+    return previous
+
+
+@exporter.export
+def get_num_threads():
+    """
+    Get how many threads process long records.
+
+    Returns
+    -------
+    n : int
+        Number of threads.
+    """
+    return _state['threads']
+
+
+def row_chunks(n_rows):
+    """
+    Divide rows among the threads.
+
+    Parameters
+    ----------
+    n_rows : int
+        Number of rows to process.
+
+    Returns
+    -------
+    chunks : list of slice or None
+        One slice of rows per chunk, or None when the rows should be processed in one
+        piece: with one thread, for short records, or when already on a pool thread.
+    """
+    if (_state['threads'] == 1 or n_rows < 2 * MIN_CHUNK_ROWS
+            or getattr(_local, 'pool_thread', False)):
+        return None
+    n_chunks = min(_state['threads'], n_rows // MIN_CHUNK_ROWS)
+    edges = [i * n_rows // n_chunks for i in range(n_chunks + 1)]
+    return [slice(start, stop) for start, stop in zip(edges[:-1], edges[1:])]
+
+
+def run_chunks(func, chunks):
+    """
+    Call a function on each chunk on the thread pool.
+
+    Parameters
+    ----------
+    func : callable
+        Function taking a chunk.
+    chunks : iterable
+        Chunks, such as the slices from `row_chunks`.
+
+    Returns
+    -------
+    results : list
+        Result of each call, in order.
+    """
+    if _state['executor'] is None:
+        _state['executor'] = ThreadPoolExecutor(_state['threads'],
+                                                initializer=_mark_pool_thread)
+    return list(_state['executor'].map(func, chunks))
+
+
+def _mark_pool_thread():
+    """Mark a pool thread so work it runs is not divided again, which could deadlock."""
+    _local.pool_thread = True
+
+
+def dispatch(name):
+    """
+    Mark a function as the reference implementation of a kernel with a compiled version.
+
+    Parameters
+    ----------
+    name : str
+        Name the compiled implementation is registered under.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            implementation = _state['implementations'].get(name, func)
+            return implementation(*args, **kwargs)
+
+        wrapper.reference = func
+        return wrapper
+
+    return decorator
@@ -4,138 +4,189 @@
 
 """Contains basic calculations needed when processing data."""
 
-import numpy as np
+import functools
 
+from . import kernels
 from ..package_tools import Exporter
+from ..units import conversion_factor, DimensionalityError, magnitude_in, units
 
 exporter = Exporter(globals())
 
 
 @exporter.export
-def zero(data, zero_idx, window=0, value=0, mode='at'):
+def zero(data, zero_idx, window=0, value=0, mode='at', out=None, inplace=False):
     """
     Zero an array at a given row to zero or another value.
 
     Parameters
     ----------
     data : `pint.Quantity`
-        Data to be operated upon.
-    zero_idx : int
-        Index of value at which we wish to zero the array
-    window : int
+        Data to be operated upon. A 2D array is treated as a stack of records, such as
+        the same column from many runs, one per row, which are all zeroed in one call.
+    zero_idx : int or array-like
+        Index of value at which we wish to zero the array. One per record for 2D `data`.
+    window : int or array-like
         Number of data points either side of the zero index to be averaged to get the
-        zero value.
+        zero value. May be one per record for 2D `data`.
     value : `pint.Quantity`
-        Numeric value to which we set the "zero" point.
+        Numeric value to which we set the "zero" point. May be one per record for 2D
+        `data`.
     mode : string
         How the zero operation should be performed. Valid modes at "at" in which only the
         zero value is subtracted from all data, "before" in which all data before that index
         are also set to the zero value, or "after" in which all data after the given index
         are also set to the zero value.
+    out : `pint.Quantity` or `numpy.ndarray`, optional
+        Array in which to place the result. A quantity receives the result converted to its
+        own units and is returned. May be `data` itself.
+    inplace : bool
+        Write the result into the magnitude of `data` rather than a new array. Default
+        `False`.
 
     Returns
     -------
     data : `pint.Quantity`
         Data with zero applied.
+
+    Notes
+    -----
+    The zero value is determined before any output is written, so `out` and `inplace`
+    never change the result.
     """
-    # First we get the value we are going to use as zero - a single value or a mean
-    if window:
-        zero_value = np.mean(data[zero_idx - window: zero_idx + window + 1])
-    else:
-        zero_value = data[zero_idx]
+    value = magnitude_in(value, data.units)
+    buffer, out_units, factor = _resolve_out(data, out, inplace, data.units)
+    result = kernels.zero(data.magnitude, zero_idx, window=window, value=value, mode=mode,
+                          out=buffer)
+    return _wrap_result(result, out, out_units, factor)
 
-    # Zero the data to that value
-    data = data - zero_value
 
-    # If there is a value we want to set the data to, add it
-    if value:
-        data = data + value
+@exporter.export
+def remove_offset(data, start_idx, end_idx, set_between=False, out=None, inplace=False):
+    """
+    Remove offsets in the data.
 
-    # If the mode is before/after we need to zero out those values
-    if mode == 'before':
-        data[0:zero_idx] = data[zero_idx]
+    Parameters
+    ----------
+    data : `pint.Quantity`
+        Date to be operated upon. A 2D array is treated as a stack of records, one per row,
+        which all have their offset removed in one call.
+    start_idx : int or array-like
+        Index that marks the start of the offset. May be one per record for 2D `data`.
+    end_idx : int or array-like
+        Index that marks the end of the offset. May be one per record for 2D `data`.
+    set_between : bool or array-like
+        Set the data after the start point up to the end point to have the
+        value of the start point. May be one per record for 2D `data`. Default is `False`.
+    out : `pint.Quantity` or `numpy.ndarray`, optional
+        Array in which to place the result. A quantity receives the result converted to its
+        own units and is returned. May be `data` itself.
+    inplace : bool
+        Write the result into the magnitude of `data` rather than a new array. Default
+        `False`.
 
-    if mode == 'after':
-        data[zero_idx:] = data[zero_idx]
+    Returns
+    -------
+    data : `pint.Quantity`
+        Data with offset applied.
 
-    return data
+    Notes
+    -----
+    `data` is only modified when `inplace` is `True` or it is passed as `out`. In place,
+    only the data from the start of the offset onward is written.
+    """
+    buffer, out_units, factor = _resolve_out(data, out, inplace, data.units)
+    result = kernels.remove_offset(data.magnitude, start_idx, end_idx,
+                                   set_between=set_between, out=buffer)
+    return _wrap_result(result, out, out_units, factor)
 
 
 @exporter.export
-def remove_offset(data, start_idx, end_idx, set_between=False):
+def remove_offsets(data, intervals, set_between=False, out=None, inplace=False):
     """
-    Remove offsets in the data.
+    Remove several offsets in the data in a single pass.
+
+    Equivalent to calling `remove_offset` once per interval, but every row is only
+    processed once no matter how many offsets there are.
 
     Parameters
     ----------
     data : `pint.Quantity`
         Date to be operated upon.
-    start_idx : int
-        Index that marks the start of the offset.
-    end_idx : int
-        Index that marks the end of the offset.
-    set_between : int
-        Set the data after the start point up to the end point to have the
-        value of the start point. Default is `False`.
+    intervals : array-like
+        Sequence of (start index, end index) pairs, one per offset. Intervals may be given
+        in any order, but must not overlap.
+    set_between : bool or sequence of bool
+        Set the data after the start point up to the end point of each offset to have the
+        value of the start point. A single value applies to every interval. Default is
+        `False`.
+    out : `pint.Quantity` or `numpy.ndarray`, optional
+        Array in which to place the result. A quantity receives the result converted to its
+        own units and is returned. May be `data` itself.
+    inplace : bool
+        Write the result into the magnitude of `data` rather than a new array. Default
+        `False`.
 
     Returns
     -------
     data : `pint.Quantity`
-        Data with offset applied.
-    """
-    # Set the data after the offset to the data minus the offset
-    offset = data[end_idx] - data[start_idx]
+        Data with offsets removed.
 
-    # Set the intemediate data (during the offset) to be the first
-    # value if so desired.
-    if set_between:
-        data[start_idx: end_idx] = data[start_idx]
-
-    data[end_idx:] = data[end_idx:] - offset
-    return data
+    See Also
+    --------
+    remove_offset
+    """
+    buffer, out_units, factor = _resolve_out(data, out, inplace, data.units)
+    result = kernels.remove_offsets(data.magnitude, intervals, set_between=set_between,
+                                    out=buffer)
+    return _wrap_result(result, out, out_units, factor)
 
 
 @exporter.export
-def elastic_correction(load, displacement, coeffs):
+def elastic_correction(load, displacement, coeffs, out=None, inplace=False):
     """
     Perform an elastic correction on a single axis of data.
 
     Parameters
     ----------
     load : `pint.Quantity`
-        Load/Force data
+        Load/Force data. A 2D array is treated as a stack of records, one per row.
     displacement : `pint.Quantity`
-        Displacement data
+        Displacement data, with the same shape as `load`.
     coeffs : list
-        list of coefficients from highest power to lowest.
+        list of coefficients from highest power to lowest. For 2D data each coefficient may
+        be an array with one value per record.
+    out : `pint.Quantity` or `numpy.ndarray`, optional
+        Array in which to place the result. A quantity receives the result converted to its
+        own units and is returned. May be `displacement` itself.
+    inplace : bool
+        Write the result into the magnitude of `displacement` rather than a new array. Default
+        `False`.
 
     Returns
     -------
     displacement : `pint.Quantity`
         Displacement with the elastic correction applied
-    """
-    # store in incoming displacement unit
-    displacement_units_incoming = displacement.units
 
-    # convert everythign to base units, then drop them
-    load = load.to_base_units().m
-    displacement = displacement.to_base_units()
-    displacement_base_units = displacement.units
-    displacement = displacement.m
-    coeffs = [c.to_base_units().m for c in coeffs]
-
-    # Find the elastic correction
-    elastic_correction = np.polyval(coeffs, load)
-
-    # Determine the final elastic corrected displacement and attach the base units
-    elastic_corrected_displacement = ((displacement - elastic_correction)
-                                      * displacement_base_units)
+    Notes
+    -----
+    Writing the result into `load` or `displacement` (through `out` or `inplace`) needs
+    one scratch array for the polynomial. Any other `out` is used for the polynomial
+    directly and no temporary arrays are created.
+    """
+    # Rather than converting the (large) data arrays, convert each (scalar) coefficient
+    # into displacement / load ** power so the polynomial works on the raw magnitudes.
+    power = len(coeffs) - 1
+    coeffs = [_scale_coefficient(c, load.units, displacement.units, power - i)
+              for i, c in enumerate(coeffs)]
 
-    return elastic_corrected_displacement.to(displacement_units_incoming)
+    buffer, out_units, factor = _resolve_out(displacement, out, inplace, displacement.units)
+    result = kernels.elastic_correction(load.magnitude, displacement.magnitude, coeffs,
+                                        out=buffer)
+    return _wrap_result(result, out, out_units, factor)
 
 
 @exporter.export
-def friction(shear_component, normal_component):
+def friction(shear_component, normal_component, out=None, inplace=False):
     """
     Calculate the simple friction.
 
@@ -145,6 +196,12 @@ def friction(shear_component, normal_component):
         Shear component of load/force/stress
     normal_component : `pint.Quantity`
         Normal component of load/force/stress
+    out : `pint.Quantity` or `numpy.ndarray`, optional
+        Array in which to place the result. A quantity receives the result converted to its
+        own units and is returned. May be either component itself.
+    inplace : bool
+        Write the result into the magnitude of `shear_component` rather than a new array.
+        Default `False`.
 
     Returns
     -------
@@ -154,8 +211,83 @@ def friction(shear_component, normal_component):
     Notes
     -----
     Modifies the normal load/force/ stress to have a minimum value of 1e-16 to avoid any divide
-    by zero warnings or negative friction values due to the normal component.
+    by zero warnings or negative friction values due to the normal component. The normal
+    component passed in is never changed.
+
+    With `inplace` the magnitude of `shear_component` holds friction values afterwards,
+    so only the returned quantity should be used from then on.
+    """
+    # Friction is dimensionless if the components are compatible, otherwise we carry the
+    # ratio of the units along.
+    try:
+        scale = conversion_factor(shear_component.units, normal_component.units)
+        result_units = units.dimensionless
+    except DimensionalityError:
+        scale = 1
+        result_units = shear_component.units / normal_component.units
+
+    buffer, out_units, factor = _resolve_out(shear_component, out, inplace, result_units)
+    result = kernels.friction(shear_component.magnitude, normal_component.magnitude,
+                              scale=scale, out=buffer)
+    return _wrap_result(result, out, out_units, factor)
+
+
+def _resolve_out(data, out, inplace, result_units):
     """
-    # Clip the normal component to always be slightly above zero
-    normal_component = np.clip(normal_component, 1e-16 * normal_component.units, None)
-    return shear_component / normal_component
+    Work out where a kernel should write its result.
+
+    Parameters
+    ----------
+    data : `pint.Quantity`
+        The input whose magnitude is reused when working in place.
+    out : `pint.Quantity` or `numpy.ndarray` or None
+        User given output array.
+    inplace : bool
+        If the result should be written into `data`.
+    result_units : `pint.Unit`
+        Units the kernel produces its result in.
+
+    Returns
+    -------
+    buffer : `numpy.ndarray` or None
+        Array for the kernel to write into, None to let the kernel allocate one.
+    out_units : `pint.Unit`
+        Units of the returned result.
+    factor : float
+        Factor to scale the kernel result by to get it into `out_units`.
+    """
+    if inplace and out is not None:
+        raise ValueError('Only one of out and inplace may be given.')
+
+    if inplace:
+        return data.magnitude, result_units, 1
+
+    if hasattr(out, 'units'):
+        # Resolved before the kernel runs so incompatible units fail before any writes
+        return out.magnitude, out.units, conversion_factor(result_units, out.units)
+
+    return out, result_units, 1
+
+
+def _wrap_result(result, out, out_units, factor):
+    """Scale a kernel result into its output units and attach them."""
+    if factor != 1:
+        result *= factor
+
+    if hasattr(out, 'units'):
+        return out
+    return units.Quantity(result, out_units)
+
+
+@functools.lru_cache(maxsize=128)
+def _coefficient_factor(coeff_units, load_units, displacement_units, power):
+    """Get the factor converting a polynomial coefficient to displacement / load ** power."""
+    return conversion_factor(coeff_units, displacement_units / load_units ** power)
+
+
+def _scale_coefficient(coeff, load_units, displacement_units, power):
+    """Get the magnitude of a polynomial coefficient in displacement / load ** power."""
+    if not hasattr(coeff, 'units'):
+        return coeff
+    return coeff.magnitude * _coefficient_factor(coeff.units, load_units,
+                                                 displacement_units, power)
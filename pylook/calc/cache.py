@@ -0,0 +1,307 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""
+Keep the results of calculations on disk so unchanged reductions are not recomputed.
+
+Results are stored under a hash of everything that determines them: the function and its
+code, the values and units of its arguments, and the version of pylook. Arrays are saved as
+``.npy`` files and memory mapped when they are used again, so re-running an unchanged
+step costs only hashing the inputs and opening the files.
+"""
+
+from collections.abc import Mapping
+import functools
+import hashlib
+import inspect
+import json
+import numbers
+import os
+import tempfile
+import types
+
+import numpy as np
+import pooch
+
+from .. import __version__
+from ..package_tools import Exporter
+from ..units import units
+
+exporter = Exporter(globals())
+
+DEFAULT_DIRECTORY = os.path.join(pooch.os_cache('pylook'), 'results')
+
+
+@exporter.export
+def memoize(func=None, directory=None, max_bytes=2 ** 30):
+    """
+    Keep the results of a calculation on disk and reuse them for the same arguments.
+
+    Can be used as a decorator, with or without arguments, or called on a function, such
+    as ``zero = memoize(pylook.calc.zero)``.
+
+    Parameters
+    ----------
+    func : callable
+        Function to cache. Its results must be arrays, quantities, numbers, or tuples of
+        these; other results are returned without being cached.
+    directory : str, optional
+        Directory to keep results in, which may be shared between processes and users.
+        Defaults to a ``results`` directory in the pylook cache directory.
+    max_bytes : int
+        Once the results take up more than this many bytes, the least recently used are
+        removed. Default 1 GiB.
+
+    Returns
+    -------
+    cached : callable
+        Function that takes the same arguments as `func`.
+
+    Notes
+    -----
+    Results are found by the name of the function together with its compiled code and
+    the values it closes over when it is memoized, so two lambdas or closures with the
+    same name do not share results. Changes to other functions or globals it calls are
+    not seen.
+
+    Cached arrays are memory mapped copy-on-write, so changing them in memory does not
+    change the cache. Calls that write into their arguments, with ``out`` or
+    ``inplace``, are never cached.
+
+    See Also
+    --------
+    clear_cache
+    """
+    if func is None:
+        return functools.partial(memoize, directory=directory, max_bytes=max_bytes)
+
+    directory = os.fspath(directory or DEFAULT_DIRECTORY)
+    signature = _signature(func)
+    function_key = _hash_function(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if signature is None:
+            return func(*args, **kwargs)
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        if (bound.arguments.get('out') is not None
+                or bound.arguments.get('inplace', False) is True):
+            return func(*args, **kwargs)
+
+        key = _hash_call(function_key, bound.arguments)
+        result = _load(directory, key)
+        if result is None:
+            result = func(*args, **kwargs)
+            _store(directory, key, result, max_bytes)
+        return result
+
+    wrapper.uncached = func
+    return wrapper
+
+
+@exporter.export
+def clear_cache(directory=None):
+    """
+    Remove every result kept by `memoize`.
+
+    Parameters
+    ----------
+    directory : str, optional
+        Directory the results are kept in. Defaults to the default of `memoize`.
+    """
+    directory = os.fspath(directory or DEFAULT_DIRECTORY)
+    for entry in _entries(directory):
+        _remove(directory, entry)
+
+
+def _signature(func):
+    """Get the signature of a function, or None if it cannot be found."""
+    try:
+        return inspect.signature(func)
+    except (TypeError, ValueError):
+        return None
+
+
+def _hash_function(func):
+    """Hash the name and code of a function, the values it closes over, and the version."""
+    digest = hashlib.blake2b(digest_size=20)
+    _update(digest, (__version__, _name(func)))
+    _update_code(digest, func)
+    for cell in getattr(func, '__closure__', None) or ():
+        try:
+            _update(digest, cell.cell_contents)
+        except ValueError:
+            # Cell of a variable not yet assigned
+            digest.update(b'empty cell')
+    return digest.hexdigest()
+
+
+def _hash_call(function_key, arguments):
+    """Hash the function and its arguments."""
+    digest = hashlib.blake2b(digest_size=20)
+    _update(digest, function_key)
+    for name, value in arguments.items():
+        _update(digest, name)
+        _update(digest, value)
+    return digest.hexdigest()
+
+
+def _name(func):
+    """Get the full name of a function, falling back to its representation."""
+    try:
+        return f'{func.__module__}.{func.__qualname__}'
+    except AttributeError:
+        return repr(func)
+
+
+def _update(digest, value):
+    """Feed a value to a hash, tagging each part with its type so they cannot collide."""
+    if hasattr(value, 'magnitude') and hasattr(value, 'units'):
+        digest.update(b'quantity')
+        _update(digest, str(value.units))
+        _update(digest, value.magnitude)
+    elif isinstance(value, (np.ndarray, np.generic)) and value.dtype != object:
+        value = np.ascontiguousarray(value)
+        digest.update(f'array{value.dtype.str}{value.shape}'.encode())
+        digest.update(value.view(np.uint8).reshape(-1))
+    elif isinstance(value, (str, bytes, numbers.Number, type(None))):
+        digest.update(f'{type(value).__name__}{value!r}'.encode())
+    elif isinstance(value, Mapping):
+        digest.update(f'mapping{len(value)}'.encode())
+        for key, item in value.items():
+            _update(digest, key)
+            _update(digest, item)
+    elif isinstance(value, (list, tuple)):
+        digest.update(f'sequence{len(value)}'.encode())
+        for item in value:
+            _update(digest, item)
+    elif callable(value):
+        digest.update(f'callable{_name(value)}'.encode())
+        _update_code(digest, value)
+    else:
+        digest.update(f'{type(value).__name__}{value!r}'.encode())
+
+
+def _update_code(digest, value):
+    """Feed the compiled code of a function, if it has any, to a hash."""
+    code = value if isinstance(value, types.CodeType) else getattr(value, '__code__', None)
+    if not isinstance(code, types.CodeType):
+        return
+    digest.update(b'code')
+    digest.update(code.co_code)
+    _update(digest, code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _update_code(digest, const)
+        elif isinstance(const, frozenset):
+            # Set order changes with string hashing between processes
+            _update(digest, sorted(repr(item) for item in const))
+        else:
+            _update(digest, const)
+
+
+def _load(directory, key):
+    """Get a cached result, or None if there is none."""
+    index_path = os.path.join(directory, key + '.json')
+    try:
+        with open(index_path) as index_file:
+            index = json.load(index_file)
+        items = [np.load(os.path.join(directory, f'{key}-{i}.npy'), mmap_mode='c')
+                 for i in range(len(index['items']))]
+        os.utime(index_path)
+    except (OSError, ValueError, KeyError):
+        # Missing, still being written, or removed by another process
+        return None
+
+    values = []
+    for array, item in zip(items, index['items']):
+        value = array[()] if item['scalar'] else array
+        values.append(value if item['units'] is None else units.Quantity(value, item['units']))
+    return tuple(values) if index['tuple'] else values[0]
+
+
+def _store(directory, key, result, max_bytes):
+    """Save a result, if it can be saved, then remove results beyond the size limit."""
+    values = result if isinstance(result, tuple) else (result,)
+    items = []
+    arrays = []
+    for value in values:
+        magnitude = getattr(value, 'magnitude', value)
+        if not isinstance(magnitude, (np.ndarray, np.generic, numbers.Number)):
+            return
+        array = np.asarray(magnitude)
+        if array.dtype == object:
+            return
+        arrays.append(array)
+        items.append({'units': str(value.units) if hasattr(value, 'units') else None,
+                      'scalar': not isinstance(magnitude, np.ndarray)})
+
+    os.makedirs(directory, exist_ok=True)
+    for i, array in enumerate(arrays):
+        _write_atomic(directory, f'{key}-{i}.npy', lambda f, a=array: np.save(f, a))
+    # The index is written last, so a result is only found once all of its arrays exist
+    index = {'items': items, 'tuple': isinstance(result, tuple)}
+    _write_atomic(directory, key + '.json', lambda f: f.write(json.dumps(index).encode()))
+    _evict(directory, max_bytes)
+
+
+def _write_atomic(directory, name, write):
+    """Write a file under a temporary name and move it into place."""
+    fd, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(temporary, os.path.join(directory, name))
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def _entries(directory):
+    """Find the cached results, with the time each was last used and their size."""
+    entries = {}
+    try:
+        files = list(os.scandir(directory))
+    except FileNotFoundError:
+        return {}
+    for file in files:
+        if file.name.endswith('.json'):
+            key = file.name[:-5]
+        elif file.name.endswith('.npy'):
+            key = file.name.rsplit('-', 1)[0]
+        else:
+            continue
+        try:
+            stat = file.stat()
+        except FileNotFoundError:
+            continue
+        used, size = entries.get(key, (0, 0))
+        if file.name.endswith('.json'):
+            used = stat.st_mtime
+        entries[key] = (used, size + stat.st_size)
+    return entries
+
+
+def _evict(directory, max_bytes):
+    """Remove the least recently used results until the rest fit in max_bytes."""
+    entries = _entries(directory)
+    total = sum(size for _, size in entries.values())
+    for key, (_, size) in sorted(entries.items(), key=lambda entry: entry[1][0]):
+        if total <= max_bytes:
+            break
+        _remove(directory, key)
+        total -= size
+
+
+def _remove(directory, key):
+    """Remove a cached result, index first so it is no longer found."""
+    names = [key + '.json'] + [name for name in os.listdir(directory)
+                               if name.startswith(key + '-') and name.endswith('.npy')]
+    for name in names:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            # Already removed, or still memory mapped on platforms that prevent removal
+            pass
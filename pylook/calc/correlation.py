@@ -0,0 +1,145 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Contains tools to line up records that were recorded with different clocks."""
+
+import numpy as np
+
+from ..package_tools import Exporter
+
+exporter = Exporter(globals())
+
+
+@exporter.export
+def estimate_lag(a, b, max_lag, decimation=1):
+    """
+    Estimate how many samples one record lags another with FFT cross-correlation.
+
+    Parameters
+    ----------
+    a, b : `pint.Quantity` or array-like
+        Records sampled at the same rate, such as a load column and an acoustic emission
+        count rate resampled onto the same time grid with `resample`.
+    max_lag : int
+        Largest lag, in samples, to search in either direction.
+    decimation : int
+        When larger than 1, first find the lag roughly from block averages of this many
+        samples, then refine it at full resolution close to that lag. Much faster for long
+        records, but features shorter than the blocks are smoothed out of the rough search.
+        Default 1.
+
+    Returns
+    -------
+    lag : float
+        Lag of `b` relative to `a` in samples, refined to a fraction of a sample, so that
+        ``b[i + lag]`` best matches ``a[i]``. Positive when features in `b` come later
+        than in `a`.
+
+    Notes
+    -----
+    The cross-correlation of all lags is found at once with FFTs in O(n log n). With
+    `decimation`, only the lags within ``2 * decimation`` samples of the rough lag are
+    refined, by FFTs of short blocks of `a` against the matching stretches of `b`, which
+    takes O(n log decimation).
+    """
+    a = _centered(a)
+    b = _centered(b)
+
+    if decimation > 1:
+        coarse = round(estimate_lag(_block_mean(a, decimation), _block_mean(b, decimation),
+                                    max(max_lag // decimation, 1)))
+        lags, correlation = _windowed_cross_correlation(a, b, (coarse - 2) * decimation,
+                                                        (coarse + 2) * decimation)
+        inside = np.abs(lags) <= max_lag
+        lags, correlation = lags[inside], correlation[inside]
+    else:
+        lags, correlation = _cross_correlation(a, b, max_lag)
+
+    best = int(np.argmax(correlation))
+    return lags[best] + _parabolic_peak(correlation, best)
+
+
+@exporter.export
+def shift(data, lag):
+    """
+    Shift every column of experiment data earlier by a number of rows.
+
+    Parameters
+    ----------
+    data : dict
+        Columns of experiment data.
+    lag : int
+        Number of rows to drop from the start of every column, such as the rounded result
+        of `estimate_lag`. To shift by a negative lag, shift the other record instead.
+
+    Returns
+    -------
+    shifted : dict
+        Views of the columns, so that row ``i`` of the result is row ``i + lag`` of `data`.
+    """
+    lag = int(round(lag))
+    if lag < 0:
+        raise ValueError('Cannot shift by a negative lag, shift the other record by '
+                         f'{-lag} rows instead.')
+    return {name: column[lag:] for name, column in data.items()}
+
+
+def _centered(values):
+    """Get the magnitudes of a record as floats with the mean removed."""
+    values = np.asarray(getattr(values, 'magnitude', values), dtype=float)
+    return values - values.mean()
+
+
+def _block_mean(values, size):
+    """Average blocks of samples, dropping any partial block at the end."""
+    n_blocks = len(values) // size
+    return values[:n_blocks * size].reshape(n_blocks, size).mean(axis=1)
+
+
+def _cross_correlation(a, b, max_lag):
+    """Calculate ``sum(a[i] * b[i + lag])`` for every lag up to max_lag with FFTs."""
+    n_fft = 1 << int(np.ceil(np.log2(len(a) + len(b) - 1)))
+    correlation = np.fft.irfft(np.conj(np.fft.rfft(a, n_fft)) * np.fft.rfft(b, n_fft),
+                               n_fft)
+    lags = np.arange(-min(max_lag, len(a) - 1), min(max_lag, len(b) - 1) + 1)
+    return lags, correlation[np.mod(lags, n_fft)]
+
+
+def _windowed_cross_correlation(a, b, low, high):
+    """
+    Calculate ``sum(a[i] * b[i + lag])`` for lags from low to high with blocked FFTs.
+
+    `a` is split into blocks about as long as the range of lags, and each block is
+    correlated with the stretch of `b` it can overlap at those lags, so the cost grows with
+    the log of the range of lags rather than of the record length.
+    """
+    width = high - low
+    size = max(width, 64)
+    n_blocks = -(-len(a) // size)
+    a_blocks = np.zeros(n_blocks * size)
+    a_blocks[:len(a)] = a
+
+    # Row j of padded is b[j + low], with zeros where that is outside of b
+    padded = np.zeros(n_blocks * size + width)
+    first, last = max(low, 0), min(len(b), len(padded) + low)
+    if last > first:
+        padded[first - low:last - low] = b[first:last]
+    step = padded.strides[0]
+    stretches = np.lib.stride_tricks.as_strided(
+        padded, shape=(n_blocks, size + width), strides=(size * step, step), writeable=False)
+
+    n_fft = 1 << int(np.ceil(np.log2(size + width)))
+    spectra = (np.conj(np.fft.rfft(a_blocks.reshape(n_blocks, size), n_fft))
+               * np.fft.rfft(stretches, n_fft))
+    correlation = np.fft.irfft(spectra.sum(axis=0), n_fft)[:width + 1]
+    return np.arange(low, high + 1), correlation
+
+
+def _parabolic_peak(values, i):
+    """Find the offset of the peak of a parabola through a maximum and its neighbors."""
+    if i == 0 or i == len(values) - 1:
+        return 0.
+    left, center, right = values[i - 1:i + 2]
+    curvature = left - 2 * center + right
+    return 0.5 * (left - right) / curvature if curvature < 0 else 0.
@@ -0,0 +1,478 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""
+Contains cumulative operations that can also be run on a record a chunk at a time.
+
+Each function has a streaming class with ``update`` and ``finalize`` methods that carries
+the state it needs between chunks, such as the running total. Both use the same
+arithmetic in the same order, so processing a record in chunks of any size gives exactly
+the same floating point results as processing it at once.
+
+Running totals on more than one thread (see `pylook.calc.set_num_threads`) are summed in a
+different order, so chunked and whole record results then agree only to rounding.
+"""
+
+import numpy as np
+
+from . import kernels
+from .backend import dispatch
+from ..package_tools import Exporter
+from ..units import magnitude_in, units
+
+exporter = Exporter(globals())
+
+
+@exporter.export
+def cumsum(data):
+    """
+    Calculate the cumulative sum.
+
+    Parameters
+    ----------
+    data : `pint.Quantity` or array-like
+        Data to sum, such as the sample intervals to get the elapsed time.
+
+    Returns
+    -------
+    sums : `pint.Quantity` or `numpy.ndarray`
+        Cumulative sums, in the units of `data`.
+
+    See Also
+    --------
+    StreamingCumsum
+    """
+    return _attach(kernels.cumsum(_magnitude(data)), getattr(data, 'units', None))
+
+
+@exporter.export
+def cumulative_trapezoid(y, x=None, spacing=1):
+    """
+    Integrate with the trapezoid rule, giving the integral up to each row.
+
+    Parameters
+    ----------
+    y : `pint.Quantity` or array-like
+        Values to integrate.
+    x : `pint.Quantity` or array-like, optional
+        Sample points of `y`, such as time.
+    spacing : `pint.Quantity` or float
+        Spacing of the samples when `x` is not given. Default 1.
+
+    Returns
+    -------
+    integral : `pint.Quantity` or `numpy.ndarray`
+        Integral from the first row, which is zero, to each row.
+
+    See Also
+    --------
+    StreamingCumulativeTrapezoid
+    """
+    y_values = _magnitude(y)
+    x_values, step, x_units = _sample_points(x, spacing)
+    integral = np.empty(len(y_values))
+    if len(y_values):
+        integral[0] = 0
+        integral[1:] = _trapezoid_integral(y_values, x_values, step, 0.)
+    return _attach(integral, _product_units(getattr(y, 'units', None), x_units))
+
+
+@exporter.export
+def gradient(y, x=None, spacing=1):
+    """
+    Calculate the derivative of data with finite differences.
+
+    Parameters
+    ----------
+    y : `pint.Quantity` or array-like
+        Values to differentiate.
+    x : `pint.Quantity` or array-like, optional
+        Sample points of `y`, which may be unevenly spaced.
+    spacing : `pint.Quantity` or float
+        Spacing of the samples when `x` is not given. Default 1.
+
+    Returns
+    -------
+    derivative : `pint.Quantity` or `numpy.ndarray`
+        Derivative at each row. Second order central differences are used inside the
+        record and first order differences at the ends, as in `numpy.gradient`.
+
+    See Also
+    --------
+    StreamingGradient
+    """
+    y_values = _magnitude(y)
+    x_values, step, x_units = _sample_points(x, spacing)
+    if len(y_values) < 2:
+        raise ValueError('At least two samples are needed to calculate a gradient.')
+
+    derivative = np.empty(len(y_values))
+    derivative[:1] = _end_difference(y_values[:2], _head(x_values), step)
+    derivative[1:-1] = _central_differences(y_values, x_values, step)
+    derivative[-1:] = _end_difference(y_values[-2:], _tail(x_values), step)
+    return _attach(derivative, _quotient_units(getattr(y, 'units', None), x_units))
+
+
+@exporter.export
+def running_mean(data):
+    """
+    Calculate the mean of all rows up to each row.
+
+    Parameters
+    ----------
+    data : `pint.Quantity` or array-like
+        Data to average.
+
+    Returns
+    -------
+    mean : `pint.Quantity` or `numpy.ndarray`
+        Mean from the first row to each row, in the units of `data`.
+
+    See Also
+    --------
+    rolling_mean, StreamingRunningMean
+    """
+    mean, _ = _running_mean(_magnitude(data), 0., 0)
+    return _attach(mean, getattr(data, 'units', None))
+
+
+@exporter.export
+class StreamingCumsum:
+    """
+    Calculate the cumulative sum of data given a chunk at a time.
+
+    On one thread the results are identical to `cumsum` of the whole record. With more,
+    long chunks are summed in parallel and the results agree to rounding.
+    """
+
+    def __init__(self):
+        """Start the sum."""
+        self.units = None
+        self._total = 0.
+
+    def update(self, chunk):
+        """
+        Sum the next chunk of data.
+
+        Parameters
+        ----------
+        chunk : `pint.Quantity` or array-like
+            Next samples.
+
+        Returns
+        -------
+        sums : `pint.Quantity` or `numpy.ndarray`
+            Cumulative sums of the whole record up to each sample of the chunk.
+        """
+        self.units = _chunk_units(self.units, chunk)
+        sums = kernels.cumsum(_magnitude(chunk, self.units), self._total)
+        if len(sums):
+            self._total = sums[-1]
+        return _attach(sums, self.units)
+
+    def finalize(self):
+        """
+        Finish the record.
+
+        Returns
+        -------
+        sums : `pint.Quantity` or `numpy.ndarray`
+            Empty, as every sum is returned by `update`.
+        """
+        self._total = 0.
+        return _attach(np.empty(0), self.units)
+
+
+@exporter.export
+class StreamingCumulativeTrapezoid:
+    """
+    Integrate with the trapezoid rule given a chunk of data at a time.
+
+    The last sample of each chunk is kept to integrate across the boundary with the next
+    chunk. On one thread the results are identical to `cumulative_trapezoid` of the whole
+    record. With more, long chunks are summed in parallel and the results agree to
+    rounding.
+
+    Parameters
+    ----------
+    spacing : `pint.Quantity` or float
+        Spacing of the samples when sample points are not given to `update`. Default 1.
+    """
+
+    def __init__(self, spacing=1):
+        """Start the integral."""
+        self.spacing = spacing
+        self.units = None
+        self.x_units = None
+        self._total = 0.
+        self._y = np.empty(0)
+        self._x = np.empty(0)
+
+    def update(self, y, x=None):
+        """
+        Integrate the next chunk of data.
+
+        Parameters
+        ----------
+        y : `pint.Quantity` or array-like
+            Next values to integrate.
+        x : `pint.Quantity` or array-like, optional
+            Sample points of the chunk, if the samples are not evenly spaced.
+
+        Returns
+        -------
+        integral : `pint.Quantity` or `numpy.ndarray`
+            Integral from the first row of the record to each row of the chunk.
+        """
+        self.units = _chunk_units(self.units, y)
+        y_values = np.concatenate((self._y, _magnitude(y, self.units)))
+        x_values, step, self.x_units = _sample_points(x, self.spacing, self.x_units)
+        if x_values is not None:
+            x_values = np.concatenate((self._x, x_values))
+
+        integral = _trapezoid_integral(y_values, x_values, step, self._total)
+        if not len(self._y) and len(y_values):
+            integral = np.concatenate(([0.], integral))
+        if len(integral):
+            self._total = integral[-1]
+            self._y = y_values[-1:]
+            self._x = x_values[-1:] if x_values is not None else self._x
+        return _attach(integral, _product_units(self.units, self.x_units))
+
+    def finalize(self):
+        """
+        Finish the record.
+
+        Returns
+        -------
+        integral : `pint.Quantity` or `numpy.ndarray`
+            Empty, as the integral at every row is returned by `update`.
+        """
+        self._total = 0.
+        self._y = np.empty(0)
+        self._x = np.empty(0)
+        return _attach(np.empty(0), _product_units(self.units, self.x_units))
+
+
+@exporter.export
+class StreamingGradient:
+    """
+    Calculate the derivative of data with finite differences given a chunk at a time.
+
+    The central difference at a row needs the row after it, so the derivative of the last
+    row of each chunk is returned with the next chunk, or by `finalize`. The results are
+    identical to `gradient` of the whole record.
+
+    Parameters
+    ----------
+    spacing : `pint.Quantity` or float
+        Spacing of the samples when sample points are not given to `update`. Default 1.
+    """
+
+    def __init__(self, spacing=1):
+        """Set up the differences."""
+        self.spacing = spacing
+        self.units = None
+        self.x_units = None
+        self._y = np.empty(0)
+        self._x = np.empty(0)
+        self._started = False
+
+    def update(self, y, x=None):
+        """
+        Differentiate the next chunk of data.
+
+        Parameters
+        ----------
+        y : `pint.Quantity` or array-like
+            Next values to differentiate.
+        x : `pint.Quantity` or array-like, optional
+            Sample points of the chunk, if the samples are not evenly spaced.
+
+        Returns
+        -------
+        derivative : `pint.Quantity` or `numpy.ndarray`
+            Derivative at each row that is complete, lagging the input by one row.
+        """
+        self.units = _chunk_units(self.units, y)
+        y_values = np.concatenate((self._y, _magnitude(y, self.units)))
+        x_values, step, self.x_units = _sample_points(x, self.spacing, self.x_units)
+        if x_values is not None:
+            x_values = np.concatenate((self._x, x_values))
+
+        # The rows kept from before are the last one differentiated and the one after it
+        pieces = []
+        if not self._started and len(y_values) >= 2:
+            pieces.append(_end_difference(y_values[:2], _head(x_values), step))
+            self._started = True
+        pieces.append(_central_differences(y_values, x_values, step))
+
+        self._y = y_values[-2:]
+        self._x = _tail(x_values) if x_values is not None else self._x
+        return _attach(np.concatenate(pieces), _quotient_units(self.units, self.x_units))
+
+    def finalize(self):
+        """
+        Differentiate the last row of the record.
+
+        Returns
+        -------
+        derivative : `pint.Quantity` or `numpy.ndarray`
+            Derivative at the last row.
+        """
+        if not self._started:
+            raise ValueError('At least two samples are needed to calculate a gradient.')
+        if len(self._x):
+            derivative = _end_difference(self._y, self._x, None)
+        else:
+            _, step, _ = _sample_points(None, self.spacing, self.x_units)
+            derivative = _end_difference(self._y, None, step)
+        self._y = np.empty(0)
+        self._x = np.empty(0)
+        self._started = False
+        return _attach(derivative, _quotient_units(self.units, self.x_units))
+
+
+@exporter.export
+class StreamingRunningMean:
+    """
+    Calculate the mean of all rows up to each row of data given a chunk at a time.
+
+    On one thread the results are identical to `running_mean` of the whole record. With
+    more, long chunks are summed in parallel and the results agree to rounding.
+    """
+
+    def __init__(self):
+        """Start the mean."""
+        self.units = None
+        self._total = 0.
+        self._count = 0
+
+    def update(self, chunk):
+        """
+        Average the next chunk of data.
+
+        Parameters
+        ----------
+        chunk : `pint.Quantity` or array-like
+            Next samples.
+
+        Returns
+        -------
+        mean : `pint.Quantity` or `numpy.ndarray`
+            Mean of the whole record up to each sample of the chunk.
+        """
+        self.units = _chunk_units(self.units, chunk)
+        mean, self._total = _running_mean(_magnitude(chunk, self.units), self._total,
+                                          self._count)
+        self._count += len(mean)
+        return _attach(mean, self.units)
+
+    def finalize(self):
+        """
+        Finish the record.
+
+        Returns
+        -------
+        mean : `pint.Quantity` or `numpy.ndarray`
+            Empty, as every mean is returned by `update`.
+        """
+        self._total = 0.
+        self._count = 0
+        return _attach(np.empty(0), self.units)
+
+
+def _magnitude(values, to_units=None):
+    """Get values as a float array, in the given units if they have units."""
+    if to_units is not None:
+        values = magnitude_in(values, to_units)
+    return np.asarray(getattr(values, 'magnitude', values), dtype=float)
+
+
+def _chunk_units(current, chunk):
+    """Get the units of a streamed record, which are those of its first chunk."""
+    return getattr(chunk, 'units', None) if current is None else current
+
+
+def _attach(values, to_units):
+    """Give values units, if there are any."""
+    return units.Quantity(values, to_units) if to_units is not None else values
+
+
+def _sample_points(x, spacing, x_units=None):
+    """Get the sample point magnitudes or spacing, and their units."""
+    if x is not None:
+        x_units = _chunk_units(x_units, x)
+        return _magnitude(x, x_units), None, x_units
+    x_units = _chunk_units(x_units, spacing)
+    return None, float(_magnitude(spacing, x_units)), x_units
+
+
+def _product_units(y_units, x_units):
+    """Get the units of an integral."""
+    if y_units is None and x_units is None:
+        return None
+    return (y_units or units.dimensionless) * (x_units or units.dimensionless)
+
+
+def _quotient_units(y_units, x_units):
+    """Get the units of a derivative."""
+    if y_units is None and x_units is None:
+        return None
+    return (y_units or units.dimensionless) / (x_units or units.dimensionless)
+
+
+def _head(x):
+    """Get the first two sample points, if there are sample points."""
+    return None if x is None else x[:2]
+
+
+def _tail(x):
+    """Get the last two sample points, if there are sample points."""
+    return None if x is None else x[-2:]
+
+
+def _trapezoid_areas(y, x, step):
+    """Calculate the area of the trapezoid between each pair of consecutive samples."""
+    if x is None:
+        return (y[1:] + y[:-1]) * (0.5 * step)
+    return (y[1:] + y[:-1]) * (0.5 * (x[1:] - x[:-1]))
+
+
+@dispatch('cumulative.trapezoid')
+def _trapezoid_integral(y, x, step, carry):
+    """Integrate with the trapezoid rule from a running total, at each row but the first."""
+    return kernels.cumsum(_trapezoid_areas(y, x, step), carry)
+
+
+@dispatch('cumulative.running_mean')
+def _running_mean(values, total, count):
+    """
+    Average values continuing from the total and count of the rows before them.
+
+    Returns the means and the new running total.
+    """
+    mean = kernels.cumsum(values, total)
+    if len(mean):
+        total = mean[-1]
+    mean /= np.arange(count + 1, count + len(mean) + 1)
+    return mean, total
+
+
+def _end_difference(y, x, step):
+    """Calculate the first order difference of two samples."""
+    if x is None:
+        return (y[1:] - y[:1]) / step
+    return (y[1:] - y[:1]) / (x[1:] - x[:1])
+
+
+def _central_differences(y, x, step):
+    """Calculate second order central differences at every row with two neighbors."""
+    if x is None:
+        return (y[2:] - y[:-2]) / (2 * step)
+    before = x[1:-1] - x[:-2]
+    after = x[2:] - x[1:-1]
+    return (y[:-2] * (-after / (before * (before + after)))
+            + y[1:-1] * ((after - before) / (before * after))
+            + y[2:] * (before / (after * (before + after))))
@@ -0,0 +1,544 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Contains tools to automatically find features, such as offsets, in data."""
+
+import numpy as np
+
+from . import kernels
+from .backend import dispatch
+from ..package_tools import Exporter
+from ..units import magnitude_in
+
+exporter = Exporter(globals())
+
+
+@exporter.export
+def detect_offsets(data, threshold=None, n_sigma=10, max_gap=0):
+    """
+    Find offsets, such as transducer resets, in a record.
+
+    An offset is a jump in the sample to sample change of the data that is much larger
+    than the typical change. Jumps separated by no more than `max_gap` rows are treated as
+    a single offset.
+
+    Parameters
+    ----------
+    data : `pint.Quantity`
+        Data to search for offsets.
+    threshold : `pint.Quantity`, optional
+        Size of change between consecutive samples, relative to the typical change, that
+        marks an offset. Defaults to `n_sigma` times a robust estimate of the noise in the
+        differenced data.
+    n_sigma : float
+        Number of standard deviations of the differenced data a change must exceed to be
+        an offset when no `threshold` is given. Default 10.
+    max_gap : int
+        Largest number of rows between jumps that are still part of the same offset.
+        Default 0.
+
+    Returns
+    -------
+    intervals : `numpy.ndarray`
+        Array of shape (number of offsets, 2) with the start and end index of each offset.
+        Ready to be passed to `remove_offsets` or row by row to `remove_offset`.
+
+    Notes
+    -----
+    The noise is estimated with the median absolute deviation of the differenced data,
+    scaled to be equivalent to a standard deviation. If that is zero, which can happen
+    with coarsely quantized data, the standard deviation is used instead.
+    """
+    deviation = np.diff(data.magnitude).astype(float, copy=False)
+
+    # Remove the typical change (such as a steady displacement rate) from the differences
+    deviation -= np.median(deviation)
+    np.abs(deviation, out=deviation)
+
+    if threshold is None:
+        threshold = n_sigma * _noise_level(deviation)
+    else:
+        threshold = magnitude_in(threshold, data.units)
+
+    return _threshold_groups(deviation, threshold, max_gap)
+
+
+@exporter.export
+def find_onset(data, method='slope', start=0, stop=None, baseline=100, n_sigma=5):
+    """
+    Find the row at which loading begins.
+
+    Parameters
+    ----------
+    data : `pint.Quantity` or array-like
+        Data, such as stress or load, that is flat before the onset.
+    method : str
+        'slope' (default) finds the row best splitting the data into a constant part
+        followed by a straight line. 'mean' finds the row best splitting the data into two
+        parts with different constant values. 'threshold' finds the first row that departs
+        from the mean of the first `baseline` rows by more than `n_sigma` of their standard
+        deviations.
+    start : int
+        First row to search. Default 0.
+    stop : int
+        Row to stop the search at (exclusive). Defaults to the end of the data. For long
+        records restricting the search to the initial loading gives the most reliable
+        results with the 'slope' and 'mean' methods.
+    baseline : int
+        Number of rows at the start of the search used to characterize the data before the
+        onset with the 'threshold' method. Default 100.
+    n_sigma : float
+        Number of standard deviations marking the onset with the 'threshold' method.
+        Default 5.
+
+    Returns
+    -------
+    index : int
+        Row of the onset, relative to the start of `data`. Can be passed to `zero`.
+
+    Notes
+    -----
+    The 'slope' and 'mean' methods evaluate the least squares misfit of every possible
+    split at once from cumulative sums, so they take O(n) time.
+    """
+    values = np.asarray(getattr(data, 'magnitude', data), dtype=float)[start:stop]
+
+    if method == 'threshold':
+        reference = values[:baseline]
+        departed = np.abs(values - reference.mean()) > n_sigma * reference.std()
+        if not departed.any():
+            raise ValueError('Data never depart from the baseline, no onset found.')
+        return start + int(np.argmax(departed))
+
+    if method == 'slope':
+        cost = _split_cost(values, right_linear=True)
+    elif method == 'mean':
+        cost = _split_cost(values, right_linear=False)
+    else:
+        raise ValueError(f'Unknown onset method {method}. Valid methods are slope, mean,'
+                         ' and threshold.')
+
+    return start + int(np.nanargmin(cost))
+
+
+@exporter.export
+def segment_experiment(time, displacement, shear=None, window=51, tolerance=0.1,
+                       hold_velocity=None, min_rows=None, n_sigma=10, min_events=2):
+    """
+    Split an experiment into holds, constant velocity slides, and stick-slip sections.
+
+    Parameters
+    ----------
+    time : `pint.Quantity`
+        Time of each row.
+    displacement : `pint.Quantity`
+        Load point displacement.
+    shear : `pint.Quantity`, optional
+        Shear stress or load. When given, sliding segments with at least `min_events`
+        stress drops are marked as stick-slip.
+    window : int
+        Number of rows used to estimate the velocity at each row. Default 51.
+    tolerance : float
+        Relative change in velocity that starts a new segment. Default 0.1.
+    hold_velocity : `pint.Quantity`, optional
+        Largest velocity that is still a hold. Defaults to 1% of the 99th percentile of
+        the speed.
+    min_rows : int, optional
+        Shortest segment. Shorter sections, such as the transition between two velocities,
+        are split between the segments either side. Defaults to `window`.
+    n_sigma : float
+        Size of a stress drop in standard deviations of the sample to sample change in
+        `shear`. Default 10.
+    min_events : int
+        Fewest stress drops in a stick-slip segment. Default 2.
+
+    Returns
+    -------
+    segments : `numpy.ndarray`
+        Structured array with a row per segment and the fields ``start`` and ``stop``
+        (row slice of the segment), ``kind`` ('hold', 'slide', or 'stick-slip'), and
+        ``velocity`` (mean velocity in units of displacement per unit time of the inputs,
+        zero for holds).
+
+    Notes
+    -----
+    Every step is a vectorized pass over the data, so the whole experiment is scanned in
+    O(n). The segment index is a plain structured array that can be saved with
+    `numpy.save` alongside the data, letting later analyses slice out segments with
+    ``data[name][start:stop]`` rather than scanning the columns again.
+    """
+    t = time.magnitude
+    d = displacement.magnitude
+    velocity_units = displacement.units / time.units
+    min_rows = window if min_rows is None else min_rows
+
+    velocity = kernels.rolling_slope(t, d, window)
+    valid = np.flatnonzero(~np.isnan(velocity))
+    velocity[:valid[0]] = velocity[valid[0]]
+    velocity[valid[-1] + 1:] = velocity[valid[-1]]
+    speed = np.abs(velocity)
+
+    if hold_velocity is None:
+        hold_velocity = 0.01 * np.percentile(speed, 99)
+    else:
+        hold_velocity = magnitude_in(hold_velocity, velocity_units)
+
+    # Label each row with its velocity quantized on a log scale, holds get label zero
+    moving = speed > hold_velocity
+    labels = np.zeros(len(t), dtype=np.intp)
+    labels[moving] = np.sign(velocity[moving]) * (
+        np.rint(np.log(speed[moving] / hold_velocity) / np.log1p(tolerance)) + 1)
+
+    # Drop short runs of labels, such as the transition between velocities, moving the
+    # boundary to the middle of the gap left between the runs either side
+    starts = _run_starts(labels)
+    lengths = np.diff(np.append(starts, len(labels)))
+    keep = lengths >= min_rows
+    keep[0] = True
+    starts = starts[keep]
+    labels = labels[starts]
+    ends = starts + lengths[keep]
+    starts[1:] = (ends[:-1] + starts[1:]) // 2
+
+    # Neighboring runs with labels off by quantization have about the same mean velocity
+    stops = np.append(starts[1:], len(t))
+    mean_velocity = _segment_velocity(t, d, starts, stops)
+    scale = np.maximum(np.abs(mean_velocity[1:]), np.abs(mean_velocity[:-1]))
+    same = ((labels[1:] == 0) & (labels[:-1] == 0)) | (
+        (labels[1:] != 0) & (labels[:-1] != 0)
+        & (np.abs(mean_velocity[1:] - mean_velocity[:-1]) <= tolerance * scale))
+    new = np.concatenate(([True], ~same))
+    starts = starts[new]
+    labels = labels[new]
+    stops = np.append(starts[1:], len(t))
+
+    segments = np.empty(len(starts), dtype=[('start', np.intp), ('stop', np.intp),
+                                            ('kind', 'U10'), ('velocity', float)])
+    segments['start'] = starts
+    segments['stop'] = stops
+    segments['kind'] = np.where(labels == 0, 'hold', 'slide')
+    segments['velocity'] = np.where(labels == 0, 0, _segment_velocity(t, d, starts, stops))
+
+    if shear is not None:
+        change = np.diff(shear.magnitude).astype(float, copy=False)
+        change -= np.median(change)
+        threshold = n_sigma * _noise_level(np.abs(change))
+        drops = _threshold_groups(-change, threshold, 0)
+        events = (np.searchsorted(drops[:, 0], stops)
+                  - np.searchsorted(drops[:, 0], starts))
+        segments['kind'][(labels != 0) & (events >= min_events)] = 'stick-slip'
+
+    return segments
+
+
+@exporter.export
+def detect_stick_slip(shear_stress, time, threshold=None, n_sigma=10, max_gap=1, min_drop=0,
+                      chunk_size=None):
+    """
+    Catalog the stress drops of stick-slip events.
+
+    A stress drop is a run of sample to sample decreases in stress each larger than
+    `threshold`, allowing up to `max_gap` smaller changes within the run.
+
+    Parameters
+    ----------
+    shear_stress : `pint.Quantity`
+        Shear stress or load.
+    time : `pint.Quantity`
+        Time of each row.
+    threshold : `pint.Quantity`, optional
+        Smallest decrease between consecutive samples that is part of a stress drop.
+        Defaults to `n_sigma` times a robust estimate of the noise in the differenced
+        stress, taken from the first chunk.
+    n_sigma : float
+        Number of standard deviations of the differenced stress a decrease must exceed
+        when no `threshold` is given. Default 10.
+    max_gap : int
+        Largest number of samples within a stress drop that do not decrease by more than
+        `threshold`. Default 1.
+    min_drop : `pint.Quantity`
+        Smallest total stress drop to report. Default 0.
+    chunk_size : int, optional
+        Number of rows to process at a time. Defaults to the whole record.
+
+    Returns
+    -------
+    events : `numpy.ndarray`
+        Structured array with a row per event. See `StickSlipDetector`.
+
+    See Also
+    --------
+    StickSlipDetector
+    """
+    detector = StickSlipDetector(threshold=threshold, n_sigma=n_sigma, max_gap=max_gap,
+                                 min_drop=min_drop)
+    chunk_size = chunk_size or max(len(shear_stress), 1)
+    events = [detector.update(shear_stress[i:i + chunk_size], time[i:i + chunk_size])
+              for i in range(0, len(shear_stress), chunk_size)]
+    events.append(detector.finalize())
+    return np.concatenate(events)
+
+
+@exporter.export
+class StickSlipDetector:
+    """
+    Find stick-slip stress drops in a record given a chunk at a time.
+
+    Only the rows of a stress drop still in progress are kept between chunks, so records
+    of any length can be processed in bounded memory. The events found are the same for
+    any chunking, as long as the same `threshold` is used.
+
+    Parameters
+    ----------
+    threshold : `pint.Quantity`, optional
+        Smallest decrease between consecutive samples that is part of a stress drop.
+        Defaults to `n_sigma` times a robust estimate of the noise in the differenced
+        stress of the first chunk.
+    n_sigma : float
+        Number of standard deviations of the differenced stress a decrease must exceed
+        when no `threshold` is given. Default 10.
+    max_gap : int
+        Largest number of samples within a stress drop that do not decrease by more than
+        `threshold`. Default 1.
+    min_drop : `pint.Quantity`
+        Smallest total stress drop to report. Default 0.
+
+    Notes
+    -----
+    Events are structured arrays with the fields ``peak`` and ``trough`` (rows at the
+    start and end of the drop), ``time`` (time of the peak), ``peak_stress``,
+    ``trough_stress``, ``drop``, ``duration``, and ``recurrence`` (time since the
+    previous peak, NaN for the first event). Stresses and times are in the units of the
+    first chunk given.
+    """
+
+    dtype = np.dtype([('peak', np.intp), ('trough', np.intp), ('time', float),
+                      ('peak_stress', float), ('trough_stress', float), ('drop', float),
+                      ('duration', float), ('recurrence', float)])
+
+    def __init__(self, threshold=None, n_sigma=10, max_gap=1, min_drop=0):
+        """Set up the detector."""
+        self.threshold = threshold
+        self.n_sigma = n_sigma
+        self.max_gap = max_gap
+        self.min_drop = min_drop
+        self.stress_units = None
+        self.time_units = None
+        self._threshold = None
+        self._min_drop = None
+        self._stress = np.empty(0)
+        self._time = np.empty(0)
+        self._row = 0
+        self._last_peak_time = np.nan
+
+    def update(self, shear_stress, time):
+        """
+        Process the next chunk of the record.
+
+        Parameters
+        ----------
+        shear_stress : `pint.Quantity`
+            Shear stress or load of the chunk.
+        time : `pint.Quantity`
+            Time of each row of the chunk.
+
+        Returns
+        -------
+        events : `numpy.ndarray`
+            Events completed within the data seen so far.
+        """
+        if self.stress_units is None:
+            self.stress_units = shear_stress.units
+            self.time_units = time.units
+            self._min_drop = magnitude_in(self.min_drop, self.stress_units)
+            if self.threshold is not None:
+                self._threshold = magnitude_in(self.threshold, self.stress_units)
+
+        stress = np.concatenate((self._stress, magnitude_in(shear_stress, self.stress_units)))
+        times = np.concatenate((self._time, magnitude_in(time, self.time_units)))
+        return self._scan(stress, times, final=False)
+
+    def finalize(self):
+        """
+        Finish the record, returning any event still in progress.
+
+        Returns
+        -------
+        events : `numpy.ndarray`
+            Events not yet returned by `update`.
+        """
+        return self._scan(self._stress, self._time, final=True)
+
+    def _scan(self, stress, times, final):
+        """Find the events in the carried rows plus a new chunk and update the carry."""
+        change = np.diff(stress)
+        if self._threshold is None:
+            if not len(change):
+                self._stress, self._time = stress, times
+                return np.empty(0, dtype=self.dtype)
+            self._threshold = self.n_sigma * _noise_level(np.abs(change - np.median(change)))
+
+        groups = _threshold_groups(-change, self._threshold, self.max_gap)
+
+        # A drop near the end of the chunk may continue into the next one
+        complete = np.ones(len(groups), dtype=bool)
+        if not final:
+            complete = len(change) - groups[:, 1] > self.max_gap
+        carry = groups[~complete][0, 0] if not complete.all() else max(len(stress) - 1, 0)
+
+        peaks, troughs = groups[complete].T
+        drops = stress[peaks] - stress[troughs]
+        big = drops >= self._min_drop
+        peaks, troughs, drops = peaks[big], troughs[big], drops[big]
+
+        events = np.empty(len(peaks), dtype=self.dtype)
+        events['peak'] = peaks + self._row
+        events['trough'] = troughs + self._row
+        events['time'] = times[peaks]
+        events['peak_stress'] = stress[peaks]
+        events['trough_stress'] = stress[troughs]
+        events['drop'] = drops
+        events['duration'] = times[troughs] - times[peaks]
+        events['recurrence'] = np.diff(times[peaks], prepend=self._last_peak_time)
+        if len(events):
+            self._last_peak_time = events['time'][-1]
+
+        self._stress = stress[carry:]
+        self._time = times[carry:]
+        self._row += carry
+        return events
+
+
+def _run_starts(labels):
+    """Find the first row of each run of equal labels."""
+    return np.flatnonzero(np.concatenate(([True], labels[1:] != labels[:-1])))
+
+
+def _segment_velocity(t, d, starts, stops):
+    """Mean velocity between the first and last row of each segment."""
+    last = stops - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        velocity = (d[last] - d[starts]) / (t[last] - t[starts])
+    return np.where(last > starts, velocity, 0)
+
+
+def _noise_level(deviation):
+    """
+    Estimate the standard deviation of data from their absolute deviations from the median.
+
+    The median absolute deviation is scaled to be equivalent to a standard deviation. If
+    that is zero, which can happen with coarsely quantized data, the standard deviation of
+    the absolute deviations is used instead.
+    """
+    noise = 1.4826 * np.median(deviation)
+    if noise == 0:
+        noise = deviation.std()
+    return noise
+
+
+def _split_cost(values, right_linear):
+    """
+    Calculate the least squares misfit of splitting data at every row.
+
+    The data before each split are fit with a constant and the data from the split onward
+    with a constant or a straight line.
+
+    Parameters
+    ----------
+    values : `numpy.ndarray`
+        Data to split.
+    right_linear : bool
+        If the data after the split are fit with a line rather than a constant.
+
+    Returns
+    -------
+    cost : `numpy.ndarray`
+        Total squared misfit for a split at each row. Splits leaving too few points on
+        either side to fit are NaN.
+    """
+    n = len(values)
+    # Centering keeps the sums of squares small, limiting the cancellation in the misfits
+    y = values - values.mean()
+    x = np.arange(n) - (n - 1) / 2
+
+    def prefix_sums(a):
+        """Compute the sums of the first t elements for t from 0 to n."""
+        return np.concatenate(([0.], np.cumsum(a)))
+
+    def suffix_sums(a):
+        """Compute the sums of the elements from t onward for t from 0 to n."""
+        sums = prefix_sums(a)
+        return sums[-1] - sums
+
+    count = np.arange(n + 1, dtype=float)
+    sum_y = prefix_sums(y)
+    sum_yy = prefix_sums(y * y)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        left = sum_yy - sum_y ** 2 / count
+
+        right_count = n - count
+        right_y = sum_y[-1] - sum_y
+        right = (sum_yy[-1] - sum_yy) - right_y ** 2 / right_count
+
+        if right_linear:
+            right_x = suffix_sums(x)
+            sxx = suffix_sums(x * x) - right_x ** 2 / right_count
+            sxy = suffix_sums(x * y) - right_x * right_y / right_count
+            right -= sxy ** 2 / sxx
+
+    cost = left + right
+
+    # Need at least one point on the left and enough on the right to fit the model
+    min_right = 3 if right_linear else 1
+    cost[:1] = np.nan
+    cost[n - min_right + 1:] = np.nan
+    return cost[:n]
+
+
+@dispatch('detection.threshold_groups')
+def _threshold_groups(values, threshold, max_gap):
+    """
+    Group the indices of values above a threshold that are close to each other.
+
+    Parameters
+    ----------
+    values : `numpy.ndarray`
+        Values to compare to the threshold, such as changes between rows.
+    threshold : float
+        Values must be larger than this to be part of a group.
+    max_gap : int
+        Largest number of rows between indices of the same group.
+
+    Returns
+    -------
+    intervals : `numpy.ndarray`
+        Start and end (one past the last index) of each group.
+    """
+    return _group_indices(np.flatnonzero(values > threshold), max_gap)
+
+
+def _group_indices(indices, max_gap):
+    """
+    Group sorted indices that are close to each other into intervals.
+
+    Parameters
+    ----------
+    indices : `numpy.ndarray`
+        Sorted indices of the changes between row ``i`` and ``i + 1``.
+    max_gap : int
+        Largest number of rows between indices of the same group.
+
+    Returns
+    -------
+    intervals : `numpy.ndarray`
+        Start and end (one past the last changed row) of each group.
+    """
+    if not len(indices):
+        return np.empty((0, 2), dtype=np.intp)
+
+    breaks = np.flatnonzero(np.diff(indices) > max_gap + 1)
+    starts = indices[np.concatenate(([0], breaks + 1))]
+    ends = indices[np.concatenate((breaks, [len(indices) - 1]))] + 1
+    return np.column_stack((starts, ends))
@@ -0,0 +1,223 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Contains tools to reduce the size of data for fast, but faithful, plotting."""
+
+import numpy as np
+
+from ..package_tools import Exporter
+
+exporter = Exporter(globals())
+
+
+@exporter.export
+def decimate_for_display(x, y, n_points, method='minmax'):
+    """
+    Reduce data to about a given number of points while keeping its visual appearance.
+
+    Parameters
+    ----------
+    x : `pint.Quantity`
+        Independent variable, such as time. Must be monotonically increasing for the plot
+        to look like the original data.
+    y : `pint.Quantity`
+        Data to decimate.
+    n_points : int
+        Approximate number of points to return. About the number of pixels across the plot
+        is a good choice.
+    method : str
+        'minmax' (default) keeps the smallest and largest value in each of ``n_points / 2``
+        buckets so every peak and trough is drawn. 'lttb' uses the Largest Triangle Three
+        Buckets algorithm to keep the points that best preserve the shape of the line.
+
+    Returns
+    -------
+    x, y : `pint.Quantity`
+        Decimated data. If there are already no more than `n_points` points the data are
+        returned unchanged.
+    """
+    if len(y) <= n_points:
+        return x, y
+
+    if method == 'minmax':
+        indices = _minmax_indices(y.magnitude, max(n_points // 2, 1))
+    elif method == 'lttb':
+        indices = _lttb_indices(x.magnitude, y.magnitude, max(n_points, 3))
+    else:
+        raise ValueError(f'Unknown decimation method {method}. Valid methods are minmax and'
+                         ' lttb.')
+
+    return x[indices], y[indices]
+
+
+@exporter.export
+class DisplayPyramid:
+    """
+    Multi-resolution min/max envelopes of a column for interactive plotting.
+
+    The pyramid is built once in O(n). Each level holds the rows of the minimum and maximum
+    values in buckets twice the size of the level below it. Any zoom window can then be
+    served by picking the level with about the right number of buckets in view, so a query
+    costs O(pixels) no matter how long the record is.
+
+    Parameters
+    ----------
+    x : `pint.Quantity`
+        Monotonically increasing independent variable, such as time.
+    y : `pint.Quantity`
+        Data to plot.
+    base_bucket_size : int
+        Number of rows in each bucket of the finest level. Default 4.
+    """
+
+    def __init__(self, x, y, base_bucket_size=4):
+        """Build the pyramid of envelopes."""
+        self.x = x
+        self.y = y
+        self.bucket_sizes = []
+        self.levels = []
+
+        values = y.magnitude
+        bucket_size = base_bucket_size
+        lows, highs = _bucket_extremes(values, bucket_size)
+        while True:
+            self.bucket_sizes.append(bucket_size)
+            self.levels.append((lows, highs))
+            if len(lows) <= 1:
+                break
+            lows, highs = _merge_levels(values, lows, highs)
+            bucket_size *= 2
+
+    def query(self, x_start=None, x_end=None, n_points=1000):
+        """
+        Get the data to draw between two x values.
+
+        Parameters
+        ----------
+        x_start, x_end : `pint.Quantity`, optional
+            Range of x to draw. Default to the start and end of the data.
+        n_points : int
+            Approximate largest number of points to return.
+
+        Returns
+        -------
+        x, y : `pint.Quantity`
+            Data to draw. When the window holds no more than `n_points` rows these are views
+            of the full resolution data.
+        """
+        x_values = self.x.magnitude
+        start = 0 if x_start is None else np.searchsorted(
+            x_values, x_start.m_as(self.x.units), side='left')
+        end = len(x_values) if x_end is None else np.searchsorted(
+            x_values, x_end.m_as(self.x.units), side='right')
+
+        n_rows = end - start
+        if n_rows <= n_points:
+            return self.x[start:end], self.y[start:end]
+
+        # Finest level whose buckets (two points each) fit in the requested points
+        for level, bucket_size in enumerate(self.bucket_sizes):
+            if 2 * n_rows / bucket_size <= n_points:
+                break
+
+        lows, highs = self.levels[level]
+        first = start // bucket_size
+        last = -(-end // bucket_size)
+        indices = np.sort(np.stack((lows[first:last], highs[first:last]), axis=-1), axis=-1)
+        indices = indices.ravel()
+        indices = indices[(indices >= start) & (indices < end)]
+        return self.x[indices], self.y[indices]
+
+
+def _minmax_indices(values, n_buckets):
+    """Get the rows of the minimum and maximum of each bucket, in row order."""
+    lows, highs = _bucket_extremes(values, -(-len(values) // n_buckets))
+    return np.sort(np.stack((lows, highs), axis=-1), axis=-1).ravel()
+
+
+def _bucket_extremes(values, bucket_size, rows=None):
+    """
+    Find the rows of the minimum and maximum values in buckets of rows.
+
+    Parameters
+    ----------
+    values : `numpy.ndarray`
+        Full resolution data.
+    bucket_size : int
+        Number of rows per bucket. The last bucket may be smaller.
+    rows : `numpy.ndarray`, optional
+        Rows into `values` to bucket. Defaults to all rows, which avoids making any copies
+        of `values`.
+
+    Returns
+    -------
+    lows, highs : `numpy.ndarray`
+        Rows of the minimum and maximum value in each bucket.
+    """
+    n = len(values) if rows is None else len(rows)
+    n_full = n // bucket_size
+    if rows is None:
+        full_values = values[:n_full * bucket_size].reshape(n_full, bucket_size)
+        offsets = np.arange(n_full) * bucket_size
+        lows = offsets + np.argmin(full_values, axis=1)
+        highs = offsets + np.argmax(full_values, axis=1)
+        tail = np.arange(n_full * bucket_size, n)
+    else:
+        full_rows = rows[:n_full * bucket_size].reshape(n_full, bucket_size)
+        full_values = values[full_rows]
+        take = np.arange(n_full)
+        lows = full_rows[take, np.argmin(full_values, axis=1)]
+        highs = full_rows[take, np.argmax(full_values, axis=1)]
+        tail = rows[n_full * bucket_size:]
+
+    if len(tail):
+        lows = np.append(lows, tail[np.argmin(values[tail])])
+        highs = np.append(highs, tail[np.argmax(values[tail])])
+
+    return lows, highs
+
+
+def _merge_levels(values, lows, highs):
+    """Combine pairs of neighboring buckets into the next coarser level."""
+    new_lows, _ = _bucket_extremes(values, 2, rows=lows)
+    _, new_highs = _bucket_extremes(values, 2, rows=highs)
+    return new_lows, new_highs
+
+
+def _lttb_indices(x, y, n_points):
+    """
+    Select rows with the Largest Triangle Three Buckets algorithm.
+
+    Parameters
+    ----------
+    x, y : `numpy.ndarray`
+        Data to decimate.
+    n_points : int
+        Number of rows to select, including the first and last.
+
+    Returns
+    -------
+    indices : `numpy.ndarray`
+        Selected rows in increasing order.
+    """
+    n = len(y)
+    # The first and last points are always kept, the rest are split into buckets
+    edges = np.linspace(1, n - 1, n_points - 1).astype(np.intp)
+    indices = np.empty(n_points, dtype=np.intp)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    for i in range(n_points - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        # Average of the next bucket is the third point of the triangle
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        a = indices[i]
+
+        area = np.abs((x[a] - next_x) * (y[start:end] - y[a])
+                      - (x[a] - x[start:end]) * (next_y - y[a]))
+        indices[i + 1] = start + np.argmax(area)
+
+    return indices
@@ -0,0 +1,285 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Contains tools to filter long records with FFT based convolution."""
+
+import numpy as np
+
+from ..package_tools import Exporter
+from ..units import magnitude_in, units
+
+exporter = Exporter(globals())
+
+
+@exporter.export
+def lowpass(data, cutoff, sample_rate, numtaps=None, chunk_size=2 ** 20, out=None):
+    """
+    Remove frequencies above a cutoff from data.
+
+    Parameters
+    ----------
+    data : `pint.Quantity` or array-like
+        Data to filter along the last axis. Several columns can be filtered together by
+        stacking them into a 2D array. May be a memory mapped array.
+    cutoff : `pint.Quantity`
+        Cutoff frequency.
+    sample_rate : `pint.Quantity`
+        Sample rate of the data.
+    numtaps : int, optional
+        Length of the filter, which must be odd. See `fir_filter`.
+    chunk_size : int
+        Number of samples filtered at a time, which bounds the memory used. Default 2**20.
+    out : `numpy.ndarray`, optional
+        Array, such as a memory mapped array, in which to place the filtered magnitudes.
+
+    Returns
+    -------
+    filtered : `pint.Quantity` or `numpy.ndarray`
+        Filtered data, in the same units as `data`.
+
+    See Also
+    --------
+    fir_filter, StreamingFilter
+    """
+    taps = fir_filter('lowpass', cutoff, sample_rate, numtaps=numtaps)
+    return _filter(data, taps, chunk_size, out)
+
+
+@exporter.export
+def highpass(data, cutoff, sample_rate, numtaps=None, chunk_size=2 ** 20, out=None):
+    """
+    Remove frequencies below a cutoff from data.
+
+    Parameters
+    ----------
+    data : `pint.Quantity` or array-like
+        Data to filter along the last axis. Several columns can be filtered together by
+        stacking them into a 2D array. May be a memory mapped array.
+    cutoff : `pint.Quantity`
+        Cutoff frequency.
+    sample_rate : `pint.Quantity`
+        Sample rate of the data.
+    numtaps : int, optional
+        Length of the filter, which must be odd. See `fir_filter`.
+    chunk_size : int
+        Number of samples filtered at a time, which bounds the memory used. Default 2**20.
+    out : `numpy.ndarray`, optional
+        Array, such as a memory mapped array, in which to place the filtered magnitudes.
+
+    Returns
+    -------
+    filtered : `pint.Quantity` or `numpy.ndarray`
+        Filtered data, in the same units as `data`.
+
+    See Also
+    --------
+    fir_filter, StreamingFilter
+    """
+    taps = fir_filter('highpass', cutoff, sample_rate, numtaps=numtaps)
+    return _filter(data, taps, chunk_size, out)
+
+
+@exporter.export
+def bandpass(data, low, high, sample_rate, numtaps=None, chunk_size=2 ** 20, out=None):
+    """
+    Keep only frequencies between two cutoffs in data.
+
+    Parameters
+    ----------
+    data : `pint.Quantity` or array-like
+        Data to filter along the last axis. Several columns can be filtered together by
+        stacking them into a 2D array. May be a memory mapped array.
+    low, high : `pint.Quantity`
+        Lower and upper cutoff frequencies.
+    sample_rate : `pint.Quantity`
+        Sample rate of the data.
+    numtaps : int, optional
+        Length of the filter, which must be odd. See `fir_filter`.
+    chunk_size : int
+        Number of samples filtered at a time, which bounds the memory used. Default 2**20.
+    out : `numpy.ndarray`, optional
+        Array, such as a memory mapped array, in which to place the filtered magnitudes.
+
+    Returns
+    -------
+    filtered : `pint.Quantity` or `numpy.ndarray`
+        Filtered data, in the same units as `data`.
+
+    See Also
+    --------
+    fir_filter, StreamingFilter
+    """
+    taps = fir_filter('bandpass', (low, high), sample_rate, numtaps=numtaps)
+    return _filter(data, taps, chunk_size, out)
+
+
+@exporter.export
+def fir_filter(kind, cutoff, sample_rate, numtaps=None):
+    """
+    Design a linear phase FIR filter with the windowed sinc method.
+
+    Parameters
+    ----------
+    kind : str
+        'lowpass', 'highpass', or 'bandpass'.
+    cutoff : `pint.Quantity` or tuple of `pint.Quantity`
+        Cutoff frequency, or the low and high cutoff frequencies for 'bandpass'.
+    sample_rate : `pint.Quantity`
+        Sample rate of the data.
+    numtaps : int, optional
+        Length of the filter, which must be odd. Defaults to the length giving a
+        Hamming windowed filter a transition band 20% as wide as the lowest cutoff
+        frequency (or its distance from the Nyquist frequency, if smaller).
+
+    Returns
+    -------
+    taps : `numpy.ndarray`
+        Filter coefficients.
+    """
+    sample_rate = magnitude_in(sample_rate, units.Hz)
+    if isinstance(cutoff, (tuple, list)):
+        edges = np.array([magnitude_in(c, units.Hz) for c in cutoff], dtype=float)
+    else:
+        edges = np.atleast_1d(magnitude_in(cutoff, units.Hz)).astype(float)
+    edges /= sample_rate
+    if kind not in ('lowpass', 'highpass', 'bandpass'):
+        raise ValueError(f'Unknown filter {kind}. Valid filters are lowpass, highpass, and'
+                         ' bandpass.')
+    if len(edges) != (2 if kind == 'bandpass' else 1):
+        raise ValueError(f'Wrong number of cutoff frequencies for a {kind} filter.')
+    if np.any(edges <= 0) or np.any(edges >= 0.5):
+        raise ValueError('Cutoff frequencies must be between zero and the Nyquist frequency.')
+
+    if numtaps is None:
+        transition = 0.2 * min(edges.min(), 0.5 - edges.max())
+        numtaps = int(np.ceil(3.3 / transition)) // 2 * 2 + 1
+    elif numtaps % 2 == 0:
+        raise ValueError('Filters must have an odd number of taps.')
+
+    if kind == 'lowpass':
+        return _lowpass_taps(edges[0], numtaps)
+
+    # Spectral inversion of lowpass filters for the other kinds
+    if kind == 'highpass':
+        taps = -_lowpass_taps(edges[0], numtaps)
+        taps[numtaps // 2] += 1
+        return taps
+    return _lowpass_taps(edges[1], numtaps) - _lowpass_taps(edges[0], numtaps)
+
+
+@exporter.export
+class StreamingFilter:
+    """
+    Apply a linear phase FIR filter to data given a chunk at a time.
+
+    The filter is applied with overlap-save FFT convolution and its delay removed, so the
+    output lines up with the input. The record is extended at both ends by repeating the
+    first and last samples. Only the last ``len(taps) - 1`` samples are kept between
+    chunks, so records of any length are filtered in bounded memory.
+
+    Parameters
+    ----------
+    taps : array-like
+        Filter coefficients, such as from `fir_filter`. Must have an odd length.
+    n_fft : int, optional
+        Length of the FFTs. Defaults to the power of two at least 8 times the filter
+        length.
+    """
+
+    def __init__(self, taps, n_fft=None):
+        """Set up the filter."""
+        self.taps = np.asarray(taps, dtype=float)
+        if len(self.taps) % 2 == 0:
+            raise ValueError('Filters must have an odd number of taps.')
+        self.n_fft = n_fft or max(1 << int(np.ceil(np.log2(8 * len(self.taps)))), 1024)
+        if self.n_fft < len(self.taps):
+            raise ValueError('FFT length must be at least the filter length.')
+        self.units = None
+        self._spectrum = np.fft.rfft(self.taps, self.n_fft)
+        self._buffer = None
+
+    def update(self, chunk):
+        """
+        Filter the next chunk of data.
+
+        Parameters
+        ----------
+        chunk : `pint.Quantity` or array-like
+            Next samples, along the last axis.
+
+        Returns
+        -------
+        filtered : `pint.Quantity` or `numpy.ndarray`
+            Filtered data for as many samples as can be computed so far. The output lags
+            the input by half the filter length until `finalize` is called.
+        """
+        if self.units is None and hasattr(chunk, 'units'):
+            self.units = chunk.units
+        values = np.asarray(magnitude_in(chunk, self.units) if self.units else chunk,
+                            dtype=float)
+
+        if self._buffer is None:
+            if not values.shape[-1]:
+                return self._attach_units(values)
+            self._buffer = np.repeat(values[..., :1], len(self.taps) // 2, axis=-1)
+        return self._attach_units(self._convolve(np.concatenate((self._buffer, values),
+                                                                axis=-1)))
+
+    def finalize(self):
+        """
+        Filter the last samples of the record.
+
+        Returns
+        -------
+        filtered : `pint.Quantity` or `numpy.ndarray`
+            Filtered data for the samples not yet returned by `update`.
+        """
+        if self._buffer is None:
+            return self._attach_units(np.empty(0))
+        padding = np.repeat(self._buffer[..., -1:], len(self.taps) // 2, axis=-1)
+        filtered = self._convolve(np.concatenate((self._buffer, padding), axis=-1))
+        self._buffer = None
+        return self._attach_units(filtered)
+
+    def _convolve(self, values):
+        """Convolve with overlap-save, keeping the unused tail as the next buffer."""
+        n_taps = len(self.taps)
+        n_valid = max(values.shape[-1] - n_taps + 1, 0)
+        step = self.n_fft - n_taps + 1
+        filtered = np.empty(values.shape[:-1] + (n_valid,))
+        for start in range(0, n_valid, step):
+            block = np.fft.irfft(np.fft.rfft(values[..., start:start + self.n_fft], self.n_fft)
+                                 * self._spectrum, self.n_fft)
+            count = min(step, n_valid - start)
+            filtered[..., start:start + count] = block[..., n_taps - 1:n_taps - 1 + count]
+        self._buffer = values[..., n_valid:]
+        return filtered
+
+    def _attach_units(self, values):
+        """Give filtered values the units of the input."""
+        return values * self.units if self.units is not None else values
+
+
+def _lowpass_taps(cutoff, numtaps):
+    """Hamming windowed sinc lowpass filter with unit gain at zero frequency."""
+    n = np.arange(numtaps) - numtaps // 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(numtaps)
+    return taps / taps.sum()
+
+
+def _filter(data, taps, chunk_size, out):
+    """Run a filter over data in chunks, writing the results to out."""
+    values = getattr(data, 'magnitude', data)
+    if out is None:
+        out = np.empty(np.shape(values))
+
+    streaming = StreamingFilter(taps)
+    written = 0
+    for start in range(0, values.shape[-1], chunk_size):
+        filtered = streaming.update(values[..., start:start + chunk_size])
+        out[..., written:written + filtered.shape[-1]] = filtered
+        written += filtered.shape[-1]
+    out[..., written:] = streaming.finalize()
+
+    return out * data.units if hasattr(data, 'units') else out
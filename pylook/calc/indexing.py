@@ -0,0 +1,162 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Contains tools to look up rows of experiment data by time."""
+
+import numpy as np
+
+from ..package_tools import Exporter
+from ..units import magnitude_in, units
+
+exporter = Exporter(globals())
+
+
+@exporter.export
+class TimeIndex:
+    """
+    Look up windows and samples of experiment data by time.
+
+    The time of every row is found once when the index is built, after which every query
+    is a binary search. Windows are returned as views of the data columns, so extracting
+    many windows copies no data.
+
+    Parameters
+    ----------
+    data : dict
+        Columns of experiment data, such as returned by `pylook.io.read_binary`.
+    time : str or `pint.Quantity`, optional
+        Name of the column holding the time of each row, or the times themselves. Must be
+        increasing.
+    rate : str or `pint.Quantity`, optional
+        Name of the column holding the sample rate of each row, or the rates themselves.
+        The time of each row is then the cumulative sum of the sample intervals, as in
+        Look files where the ``Time`` column holds the sample rate. Rates with units of
+        frequency are converted to Hz. Any other units, such as the 'second' that Look
+        files label the rate column with, are taken to mean samples per second. Only one
+        of `time` and `rate` may be given.
+
+    Attributes
+    ----------
+    time : `pint.Quantity`
+        Time of each row.
+    """
+
+    def __init__(self, data, time=None, rate=None):
+        """Build the index."""
+        if (time is None) == (rate is None):
+            raise ValueError('Exactly one of time and rate must be given.')
+
+        self.data = data
+        if rate is not None:
+            rate = data[rate] if isinstance(rate, str) else rate
+            if getattr(rate, 'dimensionality', None) == units.Hz.dimensionality:
+                rate = rate.to('Hz')
+            self.time = np.cumsum(1 / getattr(rate, 'magnitude', rate)) * units('s')
+        else:
+            self.time = data[time] if isinstance(time, str) else time
+        self._times = self.time.magnitude
+
+    def __len__(self):
+        """Get the number of rows in the index."""
+        return len(self._times)
+
+    def bounds(self, start, end):
+        """
+        Find the rows of one or more windows of time.
+
+        Parameters
+        ----------
+        start, end : `pint.Quantity`
+            Start and end times of the windows, both included. May be arrays to look up
+            many windows at once.
+
+        Returns
+        -------
+        first, stop : int or `numpy.ndarray`
+            First row of each window and the row one past its end, so that
+            ``column[first:stop]`` is the window.
+        """
+        first = np.searchsorted(self._times, self._magnitude(start), side='left')
+        stop = np.searchsorted(self._times, self._magnitude(end), side='right')
+        return first, stop
+
+    def rows(self, start, end):
+        """
+        Get the rows of a window of time.
+
+        Parameters
+        ----------
+        start, end : `pint.Quantity`
+            Start and end times of the window, both included.
+
+        Returns
+        -------
+        rows : slice
+            Slice of the rows in the window.
+        """
+        first, stop = self.bounds(start, end)
+        return slice(int(first), int(stop))
+
+    def select(self, start, end):
+        """
+        Get the data in a window of time.
+
+        Parameters
+        ----------
+        start, end : `pint.Quantity`
+            Start and end times of the window, both included.
+
+        Returns
+        -------
+        data : dict
+            Views of every column limited to the window, along with the window of the
+            time under the ``time`` key if that is not already a column.
+        """
+        rows = self.rows(start, end)
+        window = {name: column[rows] for name, column in self.data.items()}
+        window.setdefault('time', self.time[rows])
+        return window
+
+    def nearest(self, times):
+        """
+        Find the rows with times nearest to the given times.
+
+        Parameters
+        ----------
+        times : `pint.Quantity`
+            Times to look up.
+
+        Returns
+        -------
+        rows : int or `numpy.ndarray`
+            Row nearest to each time.
+        """
+        times = self._magnitude(times)
+        after = np.clip(np.searchsorted(self._times, times), 1, len(self._times) - 1)
+        before = after - 1
+        closer = np.abs(times - self._times[before]) <= np.abs(self._times[after] - times)
+        return np.where(closer, before, after)
+
+    def at(self, times):
+        """
+        Get the data at the rows nearest to the given times.
+
+        Parameters
+        ----------
+        times : `pint.Quantity`
+            Times to look up.
+
+        Returns
+        -------
+        data : dict
+            Value of every column, and the ``time``, at the nearest row to each time.
+        """
+        rows = self.nearest(times)
+        samples = {name: column[rows] for name, column in self.data.items()}
+        samples.setdefault('time', self.time[rows])
+        return samples
+
+    def _magnitude(self, times):
+        """Get times as magnitudes in the units of the index."""
+        return magnitude_in(times, self.time.units)
@@ -0,0 +1,585 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""
+Unit-free computational kernels behind the `pylook.calc` functions.
+
+Every kernel works on plain `numpy.ndarray` magnitudes that the caller has already put
+into consistent units. The unit-aware functions in `pylook.calc` resolve units and
+conversion factors once per call, run a kernel, and reattach units to the result. Code
+that does not carry units, such as the r-file interpreter, can call the kernels directly
+and skip the unit handling entirely.
+
+The element-wise kernels (`zero`, `remove_offset`, `remove_offsets`,
+`elastic_correction`, `friction`, and `cumsum`) accept an ``out`` array to write the
+result into. When ``out`` is `None` a new array is allocated. ``out`` may be any of the
+input arrays itself (full aliasing), in which case the input is overwritten with the
+result without any full size temporary arrays being created. Partially overlapping views
+of the inputs are not supported as ``out``. The rolling window kernels always return a
+new array, since each result is padded to the length of the data.
+"""
+
+import numpy as np
+
+from .backend import dispatch, row_chunks, run_chunks
+from ..package_tools import Exporter
+
+exporter = Exporter(globals())
+
+
+@exporter.export
+def zero(data, zero_idx, window=0, value=0, mode='at', out=None):
+    """
+    Zero an array at a given row to zero or another value.
+
+    Parameters
+    ----------
+    data : array-like
+        Data to be operated upon. A 2D array is treated as a stack of records, one per row,
+        which are all zeroed at once.
+    zero_idx : int or array-like
+        Index of value at which we wish to zero the array. One per record for 2D `data`.
+    window : int or array-like
+        Number of data points either side of the zero index to be averaged to get the
+        zero value. The window stops at the ends of the data. May be one per record for
+        2D `data`.
+    value : float or array-like
+        Numeric value, in the units of `data`, to which we set the "zero" point. May be one
+        per record for 2D `data`.
+    mode : string
+        'at', 'before', or 'after'. See `pylook.calc.zero`.
+    out : `numpy.ndarray`, optional
+        Array in which to place the result. May be `data`.
+
+    Returns
+    -------
+    data : `numpy.ndarray`
+        Data with zero applied.
+    """
+    if np.ndim(data) > 1:
+        return _zero_records(data, zero_idx, window, value, mode, out)
+
+    # First we get the value we are going to use as zero - a single value or a mean
+    if window:
+        zero_value = np.mean(data[max(zero_idx - window, 0): zero_idx + window + 1])
+    else:
+        zero_value = data[zero_idx]
+
+    # Zero the data and add any value we want to set the data to in one pass
+    out = _subtract(data, zero_value - value, out)
+
+    # If the mode is before/after we need to zero out those values
+    if mode == 'before':
+        out[0:zero_idx] = out[zero_idx]
+
+    if mode == 'after':
+        out[zero_idx:] = out[zero_idx]
+
+    return out
+
+
+@exporter.export
+def remove_offset(data, start_idx, end_idx, set_between=False, out=None):
+    """
+    Remove offsets in the data.
+
+    Parameters
+    ----------
+    data : array-like
+        Date to be operated upon. A 2D array is treated as a stack of records, one per row,
+        which all have their offset removed at once.
+    start_idx : int or array-like
+        Index that marks the start of the offset. May be one per record for 2D `data`.
+    end_idx : int or array-like
+        Index that marks the end of the offset. May be one per record for 2D `data`.
+    set_between : bool or array-like
+        Set the data after the start point up to the end point to have the
+        value of the start point. May be one per record for 2D `data`. Default is `False`.
+    out : `numpy.ndarray`, optional
+        Array in which to place the result. May be `data`.
+
+    Returns
+    -------
+    data : `numpy.ndarray`
+        Data with offset applied.
+    """
+    if np.ndim(data) > 1:
+        return _remove_offset_records(data, start_idx, end_idx, set_between, out)
+
+    # Grab the scalars we need before anything gets overwritten
+    offset = data[end_idx] - data[start_idx]
+    start_value = data[start_idx]
+
+    if out is None:
+        out = np.empty_like(data, dtype=np.result_type(data, offset))
+
+    # Only the data before the end of the offset needs copying, the rest is computed
+    if out is not data:
+        out[:end_idx] = data[:end_idx]
+    np.subtract(data[end_idx:], offset, out=out[end_idx:])
+
+    if set_between:
+        out[start_idx: end_idx] = start_value
+
+    return out
+
+
+@exporter.export
+def remove_offsets(data, intervals, set_between=False, out=None):
+    """
+    Remove several offsets in the data in a single pass.
+
+    Parameters
+    ----------
+    data : array-like
+        Date to be operated upon.
+    intervals : array-like
+        Sequence of (start index, end index) pairs, one per offset. Intervals may be given
+        in any order, but must not overlap.
+    set_between : bool or sequence of bool
+        Set the data between the start and end of each offset to the value at the start.
+        A single value applies to every interval. Default is `False`.
+    out : `numpy.ndarray`, optional
+        Array in which to place the result. May be `data`.
+
+    Returns
+    -------
+    data : `numpy.ndarray`
+        Data with the offsets removed.
+    """
+    intervals = np.asarray(intervals, dtype=np.intp).reshape(-1, 2)
+    set_between = np.broadcast_to(set_between, len(intervals))
+
+    order = np.argsort(intervals[:, 0], kind='stable')
+    starts, ends = intervals[order].T
+    set_between = set_between[order]
+
+    if np.any(ends < starts):
+        raise ValueError('Offset intervals must end after they start.')
+    if np.any(starts[1:] < ends[:-1]):
+        raise ValueError('Offset intervals must not overlap.')
+
+    # For non-overlapping intervals every offset is the same as in the raw data, so the
+    # correction is a step function that accumulates at the end of each interval.
+    offsets = data[ends] - data[starts]
+    start_values = data[starts]
+    steps = np.cumsum(offsets)
+
+    if out is None:
+        out = np.empty_like(data, dtype=np.result_type(data, offsets))
+
+    if len(ends) == 0:
+        out[...] = data
+        return out
+
+    if out is not data:
+        out[:ends[0]] = data[:ends[0]]
+
+    # Each row is touched once, the segment between consecutive interval ends is shifted
+    # by the total of all the offsets before it.
+    bounds = np.append(ends, len(data))
+    for i, step in enumerate(steps):
+        segment = slice(bounds[i], bounds[i + 1])
+        np.subtract(data[segment], step, out=out[segment])
+
+    for i in np.flatnonzero(set_between):
+        previous_step = steps[i - 1] if i else 0
+        out[starts[i]: ends[i]] = start_values[i] - previous_step
+
+    return out
+
+
+@exporter.export
+def elastic_correction(load, displacement, coeffs, out=None):
+    """
+    Perform an elastic correction on a single axis of data.
+
+    Parameters
+    ----------
+    load : array-like
+        Load/Force data
+    displacement : array-like
+        Displacement data
+    coeffs : list
+        list of coefficients from highest power to lowest. Coefficient ``i`` must be in
+        units of displacement / load ** (len(coeffs) - 1 - i). For 2D data, which is treated
+        as a stack of records with one per row, each coefficient may be an array with one
+        value per record.
+    out : `numpy.ndarray`, optional
+        Array in which to place the result. May be `load` or `displacement`.
+
+    Returns
+    -------
+    displacement : `numpy.ndarray`
+        Displacement with the elastic correction applied
+
+    Notes
+    -----
+    When `out` is one of the inputs a single scratch array is needed to evaluate the
+    polynomial, otherwise the polynomial is evaluated directly in `out`.
+    """
+    if out is None:
+        out = np.empty(np.broadcast(load, displacement).shape,
+                       dtype=np.result_type(load, displacement, *coeffs))
+
+    chunks = row_chunks(out.shape[-1]) if out.ndim else None
+    if chunks:
+        n = out.shape[-1]
+        run_chunks(lambda rows: elastic_correction(_rows(load, rows, n),
+                                                   _rows(displacement, rows, n), coeffs,
+                                                   out=out[..., rows]), chunks)
+        return out
+
+    if np.ndim(load) > 1 or np.ndim(displacement) > 1:
+        # Per record coefficients apply along the rows
+        coeffs = [np.expand_dims(c, -1) if np.ndim(c) else c for c in coeffs]
+
+    if np.may_share_memory(out, load) or np.may_share_memory(out, displacement):
+        correction = np.empty_like(out)
+    else:
+        correction = out
+
+    # Horner's method evaluated in place
+    if len(coeffs) == 1:
+        correction[...] = coeffs[0]
+    else:
+        np.multiply(load, coeffs[0], out=correction)
+        correction += coeffs[1]
+        for c in coeffs[2:]:
+            correction *= load
+            correction += c
+
+    return np.subtract(displacement, correction, out=out)
+
+
+@exporter.export
+def friction(shear_component, normal_component, scale=1, out=None):
+    """
+    Calculate the simple friction.
+
+    Parameters
+    ----------
+    shear_component : array-like
+        Shear component of load/force/stress
+    normal_component : array-like
+        Normal component of load/force/stress
+    scale : float
+        Factor converting the ratio of the component units to the desired result units.
+    out : `numpy.ndarray`, optional
+        Array in which to place the result. May be either of the components.
+
+    Returns
+    -------
+    friction : `numpy.ndarray`
+        Simple friction value
+
+    Notes
+    -----
+    The normal component is treated as having a minimum value of 1e-16.
+    """
+    if out is None:
+        out = np.empty(np.broadcast(shear_component, normal_component).shape,
+                       dtype=np.result_type(shear_component, normal_component, float))
+
+    chunks = row_chunks(out.shape[-1]) if out.ndim else None
+    if chunks:
+        n = out.shape[-1]
+        run_chunks(lambda rows: friction(_rows(shear_component, rows, n),
+                                         _rows(normal_component, rows, n), scale,
+                                         out=out[..., rows]), chunks)
+        return out
+
+    if np.may_share_memory(out, shear_component):
+        # We cannot stage the clipped normal component in out without losing the shear
+        # component, so divide the two parts separately.
+        small = normal_component < 1e-16
+        np.divide(shear_component, 1e-16, out=out, where=small)
+        np.divide(shear_component, normal_component, out=out, where=~small)
+    else:
+        np.maximum(normal_component, 1e-16, out=out)
+        np.divide(shear_component, out, out=out)
+
+    if scale != 1:
+        out *= scale
+    return out
+
+
+@exporter.export
+def cumsum(data, carry=0, out=None):
+    """
+    Calculate the cumulative sum, continuing from a running total.
+
+    Parameters
+    ----------
+    data : array-like
+        Data to sum.
+    carry : float
+        Total of the data before these, such as the last sum of the previous chunk.
+    out : `numpy.ndarray`, optional
+        Array in which to place the result. May be `data`.
+
+    Returns
+    -------
+    sums : `numpy.ndarray`
+        Cumulative sums.
+
+    Notes
+    -----
+    The carry is added to the first value and the sums then accumulated one after another,
+    so summing a record in chunks, passing each chunk the last sum of the one before, gives
+    exactly the same floating point results as summing it at once.
+
+    With more than one thread (see `pylook.calc.set_num_threads`) long records are summed
+    in two passes: every chunk is summed on its own, then the totals of the chunks before
+    it are added. The results can then differ from the single threaded sums in the last
+    bits.
+    """
+    if out is None:
+        out = np.empty(np.shape(data), dtype=np.result_type(data, float))
+    if out is not data:
+        out[...] = data
+    if not len(out):
+        return out
+    out[0] += carry
+
+    chunks = row_chunks(len(out))
+    if chunks is None:
+        return _cumsum_scan(out)
+
+    run_chunks(lambda rows: np.cumsum(out[rows], out=out[rows]), chunks)
+    offsets = np.cumsum([out[rows.stop - 1] for rows in chunks[:-1]])
+    run_chunks(lambda job: np.add(out[job[0]], job[1], out=out[job[0]]),
+               zip(chunks[1:], offsets))
+    return out
+
+
+@exporter.export
+def rolling_mean(data, window):
+    """
+    Calculate the mean over a moving window.
+
+    Parameters
+    ----------
+    data : array-like
+        Data to average.
+    window : int
+        Number of rows in the window.
+
+    Returns
+    -------
+    mean : `numpy.ndarray`
+        Mean of the window centered on each row. NaN where the window is incomplete.
+    """
+    reference, sums = _window_sums(data, window)
+    return _pad_window_result(reference + sums / window, len(data), window)
+
+
+@exporter.export
+def rolling_std(data, window, ddof=0):
+    """
+    Calculate the standard deviation over a moving window.
+
+    Parameters
+    ----------
+    data : array-like
+        Data to use.
+    window : int
+        Number of rows in the window.
+    ddof : int
+        Delta degrees of freedom. Default 0.
+
+    Returns
+    -------
+    std : `numpy.ndarray`
+        Standard deviation of the window centered on each row. NaN where the window is
+        incomplete.
+    """
+    _, sums = _window_sums(data, window)
+    _, sums_squared = _window_sums(data, window, square=True)
+    variance = (sums_squared - sums * sums / window) / (window - ddof)
+    # Round off can leave tiny negative variances for flat data
+    np.maximum(variance, 0, out=variance)
+    return _pad_window_result(np.sqrt(variance, out=variance), len(data), window)
+
+
+@exporter.export
+def rolling_slope(x, y, window):
+    """
+    Calculate the least squares slope of y against x over a moving window.
+
+    Parameters
+    ----------
+    x : array-like
+        Independent variable.
+    y : array-like
+        Dependent variable.
+    window : int
+        Number of rows in the window.
+
+    Returns
+    -------
+    slope : `numpy.ndarray`
+        Slope of the line fit in the window centered on each row. NaN where the window is
+        incomplete.
+    """
+    _, sum_x = _window_sums(x, window)
+    _, sum_y = _window_sums(y, window)
+    _, sum_xx = _window_sums(x, window, square=True)
+    _, sum_xy = _window_sums(x, window, other=y)
+
+    sxy = sum_xy - sum_x * sum_y / window
+    sxx = sum_xx - sum_x * sum_x / window
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.divide(sxy, sxx, out=sxy)
+    return _pad_window_result(slope, len(y), window)
+
+
+@dispatch('kernels.cumsum')
+def _cumsum_scan(out):
+    """Accumulate an array in place, one value after another."""
+    return np.cumsum(out, out=out)
+
+
+def _rows(values, rows, n):
+    """Select rows of an argument that runs along the last axis, leaving others as is."""
+    if np.ndim(values) and np.shape(values)[-1] == n:
+        return values[..., rows]
+    return values
+
+
+def _subtract(data, amount, out):
+    """Subtract a scalar from data, in chunks on the thread pool for long records."""
+    chunks = row_chunks(np.shape(data)[-1]) if np.ndim(data) else None
+    if chunks is None:
+        return np.subtract(data, amount, out=out)
+    if out is None:
+        out = np.empty(np.shape(data), dtype=np.result_type(data, amount))
+    run_chunks(lambda rows: np.subtract(data[..., rows], amount, out=out[..., rows]),
+               chunks)
+    return out
+
+
+def _zero_records(data, zero_idx, window, value, mode, out):
+    """Zero each row of a 2D array with its own index, window, and value."""
+    n_records, n = data.shape
+    records = np.arange(n_records)
+    zero_idx = np.broadcast_to(zero_idx, n_records)
+    window = np.broadcast_to(window, n_records)
+
+    # Average the window of every record at once, leaving out points beyond the ends
+    offsets = np.arange(-window.max(), window.max() + 1)
+    columns = zero_idx[:, np.newaxis] + offsets
+    valid = (np.abs(offsets) <= window[:, np.newaxis]) & (columns >= 0) & (columns < n)
+    samples = data[records[:, np.newaxis], np.clip(columns, 0, n - 1)]
+    zero_value = np.sum(samples, axis=1, where=valid) / valid.sum(axis=1)
+
+    shift = zero_value - value
+    out = np.subtract(data, np.expand_dims(shift, -1), out=out)
+
+    if mode in ('before', 'after'):
+        rows = np.arange(n)
+        fill = out[records, zero_idx][:, np.newaxis]
+        if mode == 'before':
+            np.copyto(out, fill, where=rows < zero_idx[:, np.newaxis])
+        else:
+            np.copyto(out, fill, where=rows >= zero_idx[:, np.newaxis])
+
+    return out
+
+
+def _remove_offset_records(data, start_idx, end_idx, set_between, out):
+    """Remove an offset from each row of a 2D array with its own interval."""
+    n_records, n = data.shape
+    records = np.arange(n_records)
+    start_idx = np.broadcast_to(start_idx, n_records)
+    end_idx = np.broadcast_to(end_idx, n_records)
+    set_between = np.broadcast_to(set_between, n_records)
+
+    start_value = data[records, start_idx]
+    offset = data[records, end_idx] - start_value
+
+    if out is None:
+        out = np.empty_like(data, dtype=np.result_type(data, offset))
+
+    rows = np.arange(n)
+    after = rows >= end_idx[:, np.newaxis]
+    if out is not data:
+        np.copyto(out, data, where=~after)
+    np.subtract(data, offset[:, np.newaxis], out=out, where=after)
+
+    between = ((rows >= start_idx[:, np.newaxis]) & ~after) & set_between[:, np.newaxis]
+    np.copyto(out, start_value[:, np.newaxis], where=between)
+
+    return out
+
+
+def _window_sums(data, window, square=False, other=None):
+    """
+    Calculate sums over every complete moving window in O(n) with cumulative sums.
+
+    Parameters
+    ----------
+    data : array-like
+        Data to sum.
+    window : int
+        Number of rows in the window.
+    square : bool
+        Sum the squares of the data, rather than the data.
+    other : array-like, optional
+        Sum the product of `data` and `other`, rather than the data.
+
+    Returns
+    -------
+    reference : `numpy.ndarray`
+        Value removed from the data before summing, for each window.
+    sums : `numpy.ndarray`
+        Sums of the centered values for each of the ``n - window + 1`` complete windows.
+
+    Notes
+    -----
+    The windows are summed in blocks of ``4 * window`` windows. Each block takes its own
+    cumulative sum after removing the mean of the rows it covers, so the running totals
+    stay the size of a few windows however long the record is, and differencing them
+    loses as little precision as possible. Centering does not change the variance and
+    covariance terms built from these sums, as long as `data` and `other` are centered
+    in the same blocks, which they are for the same length and window.
+    """
+    if not 1 <= window <= len(data):
+        raise ValueError(f'Window of {window} rows must be between 1 and the data length.')
+
+    n_windows = len(data) - window + 1
+    block = 4 * window
+    n_blocks = -(-n_windows // block)
+
+    reference, values = _centered_blocks(data, window, block, n_blocks)
+    if square:
+        values *= values
+    elif other is not None:
+        values *= _centered_blocks(other, window, block, n_blocks)[1]
+
+    totals = np.zeros((n_blocks, values.shape[1] + 1))
+    np.cumsum(values, axis=1, out=totals[:, 1:])
+    sums = totals[:, window:] - totals[:, :-window]
+    return np.repeat(reference, block)[:n_windows], sums.ravel()[:n_windows]
+
+
+def _centered_blocks(data, window, block, n_blocks):
+    """Split data into overlapping blocks covering each run of windows, less their mean."""
+    values = np.asarray(data, dtype=float)
+    length = n_blocks * block + window - 1
+    if len(values) < length:
+        values = np.pad(values, (0, length - len(values)), mode='edge')
+    blocks = np.lib.stride_tricks.as_strided(
+        values, shape=(n_blocks, block + window - 1),
+        strides=(block * values.strides[0], values.strides[0]), writeable=False)
+    reference = blocks.mean(axis=1)
+    return reference, blocks - reference[:, np.newaxis]
+
+
+def _pad_window_result(result, n, window):
+    """Place results of complete windows at the window centers, padding with NaN."""
+    out = np.full(n, np.nan)
+    start = window // 2
+    out[start:start + len(result)] = result
+    return out
@@ -0,0 +1,168 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Contains tools to put data onto regular grids and to line up several runs."""
+
+import numpy as np
+
+from ..package_tools import Exporter
+from ..units import magnitude_in, units
+
+exporter = Exporter(globals())
+
+
+@exporter.export
+def resample(data, grid, method='linear', x=None):
+    """
+    Resample every column of experiment data onto a grid.
+
+    The rows bracketing each grid point are found once and shared by every column.
+
+    Parameters
+    ----------
+    data : dict
+        Columns of experiment data.
+    grid : `pint.Quantity` or array-like
+        Increasing values of `x` to resample at, such as evenly spaced times.
+    method : str
+        'linear' (default) interpolates linearly between the rows either side of each grid
+        point. 'nearest' takes the row nearest to each grid point. 'block_mean' averages
+        the rows closer to each grid point than to its neighbors, which is the best choice
+        when downsampling noisy data.
+    x : str or `pint.Quantity`, optional
+        Name of the increasing column to resample against, such as time or displacement,
+        or the values themselves. Look files hold the sample rate rather than the time in
+        their ``Time`` column, so there is no time column to default to. By default the
+        grid is in rows, which may be fractional.
+
+    Returns
+    -------
+    resampled : dict
+        Resampled columns, with the same keys and units as `data`. Grid points outside of
+        the data, or with no rows for 'block_mean', are NaN.
+    """
+    if x is None:
+        n_rows = len(next(iter(data.values())))
+        x_values = units.Quantity(np.arange(n_rows, dtype=float), units.dimensionless)
+    else:
+        x_values = data[x] if isinstance(x, str) else x
+    xs = x_values.magnitude
+    grid_values = np.asarray(magnitude_in(grid, x_values.units), dtype=float)
+
+    if method == 'linear':
+        resampler = _linear_resampler(xs, grid_values)
+    elif method == 'nearest':
+        resampler = _nearest_resampler(xs, grid_values)
+    elif method == 'block_mean':
+        resampler = _block_mean_resampler(xs, grid_values)
+    else:
+        raise ValueError(f'Unknown resampling method {method}. Valid methods are linear,'
+                         ' nearest, and block_mean.')
+
+    resampled = {}
+    for name, column in data.items():
+        values = resampler(getattr(column, 'magnitude', column))
+        resampled[name] = values * column.units if hasattr(column, 'units') else values
+    return resampled
+
+
+@exporter.export
+def align(runs, x, step=None, method='linear'):
+    """
+    Resample several runs onto one grid covering the range they all share.
+
+    Parameters
+    ----------
+    runs : sequence of dict
+        Columns of data of each run.
+    x : str
+        Name of the increasing column, such as time or displacement, to align the runs on.
+    step : `pint.Quantity`, optional
+        Spacing of the grid. Defaults to the largest median row spacing of the runs, so
+        that no run is upsampled on average.
+    method : str
+        Resampling method. See `resample`.
+
+    Returns
+    -------
+    grid : `pint.Quantity`
+        Common grid of `x`.
+    aligned : list of dict
+        Each run resampled onto `grid`.
+    """
+    x_units = runs[0][x].units
+    values = [magnitude_in(run[x], x_units) for run in runs]
+    start = max(v[0] for v in values)
+    end = min(v[-1] for v in values)
+    if end <= start:
+        raise ValueError('Runs do not overlap.')
+
+    if step is None:
+        step = max(np.median(np.diff(v)) for v in values)
+    else:
+        step = magnitude_in(step, x_units)
+
+    grid = np.arange(int(np.floor((end - start) / step)) + 1) * step + start
+    grid = grid * x_units
+    return grid, [resample(run, grid, method=method, x=x) for run in runs]
+
+
+def _linear_resampler(xs, grid):
+    """Make a function interpolating columns linearly onto the grid."""
+    n = len(xs)
+    left = np.clip(np.searchsorted(xs, grid, side='right') - 1, 0, max(n - 2, 0))
+    right = np.minimum(left + 1, n - 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = np.where(right > left, (grid - xs[left]) / (xs[right] - xs[left]), 0)
+    outside = (grid < xs[0]) | (grid > xs[-1])
+
+    def resampler(column):
+        low = column[left]
+        result = low + weight * (column[right] - low)
+        result[outside] = np.nan
+        return result
+
+    return resampler
+
+
+def _nearest_resampler(xs, grid):
+    """Make a function taking the nearest row of columns at each grid point."""
+    after = np.clip(np.searchsorted(xs, grid), 1, len(xs) - 1)
+    before = after - 1
+    rows = np.where(np.abs(grid - xs[before]) <= np.abs(xs[after] - grid), before, after)
+    outside = (grid < xs[0]) | (grid > xs[-1])
+
+    def resampler(column):
+        result = column[rows].astype(float)
+        result[outside] = np.nan
+        return result
+
+    return resampler
+
+
+def _block_mean_resampler(xs, grid):
+    """Make a function averaging the rows of columns in the cell around each grid point."""
+    # Cells extend halfway to the neighboring grid points
+    edges = np.empty(len(grid) + 1)
+    edges[1:-1] = (grid[1:] + grid[:-1]) / 2
+    if len(grid) > 1:
+        edges[0] = grid[0] - (grid[1] - grid[0]) / 2
+        edges[-1] = grid[-1] + (grid[-1] - grid[-2]) / 2
+    else:
+        edges[[0, -1]] = -np.inf, np.inf
+    bounds = np.searchsorted(xs, edges, side='left')
+    counts = np.diff(bounds)
+
+    def resampler(column):
+        # Each cell is summed on its own, so round off depends on the cell length and not
+        # on the length of the record. The zero after the last cell keeps every start
+        # index in range for reduceat.
+        values = np.zeros(bounds[-1] + 1)
+        values[:-1] = column[:bounds[-1]]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = np.add.reduceat(values, bounds[:-1]) / counts
+        means[counts == 0] = np.nan
+        return means
+
+    return resampler
@@ -0,0 +1,488 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""
+Rate and state friction modeling and inversion.
+
+The model is a single degree of freedom spring-slider. The load point moves at a given
+velocity and the slider obeys rate and state friction with one or two state variables
+evolving with the aging (Dieterich) or slip (Ruina) law. The equations are integrated with
+an adaptive Dormand-Prince Runge-Kutta scheme. Fits of the friction parameters to velocity
+steps replace the ``qi`` workflow of Xlook.
+
+State is carried internally as ``psi = ln(v0 * theta / dc)``, which keeps the equations
+well scaled over the many orders of magnitude state can change by.
+"""
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .backend import dispatch, get_backend, set_backend
+from ..package_tools import Exporter
+from ..units import magnitude_in, units
+
+exporter = Exporter(globals())
+
+_velocity_units = units.micron / units.s
+_length_units = units.micron
+_stiffness_units = 1 / units.micron
+
+# Dormand-Prince 5(4) coefficients, row i of _A gives the weights of the earlier stages used
+# to evaluate stage i and _E gives the weights of the embedded error estimate.
+_A = np.zeros((7, 7))
+_A[1, :1] = [1 / 5]
+_A[2, :2] = [3 / 40, 9 / 40]
+_A[3, :3] = [44 / 45, -56 / 15, 32 / 9]
+_A[4, :4] = [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729]
+_A[5, :5] = [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656]
+_A[6, :6] = [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84]
+_E = np.array([71 / 57600, 0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40])
+
+RSFFit = namedtuple('RSFFit', ['a', 'b', 'dc', 'k', 'mu0', 'errors', 'rms', 'iterations',
+                               'converged', 'friction'])
+RSFFit.__doc__ = """Result of fitting rate and state parameters to a velocity step.
+
+Parameter values are quantities. `errors` is a dictionary of the standard errors of the
+fit parameters, `rms` the root mean square misfit, and `friction` the best fit model.
+"""
+exporter.export(RSFFit)
+
+
+@exporter.export
+def forward_model(time, load_velocity, a, b, dc, k, mu0=0.6, v0=None, law='aging',
+                  rtol=1e-8, atol=1e-10):
+    """
+    Calculate friction for a spring-slider with rate and state friction.
+
+    The slider starts at steady state at the first load point velocity.
+
+    Parameters
+    ----------
+    time : `pint.Quantity`
+        Times at which to calculate friction.
+    load_velocity : `pint.Quantity`
+        Load point velocity from each time to the next. A single value applies to the
+        whole record.
+    a : float
+        Direct effect.
+    b : float or sequence
+        Evolution effect. Give two values for a model with two state variables.
+    dc : `pint.Quantity`
+        Critical slip distance, with one value for each `b`.
+    k : `pint.Quantity`
+        Stiffness in friction per displacement (i.e. stiffness divided by normal stress).
+    mu0 : float
+        Steady state friction at the reference velocity. Default 0.6.
+    v0 : `pint.Quantity`, optional
+        Reference velocity. Defaults to the first load point velocity.
+    law : str
+        State evolution law, 'aging' (default) or 'slip'.
+    rtol, atol : float
+        Relative and absolute error tolerances for the integration.
+
+    Returns
+    -------
+    friction : `pint.Quantity`
+        Modeled friction at each time.
+    """
+    time = magnitude_in(time, units.s)
+    load_velocity = np.broadcast_to(magnitude_in(load_velocity, _velocity_units), time.shape)
+    v0 = load_velocity[0] if v0 is None else magnitude_in(v0, _velocity_units)
+
+    friction = _integrate(time, load_velocity, *_batch_parameters(
+        a, b, magnitude_in(dc, _length_units), magnitude_in(k, _stiffness_units), mu0),
+        v0=v0, law=law, rtol=rtol, atol=atol)
+    return units.Quantity(friction[0], 'dimensionless')
+
+
+@exporter.export
+def fit(time, load_velocity, friction, a, b, dc, k, mu0=None, v0=None, law='aging',
+        fit_k=False, max_iterations=100, tolerance=1e-10):
+    """
+    Fit rate and state parameters to a velocity step with a least squares inversion.
+
+    Parameters
+    ----------
+    time : `pint.Quantity`
+        Time of each friction observation.
+    load_velocity : `pint.Quantity`
+        Load point velocity from each time to the next. A single value applies to the
+        whole record.
+    friction : `pint.Quantity`
+        Observed friction, such as a slice of the output of `pylook.calc.friction`.
+    a : float
+        Initial guess of the direct effect.
+    b : float or sequence
+        Initial guess of the evolution effect. Give two values to fit a model with two
+        state variables.
+    dc : `pint.Quantity`
+        Initial guess of the critical slip distance, with one value for each `b`.
+    k : `pint.Quantity`
+        Stiffness in friction per displacement. Held fixed unless `fit_k` is set.
+    mu0 : float, optional
+        Steady state friction at `v0`. Defaults to the first friction observation.
+    v0 : `pint.Quantity`, optional
+        Reference velocity. Defaults to the first load point velocity.
+    law : str
+        State evolution law, 'aging' (default) or 'slip'.
+    fit_k : bool
+        Fit the stiffness as well. Default `False`.
+    max_iterations : int
+        Maximum number of Levenberg-Marquardt iterations. Default 100.
+    tolerance : float
+        Relative change in misfit at which the fit is considered converged.
+
+    Returns
+    -------
+    fit : `RSFFit`
+        Best fit parameters, their standard errors, and the model. ``converged`` is
+        `False` when the misfit stopped improving before its relative change fell below
+        `tolerance`, such as when the data do not constrain the parameters.
+
+    See Also
+    --------
+    fit_steps
+    """
+    time, load_velocity, friction, v0, guesses = _fit_inputs(time, load_velocity,
+                                                             friction, a, b, dc, k, v0)
+    result = _fit(time, load_velocity, friction, *guesses, mu0=mu0, v0=v0, law=law,
+                  fit_k=fit_k, max_iterations=max_iterations, tolerance=tolerance)
+    return _attach_fit_units(result)
+
+
+@exporter.export
+def fit_steps(steps, a, b, dc, k, workers=None, **kwargs):
+    """
+    Fit rate and state parameters to many velocity steps in parallel.
+
+    Parameters
+    ----------
+    steps : iterable
+        (time, load velocity, friction) for each velocity step.
+    a, b, dc, k : see `fit`
+        Initial guesses used for every step.
+    workers : int, optional
+        Number of processes to use. Defaults to the number of processors. With 1 the fits
+        run one after the other in this process.
+    kwargs
+        Other arguments passed to `fit`.
+
+    Returns
+    -------
+    fits : list of `RSFFit`
+        Fit for each step, in order.
+    """
+    # Only plain arrays are sent to the worker processes
+    v0 = kwargs.pop('v0', None)
+    jobs = [_fit_inputs(time, velocity, friction, a, b, dc, k, v0)
+            for time, velocity, friction in steps]
+    jobs = [(time, velocity, friction) + tuple(guesses) + (v0,)
+            for time, velocity, friction, v0, guesses in jobs]
+
+    if workers == 1:
+        results = [_fit_job(job, kwargs) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=set_backend,
+                                 initargs=(get_backend(),)) as executor:
+            results = list(executor.map(_fit_job, jobs, [kwargs] * len(jobs)))
+
+    return [_attach_fit_units(result) for result in results]
+
+
+def _fit_job(job, kwargs):
+    """Run a single fit from plain arrays, in a worker process."""
+    *arrays, v0 = job
+    return _fit(*arrays, v0=v0, **kwargs)
+
+
+def _fit_inputs(time, load_velocity, friction, a, b, dc, k, v0):
+    """Strip units from the fit inputs."""
+    time = magnitude_in(time, units.s)
+    load_velocity = np.broadcast_to(magnitude_in(load_velocity, _velocity_units), time.shape)
+    friction = magnitude_in(friction, units.dimensionless)
+    v0 = load_velocity[0] if v0 is None else magnitude_in(v0, _velocity_units)
+    guesses = (a, b, magnitude_in(dc, _length_units), magnitude_in(k, _stiffness_units))
+    return time, load_velocity, friction, v0, guesses
+
+
+def _attach_fit_units(result):
+    """Put units on a fit made with plain arrays."""
+    errors = dict(result.errors)
+    errors['dc'] = units.Quantity(errors['dc'], _length_units)
+    if 'k' in errors:
+        errors['k'] = units.Quantity(errors['k'], _stiffness_units)
+    return result._replace(dc=units.Quantity(result.dc, _length_units),
+                           k=units.Quantity(result.k, _stiffness_units),
+                           errors=errors,
+                           friction=units.Quantity(result.friction, 'dimensionless'))
+
+
+def _batch_parameters(a, b, dc, k, mu0):
+    """
+    Shape model parameters for a batch of models.
+
+    Returns
+    -------
+    a, k, mu0 : `numpy.ndarray`
+        Arrays of shape (number of models,).
+    b, dc : `numpy.ndarray`
+        Arrays of shape (number of models, number of state variables).
+    """
+    b = np.atleast_1d(np.asarray(b, dtype=float))
+    dc = np.atleast_1d(np.asarray(dc, dtype=float))
+    b, dc = np.atleast_2d(b), np.atleast_2d(dc)
+    n_models = max(len(b), len(dc), np.size(a), np.size(k), np.size(mu0))
+
+    def column(values):
+        return np.broadcast_to(np.asarray(values, dtype=float).ravel(), (n_models,))
+
+    n_states = b.shape[-1]
+    if dc.shape[-1] != n_states:
+        raise ValueError('There must be one critical slip distance for each b value.')
+    if n_states not in (1, 2):
+        raise ValueError('Models may have one or two state variables.')
+
+    return (column(a), np.broadcast_to(b, (n_models, n_states)),
+            np.broadcast_to(dc, (n_models, n_states)), column(k), column(mu0))
+
+
+def _derivatives(y, load_velocity, a, b, dc, k, mu0, v0, slip_law):
+    """
+    Calculate the time derivatives of friction and state.
+
+    Parameters
+    ----------
+    y : `numpy.ndarray`
+        Friction in the first column and ``psi`` for each state variable in the rest, one
+        row per model.
+    load_velocity : float
+        Load point velocity.
+
+    Returns
+    -------
+    dydt : `numpy.ndarray`
+        Time derivative of `y`.
+    """
+    psi = y[:, 1:]
+    velocity = v0 * np.exp((y[:, 0] - mu0 - (b * psi).sum(axis=1)) / a)
+    dydt = np.empty_like(y)
+    dydt[:, 0] = k * (load_velocity - velocity)
+    velocity = velocity[:, np.newaxis]
+    if slip_law:
+        dydt[:, 1:] = -velocity / dc * (psi + np.log(velocity / v0))
+    else:
+        dydt[:, 1:] = (v0 * np.exp(-psi) - velocity) / dc
+    return dydt
+
+
+@dispatch('rsf.integrate')
+def _integrate(time, load_velocity, a, b, dc, k, mu0, v0, law='aging', rtol=1e-8,
+               atol=1e-10, max_steps=1000000):
+    """
+    Integrate a batch of spring-slider models.
+
+    All of the models share their time steps, which are chosen to meet the tolerances in
+    every model. This makes finite difference derivatives with respect to the parameters
+    smooth, as the integration error is the same for each model.
+
+    Parameters
+    ----------
+    time : `numpy.ndarray`
+        Output times.
+    load_velocity : `numpy.ndarray`
+        Load point velocity from each time to the next.
+    a, b, dc, k, mu0 : `numpy.ndarray`
+        Model parameters from `_batch_parameters`.
+    v0 : float
+        Reference velocity.
+
+    Returns
+    -------
+    friction : `numpy.ndarray`
+        Friction for each model (rows) at each time (columns).
+    """
+    if law not in ('aging', 'slip'):
+        raise ValueError(f'Unknown state evolution law {law}. Valid laws are aging and slip.')
+    slip_law = law == 'slip'
+    parameters = (a, b, dc, k, mu0, v0, slip_law)
+
+    n = len(time)
+    friction = np.empty((len(a), n))
+
+    # Start at steady state for the initial load point velocity
+    y = np.empty((len(a), 1 + b.shape[1]))
+    y[:, 1:] = np.log(v0 / load_velocity[0])
+    y[:, 0] = mu0 + (a - np.sum(b, axis=1)) * np.log(load_velocity[0] / v0)
+    friction[:, 0] = y[:, 0]
+
+    # Integrate each stretch of constant load point velocity separately
+    changes = np.flatnonzero(np.diff(load_velocity[:-1])) + 1
+    starts = np.concatenate(([0], changes))
+    ends = np.concatenate((changes, [n - 1]))
+
+    steps = 0
+    for start, end in zip(starts, ends):
+        velocity = load_velocity[start]
+        t = time[start]
+        f = _derivatives(y, velocity, *parameters)
+        h = _initial_step(y, f, rtol, atol, time[end] - t)
+        next_out = start + 1
+
+        while next_out <= end:
+            steps += 1
+            if steps > max_steps:
+                raise RuntimeError('Rate and state integration exceeded the maximum number '
+                                   'of steps.')
+            h = min(h, time[end] - t)
+            y_new, f_new, error = _dormand_prince_step(y, f, h, velocity, parameters)
+            scale = atol + rtol * np.maximum(np.abs(y), np.abs(y_new))
+            norm = np.sqrt(((error / scale) ** 2).mean(axis=1).max())
+
+            if not np.isfinite(norm) or norm > 1:
+                h *= 0.2 if not np.isfinite(norm) else max(0.2, 0.9 * norm ** -0.2)
+                if t + h == t:
+                    raise RuntimeError('Rate and state integration step size underflow.')
+                continue
+
+            # Cubic Hermite interpolation of friction at the output times in this step
+            t_new = time[end] if h == time[end] - t else t + h
+            last_out = min(np.searchsorted(time, t_new, side='right') - 1, end)
+            if last_out >= next_out:
+                theta = (time[next_out:last_out + 1] - t) / h
+                h00 = (1 + 2 * theta) * (1 - theta) ** 2
+                h10 = theta * (1 - theta) ** 2
+                h01 = theta ** 2 * (3 - 2 * theta)
+                h11 = theta ** 2 * (theta - 1)
+                friction[:, next_out:last_out + 1] = (
+                    np.outer(y[:, 0], h00) + np.outer(h * f[:, 0], h10)
+                    + np.outer(y_new[:, 0], h01) + np.outer(h * f_new[:, 0], h11))
+                next_out = last_out + 1
+
+            t, y, f = t_new, y_new, f_new
+            h *= min(5, 0.9 * norm ** -0.2) if norm > 0 else 5
+
+    return friction
+
+
+def _initial_step(y, f, rtol, atol, span):
+    """Estimate a starting step size from the scale of the solution and derivative."""
+    scale = atol + rtol * np.abs(y)
+    d0 = np.sqrt(np.mean((y / scale) ** 2))
+    d1 = np.sqrt(np.mean((f / scale) ** 2))
+    h = 0.01 * d0 / d1 if (d0 > 1e-5 and d1 > 1e-5) else 1e-6
+    return min(h, span)
+
+
+def _dormand_prince_step(y, f, h, load_velocity, parameters):
+    """Take one Dormand-Prince step, returning the new state, its derivative and error."""
+    stages = np.empty((7, y.size))
+    stages[0] = f.ravel()
+    for i in range(1, 7):
+        y_stage = y + h * (_A[i, :i] @ stages[:i]).reshape(y.shape)
+        stages[i] = _derivatives(y_stage, load_velocity, *parameters).ravel()
+    # The last stage is evaluated at the new state (first same as last)
+    error = h * (_E @ stages).reshape(y.shape)
+    return y_stage, stages[-1].reshape(y.shape), error
+
+
+def _fit(time, load_velocity, friction, a, b, dc, k, mu0=None, v0=None, law='aging',
+         fit_k=False, max_iterations=100, tolerance=1e-10):
+    """
+    Fit rate and state parameters with Levenberg-Marquardt on plain arrays.
+
+    The positive parameters (a, dc, and k) are fit as logarithms.
+    """
+    mu0 = friction[0] if mu0 is None else mu0
+    v0 = load_velocity[0] if v0 is None else v0
+    b = np.atleast_1d(np.asarray(b, dtype=float))
+    dc = np.atleast_1d(np.asarray(dc, dtype=float))
+    n_states = len(b)
+
+    def unpack(p):
+        """Split parameter vectors (one per row) into model parameters."""
+        a_p = np.exp(p[:, 0])
+        b_p = p[:, 1:1 + n_states]
+        dc_p = np.exp(p[:, 1 + n_states:1 + 2 * n_states])
+        k_p = np.exp(p[:, -1]) if fit_k else np.full(len(p), k)
+        return a_p, b_p, dc_p, k_p, np.full(len(p), mu0)
+
+    def residuals(p):
+        """Misfit for each parameter vector, inf where the model cannot be integrated."""
+        try:
+            with np.errstate(over='ignore', invalid='ignore'):
+                model = _integrate(time, load_velocity, *unpack(np.atleast_2d(p)), v0=v0,
+                                   law=law, rtol=1e-8, atol=1e-11)
+        except RuntimeError:
+            return np.full((len(np.atleast_2d(p)), len(time)), np.inf)
+        return model - friction
+
+    p = np.concatenate(([np.log(a)], b, np.log(dc), [np.log(k)] if fit_k else []))
+    r = residuals(p)[0]
+    cost = r @ r
+    damping = 1e-3
+    converged = False
+    jacobian = None
+
+    for iteration in range(1, max_iterations + 1):
+        # Forward difference Jacobian with every perturbed model integrated in one batch
+        steps = 1e-5 * np.maximum(1, np.abs(p))
+        perturbed = residuals(p + np.diag(steps))
+        jacobian = ((perturbed - r) / steps[:, np.newaxis]).T
+        if not np.all(np.isfinite(jacobian)):
+            break
+
+        jtj = jacobian.T @ jacobian
+        gradient = jacobian.T @ r
+        while True:
+            lhs = jtj + damping * np.diag(np.diag(jtj))
+            try:
+                delta = -np.linalg.solve(lhs, gradient)
+            except np.linalg.LinAlgError:
+                delta = -np.linalg.lstsq(lhs, gradient, rcond=None)[0]
+            r_trial = residuals(p + delta)[0]
+            cost_trial = r_trial @ r_trial
+            if cost_trial < cost:
+                damping = max(damping / 3, 1e-12)
+                break
+            damping *= 4
+            if damping > 1e12:
+                break
+
+        if cost_trial >= cost:
+            # No step improves the fit, even with the largest damping, so it has stalled
+            # rather than converged
+            break
+
+        p = p + delta
+        r = r_trial
+        converged = (cost - cost_trial) <= tolerance * cost
+        cost = cost_trial
+        if converged:
+            break
+
+    # Standard errors from the linearized covariance, mapped out of log space
+    dof = max(len(r) - len(p), 1)
+    try:
+        covariance = np.linalg.inv(jacobian.T @ jacobian) * cost / dof
+        sigma = np.sqrt(np.abs(np.diag(covariance)))
+    except (np.linalg.LinAlgError, AttributeError):
+        sigma = np.full(len(p), np.nan)
+
+    a_fit, b_fit, dc_fit, k_fit, _ = (values[0] for values in unpack(p[np.newaxis]))
+    errors = {'a': a_fit * sigma[0],
+              'b': _squeeze(sigma[1:1 + n_states]),
+              'dc': _squeeze(dc_fit * sigma[1 + n_states:1 + 2 * n_states])}
+    if fit_k:
+        errors['k'] = k_fit * sigma[-1]
+
+    return RSFFit(a=a_fit, b=_squeeze(b_fit), dc=_squeeze(dc_fit), k=k_fit, mu0=mu0,
+                  errors=errors, rms=np.sqrt(cost / len(r)), iterations=iteration,
+                  converged=converged, friction=r + friction)
+
+
+def _squeeze(values):
+    """Return a single state variable parameter as a scalar."""
+    return values[0] if len(values) == 1 else values
@@ -0,0 +1,368 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Contains a columnar container for the data of an experiment."""
+
+from collections.abc import MutableMapping
+
+import numpy as np
+
+from .package_tools import Exporter
+from .units import units
+
+exporter = Exporter(globals())
+
+
+@exporter.export
+class Experiment(MutableMapping):
+    """
+    Columns of experiment data stored together in 2D buffers.
+
+    An `Experiment` works like the dictionary of `pint.Quantity` columns used throughout
+    pylook: columns are looked up, added, replaced, and removed by name. Every column is a
+    row of a buffer, so looking up a column gives a view of the buffer, and slicing rows
+    (``experiment[100:200]``) gives a new `Experiment` viewing the same buffers without
+    copying any data.
+
+    Parameters
+    ----------
+    data : dict, optional
+        Columns to start with. All must have the same length.
+    n_rows : int, optional
+        Number of rows. Defaults to the length of the columns in `data`, or else of the
+        first column added.
+    capacity : int, optional
+        Number of columns to make space for in the first buffer. More space is made as
+        needed.
+    metadata : dict, optional
+        Information about the experiment, such as from a file header.
+
+    Notes
+    -----
+    As with a dictionary, assigning to a column name binds it to new data, so views of
+    the old column handed out before keep their values. Data written into a column view,
+    such as by calculations with ``inplace=True``, go straight into the buffer and are
+    seen by the experiment.
+
+    Columns keep their data type. Columns of each type are stored in buffers of that type,
+    so integer record numbers or flags are not turned into floats.
+
+    Columns never move once added. When the buffer is full, new columns go in another
+    buffer chained after it, so views handed out before stay attached to their columns.
+    Columns that are removed or replaced leave their space unused until `compact` is
+    called, which moves the columns of each type into one new buffer. Views handed out
+    before compacting no longer see writes to the experiment.
+    """
+
+    __slots__ = ('_blocks', '_n_rows', '_slots', '_units', '_used', 'metadata')
+
+    def __init__(self, data=None, n_rows=None, capacity=None, metadata=None):
+        """Create the buffer and copy any columns in."""
+        data = {} if data is None else data
+        if n_rows is None and data:
+            n_rows = len(next(iter(data.values())))
+        # Until the number of rows is known, the buffer only holds the capacity
+        self._blocks = [np.empty((max(capacity or 0, len(data), 1), n_rows or 0))]
+        self._n_rows = n_rows
+        self._slots = {}
+        self._units = {}
+        self._used = [0]
+        self.metadata = {} if metadata is None else metadata
+        for name, column in data.items():
+            self[name] = column
+
+    @classmethod
+    def from_buffer(cls, buffer, names, column_units, metadata=None):
+        """
+        Make an experiment using an existing 2D array as its buffer, without copying.
+
+        Parameters
+        ----------
+        buffer : `numpy.ndarray`
+            Array of shape (number of columns, number of rows).
+        names : sequence of str
+            Name of each column.
+        column_units : sequence of `pint.Unit` or str
+            Units of each column.
+        metadata : dict, optional
+            Information about the experiment.
+
+        Returns
+        -------
+        experiment : `Experiment`
+        """
+        return cls.from_buffers([(buffer, names, column_units)], metadata=metadata)
+
+    @classmethod
+    def from_buffers(cls, groups, names=None, metadata=None):
+        """
+        Make an experiment using existing 2D arrays as its buffers, without copying.
+
+        Each buffer usually holds the columns of one data type.
+
+        Parameters
+        ----------
+        groups : sequence of (`numpy.ndarray`, sequence of str, sequence of units)
+            Each buffer, of shape (number of columns, number of rows), with the name and
+            units of each of its columns.
+        names : sequence of str, optional
+            Order of the columns. Defaults to the order of the buffers.
+        metadata : dict, optional
+            Information about the experiment.
+
+        Returns
+        -------
+        experiment : `Experiment`
+        """
+        if not groups:
+            raise ValueError('At least one buffer is needed.')
+        slots = {}
+        column_units = {}
+        for i, (buffer, group_names, group_units) in enumerate(groups):
+            if len(group_names) != len(buffer) or len(group_units) != len(buffer):
+                raise ValueError('There must be a name and units for every column of the '
+                                 'buffer.')
+            if buffer.shape[1:] != groups[0][0].shape[1:]:
+                raise ValueError('The buffers must all have the same number of rows.')
+            for row, (name, unit) in enumerate(zip(group_names, group_units)):
+                slots[name] = (i, row)
+                column_units[name] = units.Unit(unit) if isinstance(unit, str) else unit
+        names = list(slots) if names is None else list(names)
+        if sorted(names) != sorted(slots):
+            raise ValueError('The names must be those of the columns in the buffers.')
+
+        experiment = cls.__new__(cls)
+        experiment._blocks = [buffer for buffer, _, _ in groups]
+        experiment._n_rows = groups[0][0].shape[1]
+        experiment._slots = {name: slots[name] for name in names}
+        experiment._units = {name: column_units[name] for name in names}
+        experiment._used = [len(buffer) for buffer in experiment._blocks]
+        experiment.metadata = {} if metadata is None else metadata
+        return experiment
+
+    @property
+    def n_rows(self):
+        """Get the number of rows, or None before any columns are added."""
+        return self._n_rows
+
+    @property
+    def names(self):
+        """Get the names of the columns, in order."""
+        return list(self._slots)
+
+    @property
+    def column_units(self):
+        """Get the units of each column by name."""
+        return dict(self._units)
+
+    def __getitem__(self, key):
+        """Get a column by name, or select rows with a slice, index array, or mask."""
+        if isinstance(key, str):
+            block, row = self._slots[key]
+            return units.Quantity(self._blocks[block][row], self._units[key])
+        return self.rows(key)
+
+    def __setitem__(self, name, value):
+        """Bind a column name to new data, copied into the buffer."""
+        magnitude = np.asarray(getattr(value, 'magnitude', value))
+        if self._n_rows is None and magnitude.ndim == 1:
+            self._n_rows = len(magnitude)
+            self._blocks = [np.empty((len(block), self._n_rows), dtype=magnitude.dtype)
+                            for block in self._blocks]
+        if magnitude.shape != (self.n_rows,):
+            raise ValueError(f'Column {name} must have {self.n_rows} rows, not '
+                             f'{magnitude.shape}.')
+
+        # Data already in the buffer, such as an in place result, need no copying
+        slot = self._find_slot(magnitude)
+        if slot is None:
+            slot = self._free_slot(magnitude.dtype)
+            self._blocks[slot[0]][slot[1]] = magnitude
+            self._used[slot[0]] += 1
+
+        self._slots[name] = slot
+        self._units[name] = getattr(value, 'units', units.dimensionless)
+
+    def __delitem__(self, name):
+        """Remove a column."""
+        del self._slots[name]
+        del self._units[name]
+
+    def __iter__(self):
+        """Iterate over the column names."""
+        return iter(self._slots)
+
+    def __len__(self):
+        """Get the number of columns."""
+        return len(self._slots)
+
+    def __repr__(self):
+        """Summarize the columns."""
+        columns = ', '.join(f'{name} [{self._units[name]:~}]' for name in self._slots)
+        return f'Experiment({self.n_rows} rows: {columns})'
+
+    def __reduce__(self):
+        """Pickle only the columns in use, an array per data type, with units as strings."""
+        groups = [(self._stack(names), names, [str(self._units[name]) for name in names])
+                  for names in self._dtype_groups()]
+        return (_rebuild_experiment, (groups, self.names, self.metadata, self.n_rows))
+
+    def rows(self, key):
+        """
+        Select rows of every column.
+
+        Parameters
+        ----------
+        key : slice, int array, or bool array
+            Rows to select.
+
+        Returns
+        -------
+        experiment : `Experiment`
+            Experiment with the selected rows. Shares the buffers when `key` is a slice.
+        """
+        if isinstance(key, (int, np.integer)):
+            raise TypeError('Select rows with a slice or array, not a single integer.')
+        selected = self.__class__.__new__(self.__class__)
+        selected._blocks = [block[:used, key] for block, used in zip(self._blocks, self._used)]
+        selected._n_rows = None if self._n_rows is None else selected._blocks[0].shape[1]
+        selected._slots = dict(self._slots)
+        selected._units = dict(self._units)
+        selected._used = list(self._used)
+        selected.metadata = self.metadata
+        return selected
+
+    def rename(self, old, new):
+        """
+        Rename a column in place, keeping its position in the column order.
+
+        Parameters
+        ----------
+        old, new : str
+            Current and new name of the column.
+
+        Raises
+        ------
+        KeyError
+            If there is no column named `old`.
+        ValueError
+            If another column is already named `new`.
+        """
+        if old not in self._slots:
+            raise KeyError(old)
+        if new != old and new in self._slots:
+            raise ValueError(f'There is already a column named {new}.')
+        self._slots = {new if name == old else name: slot
+                       for name, slot in self._slots.items()}
+        self._units = {new if name == old else name: unit
+                       for name, unit in self._units.items()}
+
+    def to_array(self):
+        """
+        Get the magnitudes of all columns as a 2D array.
+
+        Returns
+        -------
+        array : `numpy.ndarray`
+            Array of shape (number of columns, number of rows). A view of the buffer when
+            the columns are stored in order in one buffer with no unused space between
+            them.
+
+        Raises
+        ------
+        TypeError
+            If the columns do not all have the same data type.
+        """
+        if len(self._dtype_groups()) > 1:
+            raise TypeError('Columns of different data types cannot be stacked in one '
+                            'array. Select columns of one type first.')
+        return self._stack(self.names)
+
+    def to_dict(self):
+        """
+        Get the columns as a dictionary.
+
+        Returns
+        -------
+        data : dict
+            `pint.Quantity` view of each column by name.
+        """
+        return {name: self[name] for name in self._slots}
+
+    def compact(self):
+        """Move the columns of each data type into one new buffer, dropping unused space."""
+        groups = self._dtype_groups()
+        slots = {name: (i, row) for i, names in enumerate(groups)
+                 for row, name in enumerate(names)}
+        self._blocks = [np.array(self._stack(names)) for names in groups]
+        self._slots = {name: slots[name] for name in self._slots}
+        self._used = [len(names) for names in groups]
+
+    def copy(self):
+        """
+        Copy the experiment.
+
+        Returns
+        -------
+        experiment : `Experiment`
+            Experiment with its own compact buffers and a shallow copy of the metadata.
+        """
+        experiment = self.rows(slice(None))
+        experiment.metadata = dict(self.metadata)
+        experiment.compact()
+        return experiment
+
+    def _dtype_groups(self):
+        """Get the names of the columns, grouped by data type in order of first use."""
+        groups = {}
+        for name, (block, _) in self._slots.items():
+            groups.setdefault(self._blocks[block].dtype, []).append(name)
+        return list(groups.values())
+
+    def _stack(self, names):
+        """Get columns of one data type as a 2D array, a view when already stored so."""
+        slots = [self._slots[name] for name in names]
+        if not slots:
+            return np.empty((0, self.n_rows or 0))
+        block = slots[0][0]
+        if slots == [(block, i) for i in range(len(slots))]:
+            return self._blocks[block][:len(slots)]
+        array = np.empty((len(slots), self.n_rows), dtype=self._blocks[block].dtype)
+        for i, (block, row) in enumerate(slots):
+            array[i] = self._blocks[block][row]
+        return array
+
+    def _find_slot(self, magnitude):
+        """Find the buffer and row that an array is a view of, if any."""
+        for i, block in enumerate(self._blocks):
+            if (magnitude.dtype != block.dtype
+                    or magnitude.strides[-1:] != block.strides[1:]
+                    or not np.may_share_memory(magnitude, block)):
+                continue
+            offset = (magnitude.__array_interface__['data'][0]
+                      - block.__array_interface__['data'][0])
+            row, remainder = divmod(offset, block.strides[0])
+            if not remainder and 0 <= row < self._used[i]:
+                return i, row
+        return None
+
+    def _free_slot(self, dtype):
+        """Find space for a column of a data type, chaining a new buffer when full."""
+        for i in reversed(range(len(self._blocks))):
+            if self._blocks[i].dtype == dtype:
+                if self._used[i] < len(self._blocks[i]):
+                    return i, self._used[i]
+                break
+
+        # Leave the columns in place so that views of them stay attached
+        self._blocks.append(np.empty((max(len(self._slots), 4), self.n_rows), dtype=dtype))
+        self._used.append(0)
+        return len(self._blocks) - 1, 0
+
+
+def _rebuild_experiment(groups, names, metadata, n_rows):
+    """Recreate a pickled experiment from the columns of each data type."""
+    if not groups:
+        return Experiment(n_rows=n_rows, metadata=metadata)
+    return Experiment.from_buffers(groups, names, metadata)
@@ -4,6 +4,12 @@
 
 """Provide calculations and data processing aids."""
 
+from .chunked import *  # noqa: F403
+from .dataframe import *  # noqa: F403
 from .lookfiles import *  # noqa: F403
+from .series import *  # noqa: F403
 
-__all__ = lookfiles.__all__[:]  # noqa: F405
+__all__ = chunked.__all__[:]  # noqa: F405
+__all__.extend(dataframe.__all__)  # noqa: F405
+__all__.extend(lookfiles.__all__)  # noqa: F405
+__all__.extend(series.__all__)  # noqa: F405
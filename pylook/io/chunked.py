@@ -0,0 +1,356 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""
+Contains a chunked on-disk format for experiments too large to hold in memory.
+
+A dataset is a directory with a ``manifest.json`` describing the columns, their units, the
+number of rows in each chunk, and any metadata, and a directory per column holding one
+``.npy`` file per chunk (or ``.npz`` when compressed)::
+
+    run.pylook/
+        manifest.json
+        000/000000.npy
+        000/000001.npy
+        001/000000.npy
+        ...
+
+Chunks are only added, never rewritten, so a long running experiment can be appended to
+as it is recorded, and columns are read a chunk at a time from memory mapped files.
+"""
+
+from collections.abc import Mapping
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from .lookfiles import read_binary
+from ..experiment import Experiment
+from ..package_tools import Exporter
+from ..units import magnitude_in, units
+
+exporter = Exporter(globals())
+
+FORMAT_NAME = 'pylook-chunked'
+FORMAT_VERSION = 1
+
+
+@exporter.export
+def write_chunked(path, data, chunk_size=2 ** 20, metadata=None, compress=False):
+    """
+    Write experiment data to a new chunked dataset.
+
+    Parameters
+    ----------
+    path : str or `pathlib.Path`
+        Directory to create. Must not already exist.
+    data : dict or `pylook.experiment.Experiment`
+        Columns of experiment data, all the same length. Their units are those of the
+        dataset.
+    chunk_size : int
+        Largest number of rows in a chunk. Default 2**20.
+    metadata : dict, optional
+        Information about the experiment to keep in the manifest. Values JSON cannot hold
+        are kept as strings. Defaults to the metadata of an `Experiment`.
+    compress : bool
+        Compress each chunk with zlib. Compressed chunks take less space but are read
+        into memory rather than memory mapped. Default `False`.
+
+    Returns
+    -------
+    dataset : `ChunkedDataset`
+        The new dataset.
+    """
+    os.makedirs(path)
+    columns = []
+    for i, (name, column) in enumerate(data.items()):
+        magnitude = np.asarray(getattr(column, 'magnitude', column))
+        columns.append({'name': name, 'directory': f'{i:03d}',
+                        'units': str(getattr(column, 'units', units.dimensionless)),
+                        'dtype': magnitude.dtype.str})
+        os.mkdir(os.path.join(path, columns[-1]['directory']))
+
+    if metadata is None:
+        metadata = getattr(data, 'metadata', {})
+    _write_manifest(path, {'format': FORMAT_NAME, 'version': FORMAT_VERSION,
+                           'columns': columns, 'chunks': [], 'compress': compress,
+                           'chunk_size': chunk_size, 'metadata': _jsonable(metadata)})
+
+    dataset = ChunkedDataset(path)
+    dataset.append(data)
+    return dataset
+
+
+@exporter.export
+def open_chunked(path):
+    """
+    Open a chunked dataset without reading any data.
+
+    Parameters
+    ----------
+    path : str or `pathlib.Path`
+        Directory of the dataset.
+
+    Returns
+    -------
+    dataset : `ChunkedDataset`
+    """
+    return ChunkedDataset(path)
+
+
+@exporter.export
+def look_to_chunked(filename, path, chunk_size=2 ** 20, compress=False, **kwargs):
+    """
+    Convert a look binary file to a chunked dataset.
+
+    Parameters
+    ----------
+    filename : str or `pathlib.Path`
+        Look binary file to read with `read_binary`.
+    path : str or `pathlib.Path`
+        Directory of the dataset to create.
+    chunk_size : int
+        Largest number of rows in a chunk. Default 2**20.
+    compress : bool
+        Compress each chunk. Default `False`.
+    kwargs
+        Other arguments of `read_binary`.
+
+    Returns
+    -------
+    dataset : `ChunkedDataset`
+    """
+    data, metadata = read_binary(filename, **kwargs)
+    return write_chunked(path, data, chunk_size=chunk_size, compress=compress,
+                         metadata=metadata)
+
+
+@exporter.export
+class ChunkedDataset(Mapping):
+    """
+    Experiment data kept on disk in chunks, with columns read only when needed.
+
+    Looking up a column by name gives a `ChunkedColumn`, which reads rows from the chunks
+    that hold them. Use `open_chunked` or `write_chunked` to get a dataset.
+
+    Parameters
+    ----------
+    path : str or `pathlib.Path`
+        Directory of the dataset.
+    """
+
+    def __init__(self, path):
+        """Read the manifest."""
+        self.path = os.fspath(path)
+        with open(os.path.join(self.path, 'manifest.json')) as manifest_file:
+            self._manifest = json.load(manifest_file)
+        if self._manifest.get('format') != FORMAT_NAME:
+            raise ValueError(f'{self.path} is not a pylook chunked dataset.')
+        if self._manifest['version'] > FORMAT_VERSION:
+            raise ValueError(f'{self.path} was written by a newer version of pylook.')
+        self._columns = {column['name']: column for column in self._manifest['columns']}
+
+    @property
+    def metadata(self):
+        """Get the information about the experiment kept in the manifest."""
+        return self._manifest['metadata']
+
+    @property
+    def n_rows(self):
+        """Get the number of rows."""
+        return sum(self._manifest['chunks'])
+
+    @property
+    def chunk_rows(self):
+        """Get the number of rows in each chunk."""
+        return list(self._manifest['chunks'])
+
+    def __getitem__(self, name):
+        """Get a column by name."""
+        column = self._columns[name]
+        return ChunkedColumn(os.path.join(self.path, column['directory']),
+                             self._manifest['chunks'], units(column['units']).units,
+                             np.dtype(column['dtype']), self._manifest['compress'])
+
+    def __iter__(self):
+        """Iterate over the column names."""
+        return iter(self._columns)
+
+    def __len__(self):
+        """Get the number of columns."""
+        return len(self._columns)
+
+    def __repr__(self):
+        """Summarize the dataset."""
+        return (f'ChunkedDataset({self.path!r}, {self.n_rows} rows in '
+                f'{len(self._manifest["chunks"])} chunks, {len(self)} columns)')
+
+    def append(self, data):
+        """
+        Add rows to the end of every column.
+
+        Parameters
+        ----------
+        data : dict or `pylook.experiment.Experiment`
+            Columns to append, with the same names as the dataset and units that can be
+            converted to the dataset's. Rows are split into chunks of at most the chunk
+            size of the dataset.
+        """
+        if set(data) != set(self._columns):
+            raise ValueError('Appended data must have the same columns as the dataset.')
+
+        magnitudes = {}
+        for name, column in self._columns.items():
+            values = magnitude_in(data[name], units(column['units']).units)
+            magnitudes[name] = np.asarray(values, dtype=column['dtype'])
+        lengths = {len(values) for values in magnitudes.values()}
+        if len(lengths) != 1:
+            raise ValueError('Appended columns must all have the same length.')
+        n_rows = lengths.pop()
+
+        # Chunks are written before the manifest lists them, so readers never see a
+        # partially written chunk
+        chunks = list(self._manifest['chunks'])
+        chunk_size = self._manifest['chunk_size']
+        for start in range(0, n_rows, chunk_size):
+            stop = min(start + chunk_size, n_rows)
+            for name, column in self._columns.items():
+                _write_chunk(os.path.join(self.path, column['directory']), len(chunks),
+                             magnitudes[name][start:stop], self._manifest['compress'])
+            chunks.append(stop - start)
+
+        self._manifest['chunks'] = chunks
+        _write_manifest(self.path, self._manifest)
+
+    def read(self, names=None, start=None, stop=None):
+        """
+        Read rows of columns into memory.
+
+        Parameters
+        ----------
+        names : sequence of str, optional
+            Columns to read. Defaults to all of them.
+        start, stop : int, optional
+            Range of rows to read. Defaults to all rows.
+
+        Returns
+        -------
+        experiment : `pylook.experiment.Experiment`
+            The columns, with the metadata of the dataset.
+        """
+        names = list(self) if names is None else list(names)
+        rows = slice(start, stop)
+        n_rows = len(range(*rows.indices(self.n_rows)))
+        experiment = Experiment(n_rows=n_rows, capacity=len(names),
+                                metadata=dict(self.metadata))
+        for name in names:
+            experiment[name] = self[name][rows]
+        return experiment
+
+
+@exporter.export
+class ChunkedColumn:
+    """
+    A column of a `ChunkedDataset` that reads its chunks when rows are requested.
+
+    Indexing with an integer or slice reads only the chunks holding those rows. A slice
+    within one uncompressed chunk is a view of the memory mapped file and reads nothing
+    until used.
+    """
+
+    def __init__(self, directory, chunk_rows, units, dtype, compress):
+        """Set up the column."""
+        self.directory = directory
+        self.units = units
+        self.dtype = dtype
+        self._compress = compress
+        self._starts = np.concatenate(([0], np.cumsum(chunk_rows, dtype=np.int64)))
+
+    @property
+    def shape(self):
+        """Get the shape of the whole column."""
+        return (len(self),)
+
+    def __len__(self):
+        """Get the number of rows."""
+        return int(self._starts[-1])
+
+    def __repr__(self):
+        """Summarize the column."""
+        return (f'ChunkedColumn({len(self)} rows in {len(self._starts) - 1} chunks, '
+                f'{self.units:~})')
+
+    def __getitem__(self, key):
+        """Get rows by integer index or slice."""
+        if isinstance(key, (int, np.integer)):
+            index = key + len(self) if key < 0 else key
+            if not 0 <= index < len(self):
+                raise IndexError(f'Row {key} is out of range for a column of {len(self)}.')
+            return self._read(index, index + 1)[0]
+        if not isinstance(key, slice):
+            raise TypeError('Columns on disk can only be indexed by an integer or slice.')
+        rows = range(*key.indices(len(self)))
+        if not rows:
+            return self._read(0, 0)
+        low = min(rows[0], rows[-1])
+        return self._read(low, max(rows[0], rows[-1]) + 1)[rows[0] - low::rows.step]
+
+    def __array__(self, dtype=None):
+        """Read the whole column into memory."""
+        return np.asarray(self._read(0, len(self)).magnitude, dtype=dtype)
+
+    def chunks(self):
+        """
+        Iterate over the chunks of the column.
+
+        Yields
+        ------
+        chunk : `pint.Quantity`
+            Rows of one chunk, memory mapped unless the dataset is compressed.
+        """
+        for i in range(len(self._starts) - 1):
+            yield units.Quantity(self._chunk(i), self.units)
+
+    def _read(self, start, stop):
+        """Read the rows from start to stop, copying only if they span chunks."""
+        stop = max(start, stop)
+        first = max(np.searchsorted(self._starts, start, side='right') - 1, 0)
+        last = np.searchsorted(self._starts, stop, side='left')
+        pieces = [self._chunk(i)[max(start - self._starts[i], 0):stop - self._starts[i]]
+                  for i in range(first, min(last, len(self._starts) - 1))]
+        if len(pieces) == 1:
+            values = pieces[0]
+        else:
+            values = np.concatenate(pieces) if pieces else np.empty(0, dtype=self.dtype)
+        return units.Quantity(values, self.units)
+
+    def _chunk(self, i):
+        """Open a chunk."""
+        if self._compress:
+            with np.load(os.path.join(self.directory, f'{i:06d}.npz')) as chunk:
+                return chunk['values']
+        return np.load(os.path.join(self.directory, f'{i:06d}.npy'), mmap_mode='r')
+
+
+def _write_chunk(directory, i, values, compress):
+    """Write one chunk of a column."""
+    if compress:
+        np.savez_compressed(os.path.join(directory, f'{i:06d}.npz'), values=values)
+    else:
+        np.save(os.path.join(directory, f'{i:06d}.npy'), values)
+
+
+def _write_manifest(path, manifest):
+    """Replace the manifest in one step so readers see either the old or new version."""
+    fd, temporary = tempfile.mkstemp(dir=path, suffix='.tmp')
+    with os.fdopen(fd, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    os.replace(temporary, os.path.join(path, 'manifest.json'))
+
+
+def _jsonable(metadata):
+    """Convert metadata values that JSON cannot hold to strings."""
+    return json.loads(json.dumps(metadata, default=str))
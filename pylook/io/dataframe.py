@@ -0,0 +1,81 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Contains tools to move experiment data to and from pandas DataFrames."""
+
+import numpy as np
+import pandas as pd
+
+from ..package_tools import Exporter
+from ..units import units as unit_registry
+
+exporter = Exporter(globals())
+
+
+@exporter.export
+def to_dataframe(data, copy=False):
+    """
+    Make a pandas DataFrame of experiment data.
+
+    Parameters
+    ----------
+    data : dict or `pylook.experiment.Experiment`
+        Columns of experiment data.
+    copy : bool
+        Copy the data into the DataFrame. By default the columns of the DataFrame share
+        memory with `data`, so writing to one changes the other. Default `False`.
+
+    Returns
+    -------
+    df : `pandas.DataFrame`
+        Magnitudes of the columns. The units of each column are in ``df.attrs['units']``,
+        as strings by column name, and any metadata of an `Experiment` in
+        ``df.attrs['metadata']``.
+
+    Notes
+    -----
+    Without copying, every column is kept as its own block in the DataFrame. Some pandas
+    operations combine the blocks into a single 2D array, which copies the data once.
+    """
+    magnitudes = {name: np.asarray(getattr(column, 'magnitude', column))
+                  for name, column in data.items()}
+    df = pd.DataFrame(magnitudes, copy=copy)
+    df.attrs['units'] = {name: str(getattr(column, 'units', unit_registry.dimensionless))
+                         for name, column in data.items()}
+    if getattr(data, 'metadata', None):
+        df.attrs['metadata'] = data.metadata
+    return df
+
+
+@exporter.export
+def from_dataframe(df, units=None, copy=False):
+    """
+    Get the columns of a pandas DataFrame as experiment data.
+
+    Parameters
+    ----------
+    df : `pandas.DataFrame`
+        Data with a column for each variable.
+    units : dict, optional
+        Units of each column by name, as `pint.Unit` or strings. Defaults to the units in
+        ``df.attrs['units']``, as set by `to_dataframe`. Columns without units are
+        dimensionless.
+    copy : bool
+        Copy the data out of the DataFrame. By default each column is a view of the
+        DataFrame's memory wherever pandas stores it as a NumPy array. Default `False`.
+
+    Returns
+    -------
+    data : dict
+        `pint.Quantity` of each column by name.
+    """
+    if units is None:
+        units = df.attrs.get('units', {})
+
+    data = {}
+    for name in df.columns:
+        magnitude = df[name].to_numpy(copy=copy)
+        unit = units.get(name, unit_registry.dimensionless)
+        data[name] = unit_registry.Quantity(magnitude, unit)
+    return data
@@ -11,7 +11,8 @@ import warnings
 import numpy as np
 from pint.errors import UndefinedUnitError
 
-import pylook.calc as lc
+from pylook.calc import find_onset, kernels
+from pylook.experiment import Experiment
 from pylook.units import units
 from ..package_tools import Exporter
 
@@ -50,8 +51,8 @@ def read_binary(filename, data_endianness=None, unrecognized_units='ignore',
 
     Returns
     -------
-    data : dict
-        Dictionary of `pint.Quantity` arrays for each column of data.
+    data : `pylook.experiment.Experiment`
+        Dictionary-like container of `pint.Quantity` arrays for each column of data.
     metadata : dict
         Metadata from the header of the file
 
@@ -78,47 +79,13 @@ def read_binary(filename, data_endianness=None, unrecognized_units='ignore',
         # Seek past the file metadata header that we have already processed
         f.seek(36)
 
-        col_headings = []
-        col_recs = []
-        col_units = []
+        col_headings, col_units, col_recs = _read_column_headers(f, metadata,
+                                                                 clean_header)
 
-        # For each possible column (32 maximum columns) unpack its header
-        # information and store it.  Only store column headers of columns
-        # that contain data.  Use termination at first NULL.
-        for i in range(metadata['header format']):
-            # Channel name (13 characters)
-            chname = struct.unpack('13c', f.read(13))
-            chname = _binary_tuple_to_string(chname)
-            chname = chname.split('\0')[0]
-
-            # Channel units (13 characters)
-            chunits = struct.unpack('13c', f.read(13))
-            chunits = _binary_tuple_to_string(chunits)
-            chunits = chunits.split('\0')[0]
-
-            # This field is now unused, so we just read past it (int)
-            _ = struct.unpack('>i', f.read(4))
-
-            # This field is now unused, so we just read past it (50 characters)
-            _ = struct.unpack('50c', f.read(50))
-
-            # Number of elements (int)
-            nelem = struct.unpack('>i', f.read(4))
-            nelem = int(nelem[0])
-
-            if clean_header:
-                chname = chname.strip()
-                chunits = chunits.strip()
-
-            if chname[0:6] == 'no_val':
-                continue  # Skip Blank Channels
-            else:
-                col_headings.append(chname)
-                col_recs.append(nelem)
-                col_units.append(chunits)
-
-        # Read the data into a numpy recarray
-        data = np.empty([metadata['number of records'], metadata['number of columns']])
+        # Read the data into a buffer with a row per column, leaving the first row for the
+        # record numbers
+        data = np.empty([metadata['number of columns'] + 1, metadata['number of records']])
+        data[0] = np.arange(metadata['number of records'])
 
         # Make the right data formatter for the file
         if metadata['bytes per data point'] == 8:
@@ -134,21 +101,106 @@ def read_binary(filename, data_endianness=None, unrecognized_units='ignore',
         for col in range(metadata['number of columns']):
             for row in range(col_recs[col]):
                 if data_endianness == 'little':
-                    data[row, col] = struct.unpack(data_point_format_little_endian,
-                                                   f.read(metadata['bytes per data point']))[0]
+                    data[col + 1, row] = struct.unpack(
+                        data_point_format_little_endian,
+                        f.read(metadata['bytes per data point']))[0]
                 elif data_endianness == 'big':
-                    data[row, col] = struct.unpack(data_point_format_big_endian,
-                                                   f.read(metadata['bytes per data point']))[0]
+                    data[col + 1, row] = struct.unpack(
+                        data_point_format_big_endian,
+                        f.read(metadata['bytes per data point']))[0]
                 else:
                     ValueError('Data endian setting invalid - options are little and big')
 
-    data_dict = {}
-    data_dict['rec_num'] = np.arange(metadata['number of records']) * units('dimensionless')
+    data_units = [units.dimensionless] + _parse_units(col_units, unrecognized_units)
+
+    data_dict = Experiment.from_buffer(data, ['rec_num'] + col_headings, data_units,
+                                       metadata=metadata)
+    return data_dict, metadata
+
+
+def _read_column_headers(f, metadata, clean_header=True):
+    """
+    Read the column headers of a look file.
 
-    for i, (name, unit) in enumerate(zip(col_headings, col_units)):
-        data_unit = units('dimensionless')
+    Parameters
+    ----------
+    f : file
+        Open look file, positioned at the first column header.
+    metadata : dict
+        Metadata of the file from `_read_binary_file_metadata`.
+    clean_header : boolean
+        Remove extra whitespace in the column names and units. Default True.
+
+    Returns
+    -------
+    names, col_units : list of str
+        Name and units of each column that contains data.
+    col_recs : list of int
+        Number of elements in each column that contains data.
+    """
+    names = []
+    col_units = []
+    col_recs = []
+
+    # For each possible column (32 maximum columns) unpack its header
+    # information and store it.  Only store column headers of columns
+    # that contain data.  Use termination at first NULL.
+    for i in range(metadata['header format']):
+        # Channel name (13 characters)
+        chname = struct.unpack('13c', f.read(13))
+        chname = _binary_tuple_to_string(chname)
+        chname = chname.split('\0')[0]
+
+        # Channel units (13 characters)
+        chunits = struct.unpack('13c', f.read(13))
+        chunits = _binary_tuple_to_string(chunits)
+        chunits = chunits.split('\0')[0]
+
+        # This field is now unused, so we just read past it (int)
+        _ = struct.unpack('>i', f.read(4))
+
+        # This field is now unused, so we just read past it (50 characters)
+        _ = struct.unpack('50c', f.read(50))
+
+        # Number of elements (int)
+        nelem = struct.unpack('>i', f.read(4))
+        nelem = int(nelem[0])
+
+        if clean_header:
+            chname = chname.strip()
+            chunits = chunits.strip()
+
+        if chname[0:6] == 'no_val':
+            continue  # Skip Blank Channels
+        else:
+            names.append(chname)
+            col_recs.append(nelem)
+            col_units.append(chunits)
+
+    return names, col_units, col_recs
+
+
+def _parse_units(col_units, unrecognized_units='ignore'):
+    """
+    Convert the units of look file columns to `pint.Unit`.
+
+    Parameters
+    ----------
+    col_units : sequence of str
+        Units from the column headers.
+    unrecognized_units : string
+        'ignore' (default) assigns dimensionless to unrecognized units, 'error' will
+        fail if unrecognized units are encountered.
+
+    Returns
+    -------
+    data_units : list of `pint.Unit`
+    """
+    data_units = []
+    for unit in col_units:
+        data_unit = units.dimensionless
         try:
-            data_unit = units(unit)
+            data_unit = units(unit).units
 
         except UndefinedUnitError:
             if unrecognized_units == 'ignore':
@@ -156,9 +208,8 @@ def read_binary(filename, data_endianness=None, unrecognized_units='ignore',
             else:
                 raise UndefinedUnitError(unit)
 
-        data_dict[name] = data[:, i] * data_unit
-
-    return data_dict, metadata
+        data_units.append(data_unit)
+    return data_units
 
 
 def _determine_header_and_data_format(file_size, num_channels, num_records):
@@ -376,6 +427,10 @@ class XlookParser:
         """
         with open(rfile, 'r') as f:
             self._r_file_path = Path(rfile)
+
+            # Runs of offset_int commands on the same column are collected and removed
+            # together in a single pass over the column.
+            offset_commands = []
             for line in f.readlines():
                 # If there is an in-line comment, we split and just keep the first part
                 if '#' in line:
@@ -383,9 +438,24 @@ class XlookParser:
 
                 # If it is an end command - bounce out of doit
                 if line.strip() == 'end':
-                    return
+                    break
+
+                args = line.replace(',', ' ').split()
+                if args[:1] == ['offset_int']:
+                    if offset_commands and offset_commands[0].split()[1:2] != args[1:2]:
+                        self._run_offset_int_commands(offset_commands)
+                        offset_commands = []
+                    offset_commands.append(' '.join(args))
+                    continue
+
+                # Blank and comment lines do not break up a run of offsets
+                if args:
+                    self._run_offset_int_commands(offset_commands)
+                    offset_commands = []
                 self.parse_line(line)
 
+            self._run_offset_int_commands(offset_commands)
+
     def parse_line(self, line):
         """
         Parse the text in an xlook command and execute the appropriate function.
@@ -423,6 +493,7 @@ class XlookParser:
                              'math_int': self.command_math_int,
                              'offset_int': self.command_offset_int,
                              'r_row': self.command_r_row,
+                             'slope': self.command_slope,
                              #  'type': self.command_type,
                              'read': self.command_read}
 
@@ -607,7 +678,7 @@ class XlookParser:
         (_, input_col_idx, output_col_idx, output_name, output_unit) = command.split()
         input_col_idx = int(input_col_idx)
         output_col_idx = int(output_col_idx)
-        result = np.cumsum(self._get_data_by_index(input_col_idx))
+        result = kernels.cumsum(self._get_data_by_index(input_col_idx))
 
         # Put the result back into the output
         self._set_data_by_index(output_col_idx, result)
@@ -652,20 +723,25 @@ class XlookParser:
 
         Notes
         -----
-        The Xlook command is `zero column_number record_index`.
+        The Xlook command is `zero column_number record_index`. As an extension to Xlook,
+        the record index may be given as `auto` to zero at the onset of loading found by
+        `pylook.calc.find_onset`.
 
         See Also
         --------
         pylook.calc.zero
+        pylook.calc.find_onset
         """
         if not self._check_number_of_arguments(command, 3):
             return
         (_, input_col_idx, zero_record) = command.split()
         input_col_idx = int(input_col_idx)
-        zero_record = int(zero_record)
-        result = lc.zero(self._get_data_by_index(input_col_idx) * units('dimensionless'),
-                         zero_record)
-        self._set_data_by_index(input_col_idx, result.m)  # We are not touching units and names
+        if zero_record.strip().lower() == 'auto':
+            zero_record = find_onset(self._get_data_by_index(input_col_idx))
+        else:
+            zero_record = int(zero_record)
+        result = kernels.zero(self._get_data_by_index(input_col_idx), zero_record)
+        self._set_data_by_index(input_col_idx, result)  # We are not touching units and names
 
     def command_ec(self, command):
         """
@@ -694,23 +770,55 @@ class XlookParser:
         last_idx = int(last_idx)
         slope = 1 / float(slope)
 
-        # Get the data and assign units - they don't matter we just need them for the
-        # pylook functions to work
-        load_data = self._get_data_by_index(load_col_idx) * units('dimensionless')
-        disp_data = self._get_data_by_index(disp_col_idx) * units('dimensionless')
-        coeffs = [slope * units('dimensionless'), 0 * units('dimensionless')]
-
-        ec_corrected_disp = disp_data - lc.elastic_correction(load_data, disp_data, coeffs)
+        # The interpreter does not carry units, so we go straight to the calculation kernel
+        load_data = self._get_data_by_index(load_col_idx)
+        disp_data = self._get_data_by_index(disp_col_idx)
+        coeffs = [slope, 0]
 
-        # Drop our unit charade
-        ec_corrected_disp = ec_corrected_disp.m
-        disp_data = disp_data.m
+        correction = kernels.elastic_correction(load_data, disp_data, coeffs)
+        ec_corrected_disp = disp_data - correction
 
         disp_data[first_idx: last_idx] = ec_corrected_disp[first_idx: last_idx]
         self._set_data_by_index(output_col_idx, disp_data)
         self._set_name_by_index(output_col_idx, output_name)
         self._set_units_by_index(output_col_idx, output_unit)
 
+    def command_slope(self, command):
+        """
+        Compute the running slope of one column against another.
+
+        Parameters
+        ----------
+        command : str
+            command from r file
+
+        Notes
+        -----
+        The command is `slope x_column_number y_column_number window_size new_column_number
+        name unit`. The slope at each row is the least squares slope over the window
+        centered on that row and is NaN where the window does not fit in the data.
+
+        See Also
+        --------
+        pylook.calc.rolling_slope
+        """
+        if not self._check_number_of_arguments(command, 7):
+            return
+
+        (_, x_col_idx, y_col_idx, window, output_col_idx,
+         output_name, output_unit) = command.split()
+        x_col_idx = int(x_col_idx)
+        y_col_idx = int(y_col_idx)
+        window = int(window)
+        output_col_idx = int(output_col_idx)
+
+        result = kernels.rolling_slope(self._get_data_by_index(x_col_idx),
+                                       self._get_data_by_index(y_col_idx), window)
+
+        self._set_data_by_index(output_col_idx, result)
+        self._set_name_by_index(output_col_idx, output_name)
+        self._set_units_by_index(output_col_idx, output_unit)
+
     def command_r_col(self, command):
         """
         Remove a given column by setting it to empty and the name/units to None.
@@ -808,8 +916,33 @@ class XlookParser:
         The Xlook command is `offset_int column_number record_start_index record_end_index
         (y or n) to offset in between during the offset.`
         """
-        if not self._check_number_of_arguments(command, 5):
+        parsed = self._parse_offset_int(command)
+        if parsed is None:
             return
+        col_idx, start_idx, stop_idx, set_between = parsed
+
+        col_data = kernels.remove_offset(self._get_data_by_index(col_idx), start_idx,
+                                         stop_idx, set_between=set_between)
+
+        self._set_data_by_index(col_idx, col_data)
+
+    def _parse_offset_int(self, command):
+        """
+        Parse the arguments of an offset_int command.
+
+        Parameters
+        ----------
+        command : str
+            command from r file
+
+        Returns
+        -------
+        arguments : tuple or None
+            Column index, start index, stop index, and set between flag. None if the
+            command was invalid.
+        """
+        if not self._check_number_of_arguments(command, 5):
+            return None
 
         (_, col_idx, start_idx, stop_idx, set_between) = command.split()
         col_idx = int(col_idx)
@@ -820,14 +953,47 @@ class XlookParser:
         elif set_between.strip().lower() == 'n':
             set_between = False
         else:
-            self.command_invalid()
+            self.command_invalid(command)
+            return None
 
-        col_data = self._get_data_by_index(col_idx)
+        return col_idx, start_idx, stop_idx, set_between
+
+    def _run_offset_int_commands(self, commands):
+        """
+        Run a group of offset_int commands that all act on the same column.
 
-        col_data = lc.remove_offset(col_data * units('dimensionless'), start_idx, stop_idx,
-                                    set_between=set_between)
+        Parameters
+        ----------
+        commands : list
+            offset_int commands from r file
+
+        Notes
+        -----
+        Non-overlapping offsets are removed together with `pylook.calc.remove_offsets`.
+        Overlapping offsets depend on the order they are removed in, so they fall back to
+        being run one at a time.
+        """
+        if len(commands) < 2:
+            for command in commands:
+                self.command_offset_int(command)
+            return
+
+        parsed = [p for p in map(self._parse_offset_int, commands) if p is not None]
+        if not parsed:
+            return
+        col_idx = parsed[0][0]
+        intervals = [(start_idx, stop_idx) for _, start_idx, stop_idx, _ in parsed]
+        set_between = [flag for *_, flag in parsed]
+
+        col_data = self._get_data_by_index(col_idx)
+        try:
+            col_data = kernels.remove_offsets(col_data, intervals, set_between=set_between)
+        except ValueError:
+            for (start_idx, stop_idx), flag in zip(intervals, set_between):
+                col_data = kernels.remove_offset(col_data, start_idx, stop_idx,
+                                                 set_between=flag)
 
-        self._set_data_by_index(col_idx, col_data.m)
+        self._set_data_by_index(col_idx, col_data)
 
     def command_r_row(self, command):
         """
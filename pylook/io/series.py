@@ -0,0 +1,222 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""
+Contains tools to use an experiment saved as several consecutive look files.
+
+Long experiments are often split across look files because of the size limits of the
+format. `open_series` presents the files as one dataset without reading or joining them:
+each column is a chain of memory mapped pieces, one per file, indexed by row over the
+whole experiment.
+"""
+
+from collections.abc import Mapping
+import os
+from pathlib import Path
+
+import numpy as np
+
+from .chunked import ChunkedColumn
+from .lookfiles import _parse_units, _read_binary_file_metadata, _read_column_headers
+from ..experiment import Experiment
+from ..package_tools import Exporter
+from ..units import units
+
+exporter = Exporter(globals())
+
+
+@exporter.export
+def open_series(filenames, data_endianness=None, unrecognized_units='ignore',
+                clean_header=True):
+    """
+    Open consecutive look binary files as one dataset without reading any data.
+
+    Parameters
+    ----------
+    filenames : sequence of str or `pathlib.Path`
+        Look files in the order they were recorded.
+    data_endianness : str
+        Endianness of the data section of 8 byte files, None, 'big', or 'little'. Files of
+        4 byte floats are always big endian. Default None, which is little.
+    unrecognized_units : str
+        'ignore' (default) assigns dimensionless to unrecognized units, 'error' will fail
+        if unrecognized units are encountered.
+    clean_header : bool
+        Remove extra whitespace in the column names and units. Default True.
+
+    Returns
+    -------
+    dataset : `LookSeries`
+
+    Raises
+    ------
+    ValueError
+        If no files are given, the files do not all have the same column names and
+        units, or a file's header does not match the layout of its data.
+    """
+    filenames = [os.fspath(filename) for filename in filenames]
+    if not filenames:
+        raise ValueError('At least one look file is needed.')
+
+    file_metadata = []
+    headers = []
+    for filename in filenames:
+        metadata = _read_binary_file_metadata(Path(filename), clean_header=clean_header)
+        with open(filename, 'rb') as f:
+            f.seek(36)
+            names, col_units, col_recs = _read_column_headers(f, metadata, clean_header)
+        _check_layout(filename, metadata, names, col_recs)
+        if headers and (names, col_units) != headers[0]:
+            raise ValueError(f'{filename} has columns {_describe(names, col_units)}, but '
+                             f'{filenames[0]} has {_describe(*headers[0])}.')
+        file_metadata.append(metadata)
+        headers.append((names, col_units))
+
+    names, col_units = headers[0]
+    segments = [_map_data(filename, metadata, data_endianness)
+                for filename, metadata in zip(filenames, file_metadata)]
+    return LookSeries(filenames, file_metadata, names,
+                      _parse_units(col_units, unrecognized_units), segments)
+
+
+@exporter.export
+class LookSeries(Mapping):
+    """
+    Experiment data in consecutive look files, with columns read only when needed.
+
+    Looking up a column by name gives a `SeriesColumn`, which reads rows from the files
+    that hold them. The ``rec_num`` column numbers the rows over the whole series. Use
+    `open_series` to get a series.
+    """
+
+    def __init__(self, filenames, file_metadata, names, data_units, segments):
+        """Set up the series from already validated files."""
+        self.filenames = filenames
+        self.file_metadata = file_metadata
+        self._units = dict(zip(['rec_num'] + names, [units.dimensionless] + data_units))
+        self._segments = segments
+
+    @property
+    def metadata(self):
+        """Get the metadata of the first file, with the records of the whole series."""
+        metadata = dict(self.file_metadata[0])
+        metadata['number of records'] = self.n_rows
+        metadata['files'] = list(self.filenames)
+        return metadata
+
+    @property
+    def n_rows(self):
+        """Get the number of rows."""
+        return sum(self.chunk_rows)
+
+    @property
+    def chunk_rows(self):
+        """Get the number of rows in each file."""
+        return [segment.shape[1] for segment in self._segments]
+
+    def __getitem__(self, name):
+        """Get a column by name."""
+        if name == 'rec_num':
+            return SeriesColumn(None, self.chunk_rows, self._units[name])
+        index = list(self._units).index(name) - 1
+        return SeriesColumn([segment[index] for segment in self._segments],
+                            self.chunk_rows, self._units[name])
+
+    def __iter__(self):
+        """Iterate over the column names."""
+        return iter(self._units)
+
+    def __len__(self):
+        """Get the number of columns."""
+        return len(self._units)
+
+    def __repr__(self):
+        """Summarize the series."""
+        return (f'LookSeries({self.n_rows} rows in {len(self.filenames)} files, '
+                f'{len(self)} columns)')
+
+    def read(self, names=None, start=None, stop=None):
+        """
+        Read rows of columns into memory.
+
+        Parameters
+        ----------
+        names : sequence of str, optional
+            Columns to read. Defaults to all of them.
+        start, stop : int, optional
+            Range of rows to read. Defaults to all rows.
+
+        Returns
+        -------
+        experiment : `pylook.experiment.Experiment`
+            The columns, with the metadata of the series.
+        """
+        names = list(self) if names is None else list(names)
+        rows = slice(start, stop)
+        n_rows = len(range(*rows.indices(self.n_rows)))
+        experiment = Experiment(n_rows=n_rows, capacity=len(names), metadata=self.metadata)
+        for name in names:
+            experiment[name] = self[name][rows]
+        return experiment
+
+
+@exporter.export
+class SeriesColumn(ChunkedColumn):
+    """
+    A column of a `LookSeries`, chained from a memory mapped piece of each file.
+
+    Indexing works as for `pylook.io.ChunkedColumn`: rows within one file are a view of
+    that file's memory map, and only rows that span files are copied.
+    """
+
+    def __init__(self, segments, chunk_rows, units):
+        """Set up the column from its piece of each file, or record numbers if None."""
+        super().__init__(None, chunk_rows, units, np.dtype(np.float64), False)
+        self._segments = segments
+
+    def __repr__(self):
+        """Summarize the column."""
+        return (f'SeriesColumn({len(self)} rows in {len(self._starts) - 1} files, '
+                f'{self.units:~})')
+
+    def _chunk(self, i):
+        """Get the piece of the column in a file."""
+        if self._segments is None:
+            return np.arange(self._starts[i], self._starts[i + 1], dtype=self.dtype)
+        return self._segments[i]
+
+
+def _map_data(filename, metadata, data_endianness):
+    """Memory map the data section of a look file, with a row per column."""
+    if metadata['bytes per data point'] == 4:
+        dtype = '>f4'
+    elif metadata['bytes per data point'] == 8:
+        dtype = '>f8' if data_endianness == 'big' else '<f8'
+    else:
+        raise ValueError('Bytes per data must be 4 or 8. Got'
+                         f" {metadata['bytes per data point']}")
+
+    shape = (metadata['number of columns'], metadata['number of records'])
+    if not shape[0] * shape[1]:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(filename, dtype=dtype, mode='r', shape=shape,
+                     offset=36 + 84 * metadata['header format'])
+
+
+def _check_layout(filename, metadata, names, col_recs):
+    """Check that every column holds the number of records the data section is mapped with."""
+    n_columns = metadata['number of columns']
+    n_records = metadata['number of records']
+    if len(names) != n_columns:
+        raise ValueError(f'{filename} has {len(names)} named columns, but its header '
+                         f'says it has {n_columns}.')
+    short = ', '.join(f'{name} ({n})' for name, n in zip(names, col_recs) if n != n_records)
+    if short:
+        raise ValueError(f'{filename} has {n_records} records, but these columns hold a '
+                         f'different number: {short}.')
+
+
+def _describe(names, col_units):
+    """Format column names and units for messages."""
+    return ', '.join(f'{name} ({unit})' for name, unit in zip(names, col_units))
@@ -0,0 +1,242 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Contains a recordable sequence of reduction steps that can be replayed on experiments."""
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import inspect
+import operator
+
+import numpy as np
+
+from .calc.backend import get_backend, set_backend
+from .package_tools import Exporter
+
+exporter = Exporter(globals())
+
+Step = namedtuple('Step', ['func', 'inputs', 'output', 'args', 'kwargs'])
+
+
+@exporter.export
+class Pipeline:
+    """
+    A recorded sequence of reduction steps, like an r file, that can be replayed.
+
+    Each step calls a function, such as one from `pylook.calc`, with columns of the
+    experiment data followed by any other parameters, and stores the result as a column.
+    Once recorded, the steps can be run on the data of any number of experiments.
+
+    Examples
+    --------
+    >>> reduction = (Pipeline()
+    ...              .scale('Vert_Load', 1.597778959e-3 * units('MPa / bit'))
+    ...              .rename('Vert_Load', 'Shear Stress')
+    ...              .add('zero', 'Shear Stress', 1518, mode='before'))
+    >>> reduced = reduction.run(data)  # doctest: +SKIP
+
+    Notes
+    -----
+    A step whose output column was created by an earlier step, and whose function takes
+    an ``out`` argument, writes its result into that column rather than a new array, so a
+    chain of steps on one column allocates only once. Columns of the data given to `run`
+    are never written to.
+    """
+
+    def __init__(self, steps=None):
+        """Start a pipeline, optionally with already recorded steps."""
+        self.steps = []
+        for step in steps or []:
+            self.add(step.func, step.inputs, *step.args, output=step.output, **step.kwargs)
+
+    def add(self, func, inputs, *args, output=None, **kwargs):
+        """
+        Record a step.
+
+        Parameters
+        ----------
+        func : callable or str
+            Function to call, or the name of a function in `pylook.calc`.
+        inputs : str or sequence of str
+            Names of the columns passed, in order, as the first arguments of `func`.
+        args
+            Other positional arguments of `func`.
+        output : str, optional
+            Name of the column to store the result in. Defaults to the first input.
+        kwargs
+            Keyword arguments of `func`.
+
+        Returns
+        -------
+        pipeline : `Pipeline`
+            This pipeline, so steps can be chained.
+        """
+        if isinstance(func, str):
+            from . import calc
+            try:
+                func = getattr(calc, func)
+            except AttributeError:
+                raise ValueError(f'There is no function {func} in pylook.calc.') from None
+        inputs = (inputs,) if isinstance(inputs, str) else tuple(inputs)
+        output = inputs[0] if output is None else output
+        self.steps.append(Step(func, inputs, output, args, kwargs))
+        return self
+
+    def scale(self, column, factor, output=None):
+        """
+        Record multiplying a column by a factor, such as a calibration.
+
+        Parameters
+        ----------
+        column : str
+            Name of the column.
+        factor : `pint.Quantity` or float
+            Factor to multiply by.
+        output : str, optional
+            Name of the column to store the result in. Defaults to `column`.
+
+        Returns
+        -------
+        pipeline : `Pipeline`
+            This pipeline, so steps can be chained.
+        """
+        return self.add(operator.mul, column, factor, output=output)
+
+    def rename(self, old, new):
+        """
+        Record renaming a column.
+
+        Parameters
+        ----------
+        old, new : str
+            Current and new name of the column.
+
+        Returns
+        -------
+        pipeline : `Pipeline`
+            This pipeline, so steps can be chained.
+        """
+        return self.add(None, old, output=new)
+
+    def plan(self):
+        """
+        Work out which steps can write into an array created by an earlier step.
+
+        Returns
+        -------
+        reuse : list of bool
+            For each step, whether it will be given its output column as ``out``. The
+            array is still checked when the pipeline runs and is only reused if no
+            other column views it.
+        """
+        created = set()
+        reuse = []
+        for step in self.steps:
+            if step.func is None:
+                reuse.append(False)
+                if step.inputs[0] in created:
+                    created.discard(step.inputs[0])
+                    created.add(step.output)
+                else:
+                    created.discard(step.output)
+                continue
+            reuse.append(step.output in created and _accepts_out(step.func))
+            created.add(step.output)
+        return reuse
+
+    def run(self, data):
+        """
+        Run the steps on the data of an experiment.
+
+        Parameters
+        ----------
+        data : dict or `Experiment`
+            Columns of experiment data. Not modified.
+
+        Returns
+        -------
+        reduced : dict
+            Columns after running every step. Columns no step changed are the columns of
+            `data` themselves.
+        """
+        results = dict(data)
+        originals = list(results.values())
+        for step, reuse in zip(self.steps, self.plan()):
+            if step.func is None:
+                results[step.output] = results.pop(step.inputs[0])
+                continue
+
+            columns = [results[name] for name in step.inputs]
+            kwargs = step.kwargs
+            if reuse:
+                out = _reusable(results, step.output, columns[0], originals)
+                if out is not None:
+                    kwargs = dict(kwargs, out=out)
+            results[step.output] = step.func(*columns, *step.args, **kwargs)
+
+        return results
+
+    def run_many(self, datasets, workers=None):
+        """
+        Run the steps on the data of several experiments in parallel.
+
+        Parameters
+        ----------
+        datasets : iterable of dict or `Experiment`
+            Columns of each experiment's data.
+        workers : int, optional
+            Number of processes to use. Defaults to the number of processors. With 1 the
+            experiments are reduced one after another in this process.
+
+        Returns
+        -------
+        reduced : list of dict
+            Columns after running every step, for each experiment in order.
+        """
+        datasets = list(datasets)
+        if workers == 1 or len(datasets) < 2:
+            return [self.run(data) for data in datasets]
+
+        # Workers use the same calculation backend as this process
+        with ProcessPoolExecutor(max_workers=workers, initializer=set_backend,
+                                 initargs=(get_backend(),)) as executor:
+            return list(executor.map(self.run, datasets))
+
+    def __len__(self):
+        """Get the number of steps."""
+        return len(self.steps)
+
+    def __repr__(self):
+        """List the steps."""
+        lines = []
+        for step in self.steps:
+            if step.func is None:
+                lines.append(f'  rename {step.inputs[0]!r} -> {step.output!r}')
+                continue
+            params = [repr(name) for name in step.inputs]
+            params.extend(repr(arg) for arg in step.args)
+            params.extend(f'{key}={value!r}' for key, value in step.kwargs.items())
+            lines.append(f'  {step.output!r} = {step.func.__name__}({", ".join(params)})')
+        return '\n'.join(['Pipeline(['] + lines + ['])'])
+
+
+def _accepts_out(func):
+    """Check if a function takes an out argument."""
+    try:
+        return 'out' in inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def _reusable(results, name, first_input, originals):
+    """Get the magnitude of a column to write a result into, if nothing else views it."""
+    buffer = getattr(results[name], 'magnitude', results[name])
+    if (not isinstance(buffer, np.ndarray) or not buffer.flags.writeable
+            or buffer.shape != np.shape(getattr(first_input, 'magnitude', first_input))):
+        return None
+    others = [column for other, column in results.items() if other != name]
+    for column in others + originals:
+        if np.may_share_memory(getattr(column, 'magnitude', column), buffer):
+            return None
+    return buffer
@@ -0,0 +1,218 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""
+Contains tools to hand experiment data to other processes through shared memory.
+
+Sending data to a worker process normally pickles every column, copying it. Instead, the
+columns can be placed once in a block of shared memory with `share`, and only a small
+descriptor of the block sent to the workers, which `attach` to it and get views of the
+columns without copying anything::
+
+    with share(data) as shared:
+        results = executor.map(reduce_experiment, [shared.descriptor] * 4)
+
+    def reduce_experiment(descriptor):
+        with attach(descriptor) as shared:
+            data = shared.data
+            ...
+"""
+
+import ctypes
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from .experiment import Experiment
+from .package_tools import Exporter
+from .units import units
+
+exporter = Exporter(globals())
+
+# Columns start on cache line boundaries
+_ALIGNMENT = 64
+
+
+@exporter.export
+def share(data):
+    """
+    Copy experiment data into a new block of shared memory.
+
+    Parameters
+    ----------
+    data : dict or `pylook.experiment.Experiment`
+        Columns of experiment data.
+
+    Returns
+    -------
+    shared : `SharedData`
+        Owner of the block. Its `SharedData.descriptor` is sent to other processes, and
+        the block is freed when it is closed.
+    """
+    if isinstance(data, Experiment):
+        # Columns of each data type go together in a buffer of that type
+        groups = {}
+        for name in data.names:
+            groups.setdefault(data[name].magnitude.dtype, []).append(name)
+        buffers = []
+        columns = []
+        size = 0
+        for i, (dtype, names) in enumerate(groups.items()):
+            shape = (len(names), data.n_rows)
+            buffers.append({'dtype': dtype.str, 'shape': shape, 'offset': size})
+            columns.extend({'name': name, 'units': str(data.column_units[name]),
+                            'buffer': i} for name in names)
+            size += -(-int(np.prod(shape)) * dtype.itemsize // _ALIGNMENT) * _ALIGNMENT
+        descriptor = {'kind': 'experiment', 'buffers': buffers, 'columns': columns,
+                      'names': data.names, 'n_rows': data.n_rows, 'metadata': data.metadata}
+    else:
+        columns = []
+        size = 0
+        for name, column in data.items():
+            magnitude = np.asarray(getattr(column, 'magnitude', column))
+            columns.append({'name': name, 'dtype': magnitude.dtype.str,
+                            'units': str(getattr(column, 'units', '')) or None,
+                            'shape': magnitude.shape, 'offset': size})
+            size += -(-magnitude.nbytes // _ALIGNMENT) * _ALIGNMENT
+        descriptor = {'kind': 'dict', 'columns': columns}
+
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    descriptor['name'] = shm.name
+    shared = SharedData(shm, descriptor, owner=True)
+    for name, column in data.items():
+        view = shared.data[name]
+        getattr(view, 'magnitude', view)[...] = getattr(column, 'magnitude', column)
+    return shared
+
+
+@exporter.export
+def attach(descriptor):
+    """
+    Get the experiment data in a block of shared memory made by `share`.
+
+    Parameters
+    ----------
+    descriptor : dict
+        The `SharedData.descriptor` of the block.
+
+    Returns
+    -------
+    shared : `SharedData`
+        Handle on the block, whose `SharedData.data` are views of it. Closing it detaches
+        this process but leaves the block for its owner to free.
+    """
+    return SharedData(_open_untracked(descriptor['name']), descriptor, owner=False)
+
+
+@exporter.export
+class SharedData:
+    """
+    A block of shared memory holding the columns of an experiment.
+
+    Use `share` to make one and `attach` to use it in another process. Close it, or use
+    it as a context manager, when done; the owner frees the block when it closes.
+
+    Notes
+    -----
+    Writes to the columns are seen by every process attached to the block. A block can
+    only be closed once nothing refers to its columns, so results kept after closing
+    must be copies rather than views of the data.
+    """
+
+    def __init__(self, shm, descriptor, owner):
+        """Wrap a block of shared memory."""
+        self._shm = shm
+        self._owner = owner
+        self._closed = False
+        self.descriptor = descriptor
+        self.data = _views(shm, descriptor)
+
+    def __enter__(self):
+        """Use the block."""
+        return self
+
+    def __exit__(self, *exc):
+        """Close the block."""
+        self.close()
+
+    def __repr__(self):
+        """Summarize the block."""
+        state = 'closed' if self._closed else f'{self._shm.size} bytes'
+        return (f'SharedData({self.descriptor["name"]!r}, '
+                f'{len(self.descriptor["columns"])} columns, {state})')
+
+    def close(self):
+        """
+        Detach from the block, freeing it if this is the owner.
+
+        Raises
+        ------
+        BufferError
+            If views of the columns are still in use in this process. The block is left
+            open, and freed by a later successful close.
+        """
+        if self._closed:
+            return
+        self.data = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # The block's buffer was released before its memory map failed to close
+            if self._shm._buf is None:
+                self._shm._buf = memoryview(self._shm._mmap)
+            self.data = _views(self._shm, self.descriptor)
+            raise BufferError('Columns of the shared data are still in use. Delete them, '
+                              'or keep copies, before closing.') from None
+        if self._owner:
+            # Attaching in this process, or a child sharing its resource tracker, takes
+            # the block off the tracker's list, and unlinking expects to find it there
+            resource_tracker.register(self._shm._name, 'shared_memory')
+            self._shm.unlink()
+            self._owner = False
+        self._closed = True
+
+
+def _open_untracked(name):
+    """
+    Open an existing block of shared memory without registering it for cleanup.
+
+    Only the owner frees a block. Otherwise the resource tracker of a process that is not
+    a child of the owner would remove the block when that process exits, while others
+    are still using it.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python before 3.13 always registers the block, so take it off the list again
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def _views(shm, descriptor):
+    """Make the columns described by a descriptor as views of a block of shared memory."""
+    # NumPy does not keep the block's buffer locked, so the views go through a ctypes
+    # array that does. Closing the block while they are in use then fails safely.
+    block = np.frombuffer((ctypes.c_char * len(shm.buf)).from_buffer(shm.buf),
+                          dtype=np.uint8)
+
+    if descriptor['kind'] == 'experiment':
+        groups = [(np.ndarray(buffer['shape'], dtype=buffer['dtype'], buffer=block,
+                              offset=buffer['offset']), [], [])
+                  for buffer in descriptor['buffers']]
+        for column in descriptor['columns']:
+            groups[column['buffer']][1].append(column['name'])
+            groups[column['buffer']][2].append(column['units'])
+        if not groups:
+            return Experiment(n_rows=descriptor['n_rows'], metadata=descriptor['metadata'])
+        return Experiment.from_buffers(groups, descriptor['names'],
+                                       metadata=descriptor['metadata'])
+
+    data = {}
+    for column in descriptor['columns']:
+        view = np.ndarray(column['shape'], dtype=column['dtype'], buffer=block,
+                          offset=column['offset'])
+        data[column['name']] = (view if column['units'] is None
+                                else units.Quantity(view, column['units']))
+    return data
@@ -4,6 +4,8 @@
 
 """Collection of utilities for testing."""
 
+import struct
+
 import numpy as np
 import numpy.testing
 from pint import DimensionalityError
@@ -76,3 +78,34 @@ def assert_array_almost_equal(actual, desired, decimal=7):
     actual, desired = check_and_drop_units(actual, desired)
     check_mask(actual, desired)
     numpy.testing.assert_array_almost_equal(actual, desired, decimal)
+
+
+def write_look_file(path, names, column_units, columns, bytes_per_point=8):
+    """
+    Write columns to a look binary file, for testing the readers.
+
+    Parameters
+    ----------
+    path : str or `pathlib.Path`
+        File to write.
+    names, column_units : sequence of str
+        Name and units of each column.
+    columns : array-like
+        Data, one row per column.
+    bytes_per_point : int
+        8 for little endian doubles, or 4 for big endian floats as written by older
+        versions of look. Default 8.
+    """
+    columns = np.asarray(columns, dtype=float)
+    n_headers = 32 if bytes_per_point == 8 else 16
+    with open(path, 'wb') as f:
+        f.write(b'test'.ljust(20, b'\0'))
+        f.write(struct.pack('>iiii', columns.shape[1], len(columns), 0, 0))
+        for i in range(n_headers):
+            name, unit = (names[i], column_units[i]) if i < len(names) else ('no_val', '')
+            f.write(name.encode().ljust(13, b'\0'))
+            f.write(unit.encode().ljust(13, b'\0'))
+            f.write(struct.pack('>i', 0))
+            f.write(b'\0' * 50)
+            f.write(struct.pack('>i', columns.shape[1]))
+        f.write(columns.astype('<f8' if bytes_per_point == 8 else '>f4').tobytes())
@@ -13,6 +13,13 @@ Attributes
 units : :class:`pint.UnitRegistry`
     The unit registry used throughout the package. Any use of units in MetPy should
     import this registry and use it to grab units.
+
+Notes
+-----
+Importing this module makes `units` pint's application registry, with
+:func:`pint.set_application_registry`. Quantities unpickled in worker processes then use
+the same registry as those made by pylook. This replaces any application registry set
+before pylook is imported, and any set afterwards is used for unpickled quantities instead.
 """
 import functools
 import logging
@@ -56,4 +63,64 @@ if hasattr(pint, 'UnitStrippedWarning'):
 # Enable pint's built-in matplotlib support
 units.setup_matplotlib()
 
+# Unpickled quantities, such as those sent to worker processes, use this registry
+pint.set_application_registry(units)
+
 del pint
+
+
+@functools.lru_cache(maxsize=512)
+def conversion_factor(from_units, to_units):
+    """
+    Get the multiplicative factor that converts values from one unit to another.
+
+    Factors are cached by unit pair, so repeated calls are cheap and the conversion
+    of large arrays becomes a single multiplication (or nothing at all if the factor is 1).
+
+    Parameters
+    ----------
+    from_units : `pint.Unit`
+        Units of the values to be converted.
+    to_units : `pint.Unit`
+        Units we want to convert to.
+
+    Returns
+    -------
+    factor : float
+        Scale factor such that ``magnitude_in_to_units = factor * magnitude_in_from_units``.
+
+    Raises
+    ------
+    DimensionalityError
+        If the units are not compatible.
+    ValueError
+        If the conversion is not purely multiplicative (i.e. offset units like degC).
+    """
+    if units.Quantity(0., from_units).m_as(to_units) != 0:
+        raise ValueError(f'Conversion from {from_units} to {to_units} is not multiplicative.')
+    return units.Quantity(1., from_units).m_as(to_units)
+
+
+def magnitude_in(value, to_units):
+    """
+    Get the magnitude of a value expressed in the given units.
+
+    Parameters
+    ----------
+    value : `pint.Quantity` or array-like
+        Value to convert. Values without units are assumed to already be in `to_units`.
+    to_units : `pint.Unit`
+        Units in which we want the magnitude.
+
+    Returns
+    -------
+    magnitude : array-like
+        Magnitude of `value` in `to_units`. Arrays already in `to_units` are returned
+        without a copy.
+    """
+    if not hasattr(value, 'units'):
+        return value
+    factor = conversion_factor(value.units, to_units)
+    if factor == 1:
+        return value.magnitude
+    return value.magnitude * factor
@@ -0,0 +1,176 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Test the `backend` module."""
+
+import numpy as np
+import pytest
+
+import pylook
+from pylook.calc import (backend, cumsum, cumulative_trapezoid, detect_offsets,
+                         detect_stick_slip, elastic_correction, friction, get_backend,
+                         gradient, rsf, running_mean, set_backend, StreamingCumsum,
+                         StreamingCumulativeTrapezoid, StreamingGradient,
+                         StreamingRunningMean, zero)
+from pylook.testing import assert_array_almost_equal
+from pylook.units import units
+
+
+@pytest.fixture
+def numba_backend():
+    """Use the numba backend for a test, restoring the previous backend after."""
+    pytest.importorskip('numba')
+    previous = set_backend('numba')
+    yield
+    set_backend(previous)
+
+
+@pytest.fixture
+def threads(monkeypatch):
+    """Use four threads and small chunks for a test, restoring one thread after."""
+    monkeypatch.setattr(backend, 'MIN_CHUNK_ROWS', 100)
+    previous = pylook.set_num_threads(4)
+    yield
+    pylook.set_num_threads(previous)
+
+
+def test_default_backend():
+    """Test that NumPy is the default backend."""
+    assert get_backend() == 'numpy'
+
+
+def test_unknown_backend():
+    """Test that an unknown backend is an error and leaves the backend alone."""
+    with pytest.raises(ValueError):
+        set_backend('fortran')
+    assert get_backend() == 'numpy'
+
+
+@pytest.mark.parametrize('law', ['aging', 'slip'])
+def test_rsf_backends_match(numba_backend, law):
+    """Test that the compiled rate and state model matches the NumPy one."""
+    time = np.linspace(0, 40, 401) * units('s')
+    velocity = np.where(time.m < 10, 1., 10.) * units('micron/s')
+    args = (time, velocity, 0.01, [0.01, 0.005], [5, 20] * units('micron'),
+            0.01 / units('micron'))
+
+    compiled = rsf.forward_model(*args, law=law)
+    set_backend('numpy')
+    reference = rsf.forward_model(*args, law=law)
+
+    np.testing.assert_allclose(compiled.m, reference.m, rtol=0, atol=1e-12)
+
+
+def test_threshold_groups_backends_match(numba_backend):
+    """Test that compiled event grouping gives identical catalogs."""
+    rng = np.random.default_rng(6)
+    stress = (np.arange(5000) % 97) * 0.01 + rng.normal(0, 1e-3, 5000)
+    data = np.cumsum(rng.normal(size=5000))
+    data[rng.integers(0, 5000, 20)] += 100
+
+    events = detect_stick_slip(stress * units('MPa'), np.arange(5000) * units('s'))
+    offsets = detect_offsets(data * units('mm'), max_gap=3)
+    set_backend('numpy')
+    reference_events = detect_stick_slip(stress * units('MPa'), np.arange(5000) * units('s'))
+    reference_offsets = detect_offsets(data * units('mm'), max_gap=3)
+
+    for name in events.dtype.names:
+        np.testing.assert_array_equal(events[name], reference_events[name])
+    np.testing.assert_array_equal(offsets, reference_offsets)
+
+
+def test_cumulative_backends_match(numba_backend):
+    """Test that the compiled running totals give identical results."""
+    rng = np.random.default_rng(7)
+    y = rng.normal(size=1000)
+    x = np.cumsum(rng.uniform(0.5, 1.5, 1000))
+
+    def calculate():
+        integrator = StreamingCumulativeTrapezoid(spacing=0.1)
+        averager = StreamingRunningMean()
+        streamed = [np.concatenate([integrator.update(y[:300]), integrator.update(y[300:])]),
+                    np.concatenate([averager.update(y[:300]), averager.update(y[300:])])]
+        return [cumsum(y), cumulative_trapezoid(y, spacing=0.1), cumulative_trapezoid(y, x=x),
+                running_mean(y)] + streamed
+
+    results = calculate()
+    set_backend('numpy')
+    for result, reference in zip(results, calculate()):
+        np.testing.assert_array_equal(result, reference)
+
+
+def test_default_num_threads():
+    """Test that calculations run on one thread by default."""
+    assert pylook.get_num_threads() == 1
+    assert backend.row_chunks(10 ** 8) is None
+
+
+def test_num_threads_invalid():
+    """Test that at least one thread is needed."""
+    with pytest.raises(ValueError):
+        pylook.set_num_threads(0)
+
+
+def test_row_chunks(threads):
+    """Test that rows are divided among the threads, unless there are too few."""
+    chunks = backend.row_chunks(1000)
+    assert len(chunks) == 4
+    assert chunks[0].start == 0 and chunks[-1].stop == 1000
+    assert all(a.stop == b.start for a, b in zip(chunks[:-1], chunks[1:]))
+    assert len(backend.row_chunks(250)) == 2
+    assert backend.row_chunks(150) is None
+
+
+def test_threaded_kernels_match(threads):
+    """Test that calculations split across threads match the single threaded results."""
+    rng = np.random.default_rng(2)
+    load = rng.uniform(1, 10, 1001) * units('MPa')
+    disp = np.cumsum(rng.uniform(0, 1, 1001)) * units('micron')
+    coeffs = [0.1 * units('micron / MPa ** 2'), 2 * units('micron / MPa'),
+              0 * units('micron')]
+
+    results = [zero(disp, 500, window=3), friction(load, disp.m * units('MPa')),
+               elastic_correction(load, disp, coeffs), cumsum(disp)]
+    previous = pylook.set_num_threads(1)
+    expected = [zero(disp, 500, window=3), friction(load, disp.m * units('MPa')),
+                elastic_correction(load, disp, coeffs), cumsum(disp)]
+    pylook.set_num_threads(previous)
+    for result, wanted in zip(results, expected):
+        assert_array_almost_equal(result, wanted, 9)
+
+
+def test_threaded_inplace(threads):
+    """Test writing a threaded result into its input."""
+    data = np.arange(1000.) * units('mm')
+    expected = data.m - 10
+    zero(data, 10, inplace=True)
+    np.testing.assert_array_equal(data.m, expected)
+
+
+def test_threaded_records(threads):
+    """Test splitting a stack of records along their rows."""
+    load = np.tile(np.linspace(1, 5, 1000), (3, 1))
+    disp = np.ones((3, 1000))
+    result = elastic_correction(load * units('MPa'), disp * units('mm'),
+                                [np.array([1., 2., 3.]) * units('mm / MPa'),
+                                 0 * units('mm')])
+    np.testing.assert_allclose(result.m, disp - np.array([[1.], [2.], [3.]]) * load)
+
+
+def test_threaded_streaming(threads):
+    """Test that streaming on several threads matches whole records to rounding."""
+    rng = np.random.default_rng(8)
+    y = rng.normal(size=1000) * units('MPa')
+    x = np.cumsum(rng.uniform(0.5, 1.5, 1000)) * units('s')
+
+    streams = [(StreamingCumsum(), cumsum(y), (y,)),
+               (StreamingCumulativeTrapezoid(), cumulative_trapezoid(y, x), (y, x)),
+               (StreamingRunningMean(), running_mean(y), (y,)),
+               (StreamingGradient(), gradient(y, x), (y, x))]
+    for streaming, expected, columns in streams:
+        pieces = [streaming.update(*(column[:250] for column in columns)),
+                  streaming.update(*(column[250:] for column in columns)),
+                  streaming.finalize()]
+        result = np.concatenate([piece.m for piece in pieces])
+        np.testing.assert_allclose(result, expected.m, rtol=1e-12, atol=1e-12)
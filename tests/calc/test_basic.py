@@ -5,8 +5,9 @@
 """Test the `basic` module."""
 
 import numpy as np
+import pytest
 
-from pylook.calc import (elastic_correction, friction, remove_offset, zero)
+from pylook.calc import (elastic_correction, friction, remove_offset, remove_offsets, zero)
 from pylook.testing import assert_array_almost_equal
 from pylook.units import units
 
@@ -110,6 +111,38 @@ def test_remove_offset_set_between():
     assert_array_almost_equal(result, truth)
 
 
+def test_remove_offsets_matches_remove_offset():
+    """Test that removing several offsets at once matches removing them one at a time."""
+    data = np.cumsum(np.arange(30.)) * units('mm')
+    intervals = [(20, 24), (3, 5), (10, 15)]
+    set_between = [True, False, True]
+
+    result = remove_offsets(data, intervals, set_between=set_between)
+
+    truth = data
+    for (start_idx, end_idx), flag in zip(intervals, set_between):
+        truth = remove_offset(truth, start_idx, end_idx, set_between=flag)
+    assert_array_almost_equal(result, truth)
+
+
+def test_remove_offsets_inplace():
+    """Test removing several offsets in place."""
+    data = np.array([0, 1, 5, 6, 7, 2, 3, 4, 9, 10]) * units('mm')
+
+    remove_offsets(data, [(1, 2), (7, 8)], inplace=True)
+
+    truth = np.array([0, 1, 1, 2, 3, -2, -1, 0, 0, 1]) * units('mm')
+    assert_array_almost_equal(data, truth)
+
+
+def test_remove_offsets_overlapping():
+    """Test that overlapping offsets are an error."""
+    data = np.arange(10) * units('mm')
+
+    with pytest.raises(ValueError):
+        remove_offsets(data, [(1, 5), (4, 8)])
+
+
 def test_elastic_correction_linear_same_units():
     """Test the elastic correction with all consistent units given."""
     coeffs = [5 * units('mm/kN'), 10 * units('mm')]
@@ -170,3 +203,158 @@ def test_friction():
     truth = np.array([0, 0, 2.2, 1.1, 0.7333333, 0.55, 0.44]) * units('dimensionless')
 
     assert_array_almost_equal(result, truth)
+
+
+def test_zero_inplace():
+    """Test that zero can write into the input data."""
+    data = np.arange(10.) * units('mm')
+    buffer = data.m
+
+    result = zero(data, 5, mode='before', inplace=True)
+
+    truth = np.array([0, 0, 0, 0, 0, 0, 1, 2, 3, 4]) * units('mm')
+    assert_array_almost_equal(result, truth)
+    assert result.m is buffer
+
+
+def test_zero_out_different_units():
+    """Test that zero converts the result into the units of out."""
+    data = np.arange(10.) * units('mm')
+    out = np.empty(10) * units('micron')
+
+    result = zero(data, 5, out=out)
+
+    truth = np.array([-5000, -4000, -3000, -2000, -1000, 0, 1000, 2000, 3000, 4000])
+    assert result is out
+    np.testing.assert_array_almost_equal(out.m, truth)
+
+
+def test_zero_out_and_inplace():
+    """Test that giving both out and inplace is an error."""
+    data = np.arange(10.) * units('mm')
+
+    with pytest.raises(ValueError):
+        zero(data, 5, out=data, inplace=True)
+
+
+def test_remove_offset_does_not_modify_input():
+    """Test that remove offset leaves the input alone by default."""
+    data = np.array([0, 1, 2, 4, 4, 10, 10, 11, 12, 13, 14]) * units('mm')
+
+    remove_offset(data, 4, 6, set_between=True)
+
+    truth = np.array([0, 1, 2, 4, 4, 10, 10, 11, 12, 13, 14]) * units('mm')
+    assert_array_almost_equal(data, truth)
+
+
+def test_remove_offset_inplace():
+    """Test the remove offset function working in place."""
+    data = np.array([0, 1, 2, 4, 4, 10, 10, 11, 12, 13, 14]) * units('mm')
+
+    remove_offset(data, 4, 6, set_between=True, inplace=True)
+
+    truth = np.array([0, 1, 2, 4, 4, 4, 4, 5, 6, 7, 8]) * units('mm')
+    assert_array_almost_equal(data, truth)
+
+
+def test_elastic_correction_inplace():
+    """Test the elastic correction overwriting the displacement."""
+    coeffs = [2 * units('mm/kN**2'), 5 * units('mm/kN'), 10 * units('mm')]
+    loads = np.arange(10., 101, 10) * units('kN')
+    displacements = (np.arange(1., 11) * 1000) * units('mm')
+
+    elastic_correction(loads, displacements, coeffs, inplace=True)
+
+    truth = np.array([740, 1090, 1040, 590, -260, -1510, -3160, -5210,
+                      -7660, -10510]) * units('mm')
+    assert_array_almost_equal(displacements, truth)
+
+
+def test_elastic_correction_out():
+    """Test the elastic correction with a separate output array."""
+    coeffs = [5 * units('mm/kN'), 10 * units('mm')]
+    loads = np.arange(10., 101, 10) * units('kN')
+    displacements = (np.arange(1., 11) * 1000) * units('mm')
+    out = np.empty(10) * units('m')
+
+    elastic_correction(loads, displacements, coeffs, out=out)
+
+    truth = np.array([940, 1890, 2840, 3790, 4740, 5690, 6640, 7590, 8540, 9490]) * units('mm')
+    assert_array_almost_equal(out, truth)
+
+
+def test_friction_inplace():
+    """Test that friction can reuse the shear component buffer."""
+    sigma_n = np.array([-100, 0, 1000, 2000, 3000, 4000, 5000]) * units('N')
+    tau = np.array([0, 0, 2.2, 2.2, 2.2, 2.2, 2.2]) * units('kN')
+
+    result = friction(tau, sigma_n, inplace=True)
+
+    truth = np.array([0, 0, 2.2, 1.1, 0.7333333, 0.55, 0.44]) * units('dimensionless')
+    assert_array_almost_equal(result, truth)
+    assert result.m is tau.m
+
+
+def _records():
+    """Make a stack of three different records."""
+    rng = np.random.default_rng(5)
+    return np.cumsum(rng.normal(size=(3, 50)), axis=1) * units('mm')
+
+
+@pytest.mark.parametrize('mode', ['at', 'before', 'after'])
+def test_zero_records(mode):
+    """Test zeroing a stack of records matches zeroing each one."""
+    data = _records()
+    zero_idx = [10, 20, 30]
+    window = [0, 2, 3]
+    value = [0, 1, 2] * units('mm')
+
+    result = zero(data, zero_idx, window=window, value=value, mode=mode)
+
+    for i in range(3):
+        truth = zero(data[i], zero_idx[i], window=window[i], value=value[i], mode=mode)
+        assert_array_almost_equal(result[i], truth)
+
+
+def test_zero_records_window_at_start():
+    """Test that windows running past the start of the data match for stacks and records."""
+    data = _records()
+    zero_idx = [1, 2, 0]
+    window = [3, 5, 2]
+
+    result = zero(data, zero_idx, window=window)
+
+    for i in range(3):
+        truth = data[i] - data[i][:zero_idx[i] + window[i] + 1].mean()
+        assert_array_almost_equal(zero(data[i], zero_idx[i], window=window[i]), truth)
+        assert_array_almost_equal(result[i], truth)
+
+
+@pytest.mark.parametrize('set_between', [False, True, [True, False, True]])
+def test_remove_offset_records(set_between):
+    """Test removing offsets from a stack of records matches each one."""
+    data = _records()
+    start_idx = np.array([5, 10, 15])
+    end_idx = start_idx + [3, 1, 7]
+
+    result = remove_offset(data, start_idx, end_idx, set_between=set_between)
+
+    set_between = np.broadcast_to(set_between, 3)
+    for i in range(3):
+        truth = remove_offset(data[i], start_idx[i], end_idx[i], set_between=set_between[i])
+        assert_array_almost_equal(result[i], truth)
+
+
+def test_elastic_correction_records():
+    """Test an elastic correction with coefficients for each record."""
+    load = np.abs(_records().m) * units('kN')
+    displacement = _records()
+    coeffs = [[1, 2, 3] * units('mm / kN ** 2'), [0.1, 0.2, 0.3] * units('mm / kN'),
+              0 * units('mm')]
+
+    result = elastic_correction(load, displacement, coeffs)
+
+    for i in range(3):
+        truth = elastic_correction(load[i], displacement[i],
+                                   [c[i] if np.ndim(c.m) else c for c in coeffs])
+        assert_array_almost_equal(result[i], truth)
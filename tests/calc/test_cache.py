@@ -0,0 +1,139 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+"""Test the disk cache of calculation results."""
+
+import os
+
+import numpy as np
+import pytest
+
+from pylook.calc import clear_cache, decimate_for_display, memoize, zero
+from pylook.testing import assert_array_almost_equal
+from pylook.units import units
+
+
+@pytest.fixture
+def counted(tmp_path):
+    """Make a cached function that counts how often it really runs."""
+    calls = []
+
+    @memoize(directory=tmp_path)
+    def scale(values, factor=2, out=None):
+        calls.append(factor)
+        return values * factor
+
+    return scale, calls
+
+
+def _files(directory):
+    """List the files in the cache directory."""
+    return sorted(os.listdir(directory))
+
+
+def test_memoize_reuses_result(counted, tmp_path):
+    """Test that the same arguments give the cached result without running again."""
+    scale, calls = counted
+    data = np.arange(10.) * units('mm')
+    first = scale(data)
+    second = scale(data, 2)
+    assert calls == [2]
+    assert_array_almost_equal(second, first, 12)
+    assert second.units == units('mm')
+    assert isinstance(second.magnitude, np.memmap)
+
+
+def test_memoize_key_includes_everything(counted):
+    """Test that changing the data, units, or parameters runs the calculation again."""
+    scale, calls = counted
+    data = np.arange(10.)
+    scale(data * units('mm'))
+    scale(data * units('m'))
+    scale(data * units('mm'), factor=3)
+    changed = data.copy()
+    changed[5] += 1e-12
+    scale(changed * units('mm'))
+    scale(data[::2] * units('mm'))
+    assert len(calls) == 5
+
+
+def test_memoize_key_includes_code(tmp_path):
+    """Test that functions with the same name but different code or closures differ."""
+    data = np.arange(3.)
+    double = memoize(lambda x: x * 2, directory=tmp_path)
+    shift = memoize(lambda x: x + 100, directory=tmp_path)
+
+    def scaler(factor):
+        return memoize(lambda x: x * factor, directory=tmp_path)
+
+    np.testing.assert_array_equal(double(data), [0, 2, 4])
+    np.testing.assert_array_equal(shift(data), [100, 101, 102])
+    np.testing.assert_array_equal(scaler(3)(data), [0, 3, 6])
+    np.testing.assert_array_equal(scaler(4)(data), [0, 4, 8])
+    np.testing.assert_array_equal(memoize(lambda x: x * 2, directory=tmp_path)(data),
+                                  [0, 2, 4])
+    assert len([name for name in _files(tmp_path) if name.endswith('.json')]) == 4
+
+
+def test_memoize_skips_out(counted):
+    """Test that calls writing into their arguments are not cached."""
+    scale, calls = counted
+    data = np.arange(10.)
+    scale(data, out=np.empty(10))
+    scale(data, out=np.empty(10))
+    assert len(calls) == 2
+
+
+def test_memoize_copy_on_write(tmp_path):
+    """Test that changing a cached result in memory leaves the cache unchanged."""
+    cached = memoize(zero, directory=tmp_path)
+    data = np.linspace(1, 2, 20) * units('MPa')
+    cached(data, 5)
+    cached(data, 5).magnitude[:] = 0
+    assert_array_almost_equal(cached(data, 5), zero(data, 5), 12)
+
+
+def test_memoize_tuple_and_scalar(tmp_path):
+    """Test caching results that are tuples or plain numbers."""
+    cached = memoize(decimate_for_display, directory=tmp_path)
+    x = np.arange(1000.) * units('s')
+    y = np.sin(np.arange(1000.)) * units('MPa')
+    expected = decimate_for_display(x, y, 100)
+    cached(x, y, 100)
+    result = cached(x, y, 100)
+    assert isinstance(result, tuple)
+    for actual, wanted in zip(result, expected):
+        assert_array_almost_equal(actual, wanted, 12)
+
+    total = memoize(lambda values: float(values.sum()), directory=tmp_path)
+    assert total(np.ones(4)) == 4.
+    assert total(np.ones(4)) == 4.
+
+
+def test_memoize_uncacheable_result(tmp_path):
+    """Test that results that cannot be saved are returned and not cached."""
+    cached = memoize(lambda values: {'sum': values.sum()}, directory=tmp_path)
+    assert cached(np.ones(3)) == {'sum': 3}
+    assert _files(tmp_path) == []
+
+
+def test_memoize_evicts_least_recently_used(tmp_path):
+    """Test that the oldest results are removed once the cache is full."""
+    cached = memoize(lambda values: values * 2, directory=tmp_path, max_bytes=20000)
+    arrays = [np.full(1000, float(i)) for i in range(3)]
+    cached(arrays[0])
+    cached(arrays[1])
+    os.utime(tmp_path / _files(tmp_path)[0], (0, 0))
+    os.utime(tmp_path / _files(tmp_path)[3], (0, 0))
+    cached(arrays[2])
+    assert len([name for name in _files(tmp_path) if name.endswith('.json')]) == 2
+
+
+def test_clear_cache(counted, tmp_path):
+    """Test removing every cached result."""
+    scale, calls = counted
+    scale(np.arange(5.))
+    clear_cache(tmp_path)
+    assert _files(tmp_path) == []
+    scale(np.arange(5.))
+    assert len(calls) == 2
@@ -0,0 +1,72 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Test the `correlation` module."""
+
+import numpy as np
+import pytest
+
+from pylook.calc import estimate_lag, shift
+from pylook.units import units
+
+
+def _records(lag):
+    """Make a random walk and a noisy copy of it delayed by lag samples."""
+    rng = np.random.default_rng(3)
+    walk = np.cumsum(rng.normal(size=20000))
+    a = walk[1000:11000]
+    b = walk[1000 - lag:11000 - lag] + rng.normal(0, 0.1, 10000)
+    return a * units('kN'), b * units('V')
+
+
+@pytest.mark.parametrize('lag', [-137, 0, 452])
+def test_estimate_lag(lag):
+    """Test finding the lag between two records."""
+    a, b = _records(lag)
+
+    assert estimate_lag(a, b, 1000) == pytest.approx(lag, abs=0.5)
+
+
+@pytest.mark.parametrize('lag', [-137, 452])
+def test_estimate_lag_decimated(lag):
+    """Test that the coarse to fine search finds the same lag."""
+    a, b = _records(lag)
+
+    assert round(estimate_lag(a, b, 1000, decimation=16)) == lag
+
+
+@pytest.mark.parametrize('decimation', [4, 64])
+def test_estimate_lag_decimated_refinement(decimation):
+    """Test that the refined lag matches the full resolution search exactly."""
+    a, b = _records(452)
+
+    assert estimate_lag(a, b, 1000, decimation=decimation) == pytest.approx(
+        estimate_lag(a, b, 1000), abs=1e-9)
+
+
+def test_estimate_lag_subsample():
+    """Test that a lag between samples is refined by interpolation."""
+    t = np.arange(2000)
+    a = np.exp(-((t - 1000) / 30) ** 2)
+    b = np.exp(-((t - 1010.4) / 30) ** 2)
+
+    assert estimate_lag(a, b, 100) == pytest.approx(10.4, abs=0.05)
+
+
+def test_shift():
+    """Test that shifting lines up records with views."""
+    a, b = _records(452)
+    data = {'load': a, 'ae': b}
+
+    shifted = shift(data, estimate_lag(a, b, 1000))
+
+    assert np.shares_memory(shifted['ae'].m, b.m)
+    assert len(shifted['load']) == 10000 - 452
+    assert np.abs(shifted['ae'].m[:5000] - a.m[:5000]).max() < 1
+
+
+def test_shift_negative():
+    """Test that a negative shift is an error."""
+    with pytest.raises(ValueError):
+        shift({'a': np.arange(5)}, -2)
@@ -0,0 +1,101 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+"""Test the cumulative operations and their streaming versions."""
+
+import numpy as np
+import pytest
+
+from pylook.calc import (cumsum, cumulative_trapezoid, gradient, running_mean,
+                         StreamingCumsum, StreamingCumulativeTrapezoid, StreamingGradient,
+                         StreamingRunningMean)
+from pylook.testing import assert_array_almost_equal
+from pylook.units import units
+
+
+def _record(n=1000, seed=3):
+    """Make a noisy record with uneven sample times."""
+    rng = np.random.default_rng(seed)
+    time = np.cumsum(rng.uniform(0.5, 1.5, n)) * units('s')
+    return time, (np.sin(time.m / 50) + rng.normal(0, 0.01, n)) * units('MPa')
+
+
+def _stream(streaming, chunk_sizes, *columns):
+    """Run a streaming operation over columns split into chunks of the given sizes."""
+    edges = np.concatenate(([0], np.cumsum(chunk_sizes)))
+    pieces = [streaming.update(*(column[start:stop] for column in columns))
+              for start, stop in zip(edges[:-1], edges[1:])]
+    pieces.append(streaming.finalize())
+    return units.Quantity(np.concatenate([piece.m for piece in pieces]), pieces[0].units)
+
+
+CHUNKINGS = [[1000], [1] * 10 + [990], [333, 333, 334], [2, 0, 500, 1, 497]]
+
+
+def test_cumsum():
+    """Test the cumulative sum against numpy, keeping units."""
+    _, stress = _record()
+    assert_array_almost_equal(cumsum(stress), np.cumsum(stress.m) * units('MPa'), 10)
+    np.testing.assert_array_equal(cumsum(stress.m), np.cumsum(stress.m))
+
+
+def test_cumulative_trapezoid():
+    """Test integrating unevenly and evenly sampled data."""
+    time, stress = _record()
+    areas = 0.5 * (stress.m[1:] + stress.m[:-1]) * np.diff(time.m)
+    expected = np.concatenate(([0], np.cumsum(areas))) * units('MPa * s')
+    assert_array_almost_equal(cumulative_trapezoid(stress, time), expected, 10)
+
+    result = cumulative_trapezoid(np.arange(5.), spacing=2 * units('s'))
+    assert_array_almost_equal(result, np.array([0, 1, 4, 9, 16]) * units('s'), 12)
+
+
+def test_gradient():
+    """Test finite differences against numpy."""
+    time, stress = _record()
+    assert_array_almost_equal(gradient(stress, time),
+                              np.gradient(stress.m, time.m) * units('MPa / s'), 10)
+    np.testing.assert_allclose(gradient(stress.m, spacing=0.5),
+                               np.gradient(stress.m, 0.5), rtol=1e-12)
+    with pytest.raises(ValueError):
+        gradient(np.ones(1))
+
+
+def test_running_mean():
+    """Test the mean of all rows so far."""
+    values = np.array([2., 4., 6., 8.])
+    np.testing.assert_array_equal(running_mean(values), [2, 3, 4, 5])
+
+
+@pytest.mark.parametrize('chunk_sizes', CHUNKINGS)
+def test_streaming_identical(chunk_sizes):
+    """Test that streaming in any chunks gives exactly the in memory results."""
+    time, stress = _record()
+    checks = [(cumsum(stress), StreamingCumsum(), (stress,)),
+              (running_mean(stress), StreamingRunningMean(), (stress,)),
+              (cumulative_trapezoid(stress, time), StreamingCumulativeTrapezoid(),
+               (stress, time)),
+              (cumulative_trapezoid(stress, spacing=0.1 * units('s')),
+               StreamingCumulativeTrapezoid(spacing=0.1 * units('s')), (stress,)),
+              (gradient(stress, time), StreamingGradient(), (stress, time)),
+              (gradient(stress), StreamingGradient(), (stress,))]
+    for expected, streaming, columns in checks:
+        result = _stream(streaming, chunk_sizes, *columns)
+        assert result.units == expected.units
+        np.testing.assert_array_equal(result.m, expected.m)
+
+
+def test_streaming_gradient_lags():
+    """Test that the last row of each chunk is differentiated with the next chunk."""
+    streaming = StreamingGradient()
+    assert len(streaming.update(np.arange(5.))) == 4
+    assert len(streaming.update(np.arange(5., 8.))) == 3
+    np.testing.assert_array_equal(streaming.finalize(), [1.])
+
+
+def test_streaming_reuse():
+    """Test that a streaming operation starts over after finalize."""
+    streaming = StreamingCumsum()
+    first = _stream(streaming, [3, 3], np.ones(6) * units('m'))
+    second = _stream(streaming, [6], np.ones(6) * units('m'))
+    np.testing.assert_array_equal(first.m, second.m)
@@ -0,0 +1,202 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Test the `detection` module."""
+
+import numpy as np
+import pytest
+
+from pylook.calc import (detect_offsets, detect_stick_slip, find_onset, remove_offsets,
+                         segment_experiment)
+from pylook.testing import assert_array_almost_equal
+from pylook.units import units
+
+
+def _reset_record():
+    """Make a steadily increasing record with two transducer resets."""
+    rng = np.random.default_rng(0)
+    data = np.arange(1000.) * 0.5 + rng.normal(0, 0.05, 1000)
+    data[300:] -= 200
+    data[700:] -= 150
+    return data * units('micron')
+
+
+def test_detect_offsets():
+    """Test that resets are found as single row offsets."""
+    result = detect_offsets(_reset_record())
+
+    np.testing.assert_array_equal(result, [[299, 300], [699, 700]])
+
+
+def test_detect_offsets_removed():
+    """Test that the detected offsets can be removed directly."""
+    data = _reset_record()
+
+    result = remove_offsets(data, detect_offsets(data))
+
+    assert np.abs(np.diff(result.m)).max() < 1
+
+
+def test_detect_offsets_threshold_units():
+    """Test giving the threshold with units."""
+    data = _reset_record()
+
+    result = detect_offsets(data, threshold=0.16 * units('mm'))
+
+    np.testing.assert_array_equal(result, [[299, 300]])
+
+
+def test_detect_offsets_max_gap():
+    """Test that nearby jumps are merged into one offset."""
+    data = np.zeros(100)
+    data[40:] = 10
+    data[43:] = 0
+    data[45:] = 20
+
+    result = detect_offsets(data * units('mm'), threshold=1 * units('mm'), max_gap=3)
+
+    np.testing.assert_array_equal(result, [[39, 45]])
+
+
+def test_detect_offsets_none():
+    """Test that a smooth record has no offsets."""
+    data = np.linspace(0, 10, 50) * units('mm')
+
+    result = detect_offsets(data)
+
+    assert_array_almost_equal(result.shape, (0, 2))
+
+
+def _loading_record():
+    """Make a noisy record that is flat and then starts loading at row 420."""
+    rng = np.random.default_rng(1)
+    data = rng.normal(0, 0.01, 2000)
+    data[420:] += np.arange(1580) * 0.002
+    return data * units('MPa')
+
+
+@pytest.mark.parametrize('method', ['slope', 'threshold'])
+def test_find_onset(method):
+    """Test finding the onset of loading."""
+    result = find_onset(_loading_record(), method=method)
+
+    assert abs(result - 420) < 25
+
+
+def test_find_onset_mean():
+    """Test finding a step change with the mean method."""
+    data = np.concatenate((np.zeros(300), np.ones(200))) * units('N')
+
+    assert find_onset(data, method='mean') == 300
+
+
+def test_find_onset_search_range():
+    """Test that the onset is relative to the start of the data when searching a range."""
+    data = np.concatenate((np.ones(50), np.zeros(300), np.ones(200))) * units('N')
+
+    assert find_onset(data, method='mean', start=100) == 350
+
+
+def test_find_onset_bad_method():
+    """Test that an unknown method is an error."""
+    with pytest.raises(ValueError):
+        find_onset(_loading_record(), method='magic')
+
+
+def _protocol_record(scale=1):
+    """Make a hold, a 1 to 10 velocity step, another hold, and a stick-slip section."""
+    n = 2000 * scale
+    rng = np.random.default_rng(1)
+    time = np.arange(n) * 0.1
+    velocity = np.zeros(n)
+    velocity[200 * scale:700 * scale] = 1
+    velocity[700 * scale:1200 * scale] = 10
+    velocity[1500 * scale:] = 1
+    displacement = np.concatenate(([0], np.cumsum(velocity[:-1] * 0.1)))
+    displacement += rng.normal(0, 0.001, n)
+    shear = 1 + rng.normal(0, 1e-4, n)
+    shear[1500 * scale:] += (np.arange(500 * scale) % 100) * 0.001
+    return time * units('s'), displacement * units('micron'), shear * units('MPa')
+
+
+def test_segment_experiment():
+    """Test finding holds, velocity steps, and stick-slip."""
+    time, displacement, shear = _protocol_record()
+
+    segments = segment_experiment(time, displacement, shear=shear)
+
+    assert list(segments['kind']) == ['hold', 'slide', 'slide', 'hold', 'stick-slip']
+    assert_array_almost_equal(segments['start'], [0, 200, 700, 1200, 1500], -1)
+    assert segments['stop'][-1] == 2000
+    assert_array_almost_equal(segments['velocity'], [0, 1, 10, 0, 1], 1)
+
+
+def test_segment_experiment_no_shear():
+    """Test that without shear stress no stick-slip is reported."""
+    time, displacement, _ = _protocol_record()
+
+    segments = segment_experiment(time, displacement)
+
+    assert list(segments['kind']) == ['hold', 'slide', 'slide', 'hold', 'slide']
+    np.testing.assert_array_equal(segments['start'][1:], segments['stop'][:-1])
+
+
+def test_segment_experiment_long_record():
+    """Test that velocities far along a multi-million row record are still labelled."""
+    scale = 1000
+    time, displacement, _ = _protocol_record(scale)
+
+    segments = segment_experiment(time, displacement)
+
+    assert list(segments['kind']) == ['hold', 'slide', 'slide', 'hold', 'slide']
+    np.testing.assert_allclose(segments['start'], np.array([0, 200, 700, 1200, 1500]) * scale,
+                               atol=51)
+    assert_array_almost_equal(segments['velocity'], [0, 1, 10, 0, 1], 3)
+
+
+def _sawtooth_record():
+    """Make a stick-slip record with a stress drop of about 1 MPa every 100 rows."""
+    rng = np.random.default_rng(2)
+    time = np.arange(1000) * 0.01
+    stress = (np.arange(1000) % 100) * 0.01 + rng.normal(0, 1e-4, 1000)
+    return stress * units('MPa'), time * units('s')
+
+
+def test_detect_stick_slip():
+    """Test the stress drop catalog of a sawtooth."""
+    stress, time = _sawtooth_record()
+
+    events = detect_stick_slip(stress, time)
+
+    np.testing.assert_array_equal(events['peak'], np.arange(99, 1000, 100)[:-1])
+    np.testing.assert_array_equal(events['trough'], events['peak'] + 1)
+    assert_array_almost_equal(events['drop'], np.full(9, 0.99), 3)
+    assert_array_almost_equal(events['duration'], np.full(9, 0.01), 6)
+    assert np.isnan(events['recurrence'][0])
+    assert_array_almost_equal(events['recurrence'][1:], np.full(8, 1.), 6)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 100, 333])
+def test_detect_stick_slip_chunked(chunk_size):
+    """Test that processing in chunks finds exactly the same events."""
+    stress, time = _sawtooth_record()
+    threshold = 0.1 * units('MPa')
+
+    truth = detect_stick_slip(stress, time, threshold=threshold)
+    events = detect_stick_slip(stress, time, threshold=threshold, chunk_size=chunk_size)
+
+    assert events.dtype == truth.dtype
+    for name in truth.dtype.names:
+        np.testing.assert_array_equal(events[name], truth[name])
+
+
+def test_detect_stick_slip_min_drop():
+    """Test that small stress drops are left out."""
+    stress, time = _sawtooth_record()
+    stress[500:] *= 0.1
+
+    events = detect_stick_slip(stress, time, threshold=0.05 * units('MPa'),
+                               min_drop=500 * units('kPa'))
+
+    np.testing.assert_array_equal(events['peak'], [99, 199, 299, 399, 499])
@@ -0,0 +1,81 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Test the `display` module."""
+
+import numpy as np
+import pytest
+
+from pylook.calc import decimate_for_display, DisplayPyramid
+from pylook.units import units
+
+
+def _spiky_record(n=100000):
+    """Make a smooth record with a couple of single point spikes."""
+    x = np.arange(n) * 0.01 * units('s')
+    y = np.sin(np.arange(n) / 5000)
+    y[12345] = 5
+    y[67890] = -5
+    return x, y * units('MPa')
+
+
+@pytest.mark.parametrize('method', ['minmax', 'lttb'])
+def test_decimate_keeps_peaks(method):
+    """Test that decimation keeps single point spikes and units."""
+    x, y = _spiky_record()
+
+    x_dec, y_dec = decimate_for_display(x, y, 500, method=method)
+
+    assert len(y_dec) <= 500
+    assert y_dec.units == units('MPa')
+    assert x_dec.units == units('s')
+    assert y_dec.m.max() == 5
+    assert y_dec.m.min() == -5
+    assert np.all(np.diff(x_dec.m) > 0)
+
+
+def test_decimate_short_data():
+    """Test that data shorter than the requested points are returned as is."""
+    x = np.arange(100) * units('s')
+    y = np.ones(100) * units('MPa')
+
+    x_dec, y_dec = decimate_for_display(x, y, 500)
+
+    assert y_dec is y
+
+
+def test_pyramid_full_view():
+    """Test that the full view of a pyramid keeps the peaks with few points."""
+    x, y = _spiky_record()
+    pyramid = DisplayPyramid(x, y)
+
+    x_view, y_view = pyramid.query(n_points=1000)
+
+    assert len(y_view) <= 1000
+    assert y_view.m.max() == 5
+    assert y_view.m.min() == -5
+
+
+def test_pyramid_zoom():
+    """Test that a zoomed in view returns the full resolution data."""
+    x, y = _spiky_record()
+    pyramid = DisplayPyramid(x, y)
+
+    x_view, y_view = pyramid.query(123 * units('s'), 124 * units('s'), n_points=1000)
+
+    np.testing.assert_array_equal(y_view.m, y.m[12300:12401])
+    assert x_view.m[0] == 123
+
+
+def test_pyramid_partial_zoom():
+    """Test a view that needs a coarse level stays inside the requested window."""
+    x, y = _spiky_record()
+    pyramid = DisplayPyramid(x, y)
+
+    x_view, y_view = pyramid.query(100 * units('s'), 200 * units('s'), n_points=300)
+
+    assert len(y_view) <= 300
+    assert x_view.m.min() >= 100
+    assert x_view.m.max() <= 200
+    assert y_view.m.max() == 5
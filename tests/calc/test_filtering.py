@@ -0,0 +1,90 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Test the `filtering` module."""
+
+import numpy as np
+import pytest
+
+from pylook.calc import bandpass, fir_filter, highpass, lowpass, StreamingFilter
+from pylook.testing import assert_array_almost_equal
+from pylook.units import units
+
+
+def _signal():
+    """Make 10 s of a 1 Hz and a 100 Hz sine sampled at 1 kHz on an offset."""
+    time = np.arange(10000) / 1000
+    slow = np.sin(2 * np.pi * time)
+    fast = 0.5 * np.sin(2 * np.pi * 100 * time)
+    return slow, fast
+
+
+def test_lowpass():
+    """Test that a lowpass filter removes the fast sine."""
+    slow, fast = _signal()
+    data = (5 + slow + fast) * units('kN')
+
+    result = lowpass(data, 20 * units('Hz'), 1 * units('kHz'))
+
+    assert result.units == units('kN')
+    assert_array_almost_equal(result[500:-500], (5 + slow[500:-500]) * units('kN'), 3)
+
+
+def test_highpass():
+    """Test that a highpass filter removes the slow sine and the offset."""
+    slow, fast = _signal()
+
+    result = highpass(5 + slow + fast, 50 * units('Hz'), 1000 * units('Hz'))
+
+    assert_array_almost_equal(result[500:-500], fast[500:-500], 3)
+
+
+def test_bandpass():
+    """Test that a bandpass filter keeps only the middle sine."""
+    slow, fast = _signal()
+    middle = np.sin(2 * np.pi * 20 * np.arange(10000) / 1000)
+
+    result = bandpass(slow + middle + fast, 10 * units('Hz'), 40 * units('Hz'),
+                      1 * units('kHz'))
+
+    assert_array_almost_equal(result[500:-500], middle[500:-500], 2)
+
+
+def test_lowpass_chunked_batched():
+    """Test that filtering columns together in small chunks matches filtering each."""
+    slow, fast = _signal()
+    columns = np.stack((slow + fast, 2 * slow - fast))
+    out = np.empty_like(columns)
+
+    result = lowpass(columns, 20 * units('Hz'), 1 * units('kHz'), chunk_size=777, out=out)
+
+    assert result is out
+    for column, filtered in zip(columns, result):
+        assert_array_almost_equal(filtered, lowpass(column, 20 * units('Hz'),
+                                                    1 * units('kHz')), 10)
+
+
+def test_streaming_filter_delay():
+    """Test that streamed output lags by half the filter and catches up on finalize."""
+    taps = fir_filter('lowpass', 20 * units('Hz'), 1 * units('kHz'), numtaps=101)
+    streaming = StreamingFilter(taps)
+
+    first = streaming.update(np.ones(300) * units('V'))
+    rest = streaming.finalize()
+
+    assert len(first) == 250
+    assert len(rest) == 50
+    assert_array_almost_equal(rest, np.ones(50) * units('V'))
+
+
+def test_fir_filter_bad_arguments():
+    """Test the checks on filter design."""
+    with pytest.raises(ValueError):
+        fir_filter('notch', 10 * units('Hz'), 1 * units('kHz'))
+    with pytest.raises(ValueError):
+        fir_filter('lowpass', 600 * units('Hz'), 1 * units('kHz'))
+    with pytest.raises(ValueError):
+        fir_filter('lowpass', 10 * units('Hz'), 1 * units('kHz'), numtaps=100)
+    with pytest.raises(ValueError):
+        fir_filter('bandpass', 10 * units('Hz'), 1 * units('kHz'))
@@ -0,0 +1,78 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Test the `indexing` module."""
+
+import numpy as np
+import pytest
+
+from pylook.calc import TimeIndex
+from pylook.io import read_binary
+from pylook.testing import assert_array_almost_equal, write_look_file
+from pylook.units import units
+
+
+def _data():
+    """Make data sampled at 10 Hz and then 100 Hz, with the rate as the Time column."""
+    rate = np.concatenate((np.full(10, 10.), np.full(100, 100.)))
+    return {'Time': rate * units('Hz'), 'load': np.arange(110.) * units('kN')}
+
+
+def test_time_index_from_rate():
+    """Test building the time from the sample rate."""
+    index = TimeIndex(_data(), rate='Time')
+
+    assert len(index) == 110
+    assert_array_almost_equal(index.time[[0, 9, 10, 109]], [0.1, 1, 1.01, 2] * units('s'), 8)
+
+
+def test_time_index_from_look_file(tmp_path):
+    """Test the sample rate column of a look file, which is labelled in seconds."""
+    path = tmp_path / 'run'
+    rate = np.concatenate((np.full(10, 10.), np.full(100, 100.)))
+    write_look_file(path, ['Time', 'load'], ['second', 'kN'], [rate, np.arange(110.)])
+
+    index = TimeIndex(read_binary(path)[0], rate='Time')
+
+    assert_array_almost_equal(index.time[[0, 9, 10, 109]], [0.1, 1, 1.01, 2] * units('s'), 8)
+
+
+def test_time_index_select():
+    """Test that selecting a window gives views of the columns."""
+    data = _data()
+    index = TimeIndex(data, rate='Time')
+
+    window = index.select(0.95 * units('s'), 1.1 * units('s'))
+
+    assert_array_almost_equal(window['load'], np.arange(9., 20.) * units('kN'))
+    assert_array_almost_equal(window['time'][[0, -1]], [1, 1.1] * units('s'), 8)
+    assert np.shares_memory(window['load'].m, data['load'].m)
+
+
+def test_time_index_bounds_many():
+    """Test looking up many windows at once."""
+    index = TimeIndex(_data(), rate='Time')
+
+    first, stop = index.bounds([0.15, 1.005] * units('s'), [0.35, 1.025] * units('s'))
+
+    np.testing.assert_array_equal(first, [1, 10])
+    np.testing.assert_array_equal(stop, [3, 12])
+
+
+def test_time_index_at():
+    """Test getting the data nearest to times."""
+    data = _data()
+    data['time'] = np.arange(110) * units('ms')
+    index = TimeIndex(data, time='time')
+
+    samples = index.at([0.0123, 0.0127, 1] * units('s'))
+
+    np.testing.assert_array_equal(index.nearest(12 * units('ms')), 12)
+    assert_array_almost_equal(samples['load'], [12, 13, 109] * units('kN'))
+
+
+def test_time_index_needs_one_source():
+    """Test that exactly one of time and rate is required."""
+    with pytest.raises(ValueError):
+        TimeIndex(_data())
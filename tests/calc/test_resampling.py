@@ -0,0 +1,87 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Test the `resampling` module."""
+
+import numpy as np
+import pytest
+
+from pylook.calc import align, resample
+from pylook.testing import assert_array_almost_equal
+from pylook.units import units
+
+
+def _data():
+    """Make unevenly sampled data that is linear in time."""
+    time = np.array([0, 1, 2, 4, 8, 9, 10.]) * units('s')
+    return {'time': time, 'disp': 2 * time.m * units('mm'), 'count': np.arange(7)}
+
+
+def test_resample_linear():
+    """Test linear interpolation of every column."""
+    result = resample(_data(), np.arange(-1, 12, 2) * units('s'), x='time')
+
+    assert_array_almost_equal(result['time'], [np.nan, 1, 3, 5, 7, 9, np.nan] * units('s'))
+    assert_array_almost_equal(result['disp'],
+                              [np.nan, 2, 6, 10, 14, 18, np.nan] * units('mm'))
+    assert_array_almost_equal(result['count'], [np.nan, 1, 2.5, 3.25, 3.75, 5, np.nan])
+
+
+def test_resample_nearest():
+    """Test taking the nearest rows."""
+    result = resample(_data(), [1.4, 6.1, 8.6] * units('s'), x='time', method='nearest')
+
+    assert_array_almost_equal(result['disp'], [2, 16, 18] * units('mm'))
+
+
+def test_resample_block_mean():
+    """Test averaging the rows around each grid point."""
+    grid = [1000, 5000, 9000] * units('ms')
+
+    result = resample(_data(), grid, method='block_mean', x='time')
+
+    assert_array_almost_equal(result['time'], [1, 4, 9] * units('s'))
+    assert_array_almost_equal(result['count'], [1, 3, 5])
+
+
+def test_resample_block_mean_long_record():
+    """Test that block means far along a long record are as accurate as direct means."""
+    n = 2_000_000
+    time = np.arange(n) * 0.01
+    disp = 1e3 + 3 * time + np.random.default_rng(1).normal(0, 0.01, n)
+    grid = np.arange(0.045, time[-1] - 0.1, 0.1)
+
+    result = resample({'time': time * units('s'), 'disp': disp * units('mm')},
+                      grid * units('s'), x='time', method='block_mean')
+
+    for i in np.linspace(0, len(grid) - 1, 50).astype(int):
+        rows = (time >= grid[i] - 0.05) & (time < grid[i] + 0.05)
+        np.testing.assert_allclose(result['disp'].m[i], disp[rows].mean(), rtol=1e-13)
+
+
+def test_resample_rows():
+    """Test that the grid is in rows when no x is given."""
+    result = resample(_data(), [0.5, 3, 5.5])
+
+    assert_array_almost_equal(result['time'], [0.5, 4, 9.5] * units('s'))
+    assert_array_almost_equal(result['count'], [0.5, 3, 5.5])
+
+
+def test_resample_bad_method():
+    """Test that an unknown method is an error."""
+    with pytest.raises(ValueError):
+        resample(_data(), [1] * units('s'), x='time', method='cubic')
+
+
+def test_align():
+    """Test putting two runs on the grid they share."""
+    first = _data()
+    second = {'time': np.linspace(2, 20, 10) * units('s'),
+              'disp': np.linspace(2, 20, 10) * units('mm')}
+
+    grid, (a, b) = align([first, second], 'time')
+
+    assert_array_almost_equal(grid, [2, 4, 6, 8, 10] * units('s'))
+    assert_array_almost_equal(a['disp'], [4, 8, 12, 16, 20] * units('mm'))
+    assert_array_almost_equal(b['disp'], [2, 4, 6, 8, 10] * units('mm'))
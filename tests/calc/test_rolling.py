@@ -0,0 +1,82 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Test the `rolling` module."""
+
+import numpy as np
+import pytest
+
+from pylook.calc import rolling_mean, rolling_slope, rolling_std
+from pylook.testing import assert_array_almost_equal
+from pylook.units import units
+
+
+def _naive(func, data, window):
+    """Calculate a windowed statistic the slow way."""
+    windows = np.lib.stride_tricks.sliding_window_view(data, window)
+    result = np.full(len(data), np.nan)
+    result[window // 2: window // 2 + len(windows)] = func(windows)
+    return result
+
+
+@pytest.mark.parametrize('window', [1, 4, 7])
+def test_rolling_mean(window):
+    """Test the rolling mean against a direct calculation."""
+    data = np.random.default_rng(2).normal(1000, 1, 50)
+
+    result = rolling_mean(data * units('MPa'), window)
+
+    truth = _naive(lambda w: w.mean(axis=-1), data, window) * units('MPa')
+    assert_array_almost_equal(result, truth)
+
+
+@pytest.mark.parametrize('window', [2, 5])
+def test_rolling_std(window):
+    """Test the rolling standard deviation against a direct calculation."""
+    data = np.random.default_rng(3).normal(1e6, 1, 50)
+
+    result = rolling_std(data * units('micron'), window)
+
+    truth = _naive(lambda w: w.std(axis=-1), data, window) * units('micron')
+    assert_array_almost_equal(result, truth, 6)
+
+
+def test_rolling_std_flat():
+    """Test that flat data have a standard deviation of exactly zero."""
+    result = rolling_std(np.full(20, 3.3) * units('mm'), 5)
+
+    assert np.all(result.m[2:-2] == 0)
+
+
+def test_rolling_slope():
+    """Test the rolling slope and its units."""
+    x = np.linspace(0, 10, 101) * units('s')
+    y = (2 * x.m ** 2) * units('mm')
+
+    result = rolling_slope(x, y, 5)
+
+    truth = np.full(101, np.nan)
+    truth[2:-2] = 4 * x.m[2:-2]
+    assert_array_almost_equal(result, truth * units('mm/s'))
+
+
+def test_rolling_long_record():
+    """Test that windows far along a long ramp are as accurate as fitting them directly."""
+    n, window = 2_000_000, 51
+    x = np.arange(n) * 0.01
+    y = 3 * x + 1e3 + np.random.default_rng(4).normal(0, 0.01, n)
+
+    slope = rolling_slope(x * units('s'), y * units('mm'), window).m
+    std = rolling_std(y * units('mm'), window).m
+
+    for i in np.linspace(window // 2, n - window // 2 - 1, 50).astype(int):
+        rows = slice(i - window // 2, i + window // 2 + 1)
+        np.testing.assert_allclose(slope[i], np.polyfit(x[rows], y[rows], 1)[0], rtol=1e-8)
+        np.testing.assert_allclose(std[i], np.std(y[rows]), rtol=1e-8)
+
+
+def test_rolling_bad_window():
+    """Test that a window longer than the data is an error."""
+    with pytest.raises(ValueError):
+        rolling_mean(np.arange(5) * units('mm'), 6)
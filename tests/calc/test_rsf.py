@@ -0,0 +1,101 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Test the `rsf` module."""
+
+import numpy as np
+import pytest
+
+from pylook.calc import rsf
+from pylook.units import units
+
+
+def _velocity_step(n=401):
+    """Make the time and load point velocity of a 1 to 10 micron/s velocity step."""
+    time = np.linspace(0, 40, n) * units('s')
+    velocity = np.where(time.m < 10, 1., 10.) * units('micron/s')
+    return time, velocity
+
+
+@pytest.mark.parametrize('law', ['aging', 'slip'])
+def test_forward_model_steady_state(law):
+    """Test that the model settles at the steady state friction for the new velocity."""
+    time, velocity = _velocity_step()
+
+    friction = rsf.forward_model(time, velocity, 0.01, 0.015, 5 * units('micron'),
+                                 0.01 / units('micron'), law=law)
+
+    assert friction.units == units('dimensionless')
+    assert friction.m[0] == pytest.approx(0.6)
+    assert friction.m[-1] == pytest.approx(0.6 + (0.01 - 0.015) * np.log(10), abs=1e-7)
+    # Direct effect peak right after the step
+    assert friction.m.max() > 0.6
+
+
+def test_forward_model_two_state_variables():
+    """Test the steady state of a model with two state variables."""
+    time, velocity = _velocity_step()
+
+    friction = rsf.forward_model(time, velocity, 0.01, [0.01, 0.005],
+                                 [5, 20] * units('micron'), 0.01 / units('micron'))
+
+    assert friction.m[-1] == pytest.approx(0.6 + (0.01 - 0.015) * np.log(10), abs=1e-6)
+
+
+def test_forward_model_bad_law():
+    """Test that an unknown evolution law is an error."""
+    time, velocity = _velocity_step()
+
+    with pytest.raises(ValueError):
+        rsf.forward_model(time, velocity, 0.01, 0.015, 5 * units('micron'),
+                          0.01 / units('micron'), law='magic')
+
+
+def test_fit_recovers_parameters():
+    """Test that fitting a noisy synthetic velocity step recovers the parameters."""
+    time, velocity = _velocity_step()
+    k = 0.01 / units('micron')
+    friction = rsf.forward_model(time, velocity, 0.01, 0.015, 5 * units('micron'), k)
+    noise = np.random.default_rng(4).normal(0, 1e-5, len(time))
+    friction = friction + noise * units('dimensionless')
+
+    result = rsf.fit(time, velocity, friction, 0.007, 0.01, 10 * units('micron'), k)
+
+    assert result.converged
+    assert result.a == pytest.approx(0.01, rel=1e-2)
+    assert result.b == pytest.approx(0.015, rel=1e-2)
+    assert result.dc.m_as('micron') == pytest.approx(5, rel=2e-2)
+    assert result.rms == pytest.approx(1e-5, rel=0.2)
+
+
+def test_fit_stalled_not_converged():
+    """Test that a fit that cannot improve is not reported as converged."""
+    time = np.linspace(0, 40, 101) * units('s')
+    velocity = np.ones(101) * units('micron/s')
+    noise = np.random.default_rng(5).normal(0, 1e-5, len(time))
+    # At a constant velocity friction stays at steady state whatever the parameters
+    friction = (0.6 + noise) * units('dimensionless')
+
+    result = rsf.fit(time, velocity, friction, 0.007, 0.01, 10 * units('micron'),
+                     0.01 / units('micron'))
+
+    assert not result.converged
+    assert result.a == pytest.approx(0.007)
+
+
+def test_fit_steps():
+    """Test fitting several steps gives the same result as fitting each."""
+    time, velocity = _velocity_step(201)
+    k = 0.01 / units('micron')
+    noise = np.random.default_rng(7).normal(0, 1e-5, len(time)) * units('dimensionless')
+    steps = []
+    for b in (0.012, 0.015):
+        friction = rsf.forward_model(time, velocity, 0.01, b, 5 * units('micron'), k)
+        steps.append((time, velocity, friction + noise))
+
+    results = rsf.fit_steps(steps, 0.009, 0.012, 6 * units('micron'), k, workers=1)
+
+    assert [r.b for r in results] == pytest.approx([0.012, 0.015], rel=1e-2)
+    single = rsf.fit(*steps[1], 0.009, 0.012, 6 * units('micron'), k)
+    assert results[1].b == pytest.approx(single.b)
@@ -0,0 +1,101 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+"""Test the chunked on-disk dataset format."""
+
+import numpy as np
+import pytest
+
+from pylook.io import look_to_chunked, open_chunked, read_binary, write_chunked
+from pylook.testing import assert_array_almost_equal, write_look_file
+from pylook.units import units
+
+
+def _data(n=25, start=0):
+    """Make columns of experiment data."""
+    return {'Time': (np.arange(n) + start) * 0.1 * units('s'),
+            'Shear Stress': np.sin(np.arange(n) + start) * units('MPa'),
+            'rec_num': np.arange(n) + start}
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_write_and_open(tmp_path, compress):
+    """Test that columns read back from disk match what was written."""
+    data = _data()
+    write_chunked(tmp_path / 'run', data, chunk_size=10, metadata={'operator': 'cjm'},
+                  compress=compress)
+    dataset = open_chunked(tmp_path / 'run')
+    assert list(dataset) == ['Time', 'Shear Stress', 'rec_num']
+    assert dataset.n_rows == 25
+    assert dataset.chunk_rows == [10, 10, 5]
+    assert dataset.metadata == {'operator': 'cjm'}
+    assert dataset['Shear Stress'].units == units('MPa')
+    assert dataset['rec_num'].dtype == data['rec_num'].dtype
+    assert_array_almost_equal(dataset['Shear Stress'][:], data['Shear Stress'], 12)
+    np.testing.assert_array_equal(np.asarray(dataset['rec_num']), data['rec_num'])
+
+
+def test_column_indexing(tmp_path):
+    """Test reading single rows and slices within and across chunks."""
+    data = _data()
+    column = write_chunked(tmp_path / 'run', data, chunk_size=10)['Shear Stress']
+    expected = data['Shear Stress']
+    assert len(column) == 25
+    assert column[12] == expected[12]
+    assert column[-1] == expected[-1]
+    for key in [slice(2, 8), slice(5, 22), slice(None, None, 3), slice(20, 3, -4),
+                slice(30, 40)]:
+        assert_array_almost_equal(column[key], expected[key], 12)
+    with pytest.raises(IndexError):
+        column[25]
+
+
+def test_slice_in_chunk_is_memory_mapped(tmp_path):
+    """Test that rows within one chunk are read lazily from the file."""
+    column = write_chunked(tmp_path / 'run', _data(), chunk_size=10)['Time']
+    assert isinstance(column[12:18].magnitude, np.memmap)
+    assert all(isinstance(chunk.magnitude, np.memmap) for chunk in column.chunks())
+
+
+def test_append(tmp_path):
+    """Test adding rows, converting units to those of the dataset."""
+    dataset = write_chunked(tmp_path / 'run', _data(), chunk_size=10)
+    more = _data(8, start=25)
+    more['Shear Stress'] = more['Shear Stress'].to('kPa')
+    dataset.append(more)
+
+    reopened = open_chunked(tmp_path / 'run')
+    assert reopened.chunk_rows == [10, 10, 5, 8]
+    assert_array_almost_equal(reopened['Shear Stress'][:], _data(33)['Shear Stress'], 12)
+    experiment = reopened.read(['Time', 'rec_num'], start=20, stop=30)
+    assert experiment.names == ['Time', 'rec_num']
+    assert_array_almost_equal(experiment['Time'], _data(33)['Time'][20:30], 12)
+    assert experiment['rec_num'].magnitude.dtype == _data()['rec_num'].dtype
+
+
+def test_append_wrong_columns(tmp_path):
+    """Test that appended data must have every column."""
+    dataset = write_chunked(tmp_path / 'run', _data(), chunk_size=10)
+    with pytest.raises(ValueError):
+        dataset.append({'Time': np.arange(3) * units('s')})
+
+
+def test_open_not_dataset(tmp_path):
+    """Test that a directory with some other manifest is rejected."""
+    (tmp_path / 'manifest.json').write_text('{"format": "other"}')
+    with pytest.raises(ValueError):
+        open_chunked(tmp_path)
+
+
+def test_look_to_chunked(tmp_path):
+    """Test converting a look file."""
+    columns = np.arange(30.).reshape(3, 10)
+    write_look_file(tmp_path / 'run.look', ['Time', 'Load', 'Disp'], ['s', 'kN', 'mm'],
+                    columns)
+    dataset = look_to_chunked(tmp_path / 'run.look', tmp_path / 'run', chunk_size=4)
+    data, metadata = read_binary(tmp_path / 'run.look')
+    assert list(dataset) == ['rec_num', 'Time', 'Load', 'Disp']
+    assert dataset['Load'].units == units('kN')
+    assert dataset.metadata['number of records'] == metadata['number of records']
+    for name in data:
+        assert_array_almost_equal(dataset[name][:], data[name], 12)
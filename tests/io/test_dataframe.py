@@ -0,0 +1,67 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+"""Test moving data to and from pandas DataFrames."""
+
+import numpy as np
+
+from pylook.experiment import Experiment
+from pylook.io import from_dataframe, to_dataframe
+from pylook.testing import assert_array_almost_equal
+from pylook.units import units
+
+
+def _data():
+    """Make columns of experiment data."""
+    return {'Time': np.arange(10.) * units('s'),
+            'Shear Stress': np.linspace(0, 5, 10) * units('MPa'),
+            'rec_num': np.arange(10)}
+
+
+def test_to_dataframe_shares_memory():
+    """Test that the DataFrame views the columns and carries their units."""
+    data = _data()
+    df = to_dataframe(data)
+    assert list(df.columns) == ['Time', 'Shear Stress', 'rec_num']
+    assert df.attrs['units'] == {'Time': 'second', 'Shear Stress': 'megapascal',
+                                 'rec_num': 'dimensionless'}
+    for name, column in data.items():
+        assert np.shares_memory(df[name].to_numpy(), getattr(column, 'magnitude', column))
+
+
+def test_to_dataframe_copy():
+    """Test that copying leaves the DataFrame independent of the columns."""
+    data = _data()
+    df = to_dataframe(data, copy=True)
+    assert not np.shares_memory(df['Time'].to_numpy(), data['Time'].magnitude)
+    np.testing.assert_array_equal(df['Time'], data['Time'].magnitude)
+
+
+def test_to_dataframe_experiment():
+    """Test making a DataFrame from an experiment without copying its buffer."""
+    experiment = Experiment(_data(), metadata={'name': 'p655'})
+    df = to_dataframe(experiment)
+    assert np.shares_memory(df['Shear Stress'].to_numpy(), experiment['Shear Stress'].m)
+    assert df['rec_num'].dtype == np.arange(10).dtype
+    assert df.attrs['metadata'] == {'name': 'p655'}
+
+
+def test_round_trip():
+    """Test that data come back from a DataFrame unchanged and without copying."""
+    data = _data()
+    df = to_dataframe(data)
+    result = from_dataframe(df)
+    assert list(result) == list(data)
+    assert_array_almost_equal(result['Shear Stress'], data['Shear Stress'], 12)
+    assert_array_almost_equal(result['rec_num'], data['rec_num'] * units.dimensionless, 12)
+    assert np.shares_memory(result['Time'].magnitude, data['Time'].magnitude)
+
+
+def test_from_dataframe_units():
+    """Test giving units for a DataFrame made elsewhere."""
+    df = to_dataframe(_data())
+    del df.attrs['units']
+    result = from_dataframe(df, units={'Time': 'ms', 'Shear Stress': units('kPa')})
+    assert result['Time'].units == units('ms')
+    assert result['Shear Stress'].units == units('kPa')
+    assert result['rec_num'].units == units.dimensionless
@@ -4,9 +4,71 @@
 
 """Test the `lookfiles` module."""
 
-from pylook.io import (XlookParser)
+import numpy as np
+
+from pylook import Experiment
+from pylook.io import read_binary, XlookParser
+from pylook.testing import assert_array_almost_equal, write_look_file
+from pylook.units import units
 
 
 def test_look_parser_creation():
     """Make sure we can create an empty instance of the look r file parser."""
     XlookParser()
+
+
+def test_look_parser_offset_int_batch(tmp_path):
+    """Test that a run of offset_int commands gives the same result as running each."""
+    data = np.cumsum(np.arange(30.))
+    commands = ['offset_int 0 3 5 n', 'offset_int 0 10 15 y', 'offset_int 0 20 24 y']
+
+    one_at_a_time = XlookParser()
+    one_at_a_time.data[0] = data.copy()
+    for command in commands:
+        one_at_a_time.parse_line(command)
+
+    rfile = tmp_path / 'offsets_r'
+    rfile.write_text('\n# a comment\n'.join(commands) + '\nend\n')
+    batched = XlookParser()
+    batched.data[0] = data.copy()
+    batched.doit(rfile)
+
+    np.testing.assert_array_almost_equal(batched.data[0], one_at_a_time.data[0])
+
+
+def test_look_parser_zero_auto():
+    """Test zeroing at an automatically found onset."""
+    data = np.concatenate((np.full(40, 3.), 5 + np.arange(60.)))
+
+    parser = XlookParser()
+    parser.data[0] = data
+    parser.parse_line('zero 0 auto')
+
+    np.testing.assert_array_almost_equal(parser.data[0][40:], np.arange(60.))
+
+
+def test_look_parser_slope():
+    """Test the running slope command."""
+    parser = XlookParser()
+    parser.data[0] = np.arange(20.)
+    parser.data[1] = 3 * np.arange(20.) + 2
+    parser.parse_line('slope 0 1 5 2 rate mm/s')
+
+    np.testing.assert_array_almost_equal(parser.data[2][2:-2], np.full(16, 3.))
+    assert np.isnan(parser.data[2][:2]).all()
+    assert parser.data_names[2] == 'rate'
+
+
+def test_read_binary_experiment(tmp_path):
+    """Test that a look file is read into an experiment."""
+    path = tmp_path / 'test'
+    columns = [np.arange(5.), np.arange(5.) ** 2]
+    write_look_file(path, ['load', 'disp'], ['kN', 'mm'], columns)
+
+    data, metadata = read_binary(path)
+
+    assert isinstance(data, Experiment)
+    assert list(data) == ['rec_num', 'load', 'disp']
+    assert metadata['number of records'] == 5
+    assert_array_almost_equal(data['disp'], [0, 1, 4, 9, 16] * units('mm'))
+    assert_array_almost_equal(data['rec_num'], np.arange(5.))
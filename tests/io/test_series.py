@@ -0,0 +1,106 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+"""Test opening consecutive look files as one dataset."""
+
+import struct
+
+import numpy as np
+import pytest
+
+from pylook.io import open_series, read_binary
+from pylook.testing import assert_array_almost_equal, write_look_file
+from pylook.units import units
+
+
+@pytest.fixture
+def series(tmp_path):
+    """Write an experiment split across three look files."""
+    load = np.sin(np.arange(25.))
+    disp = np.arange(25.) ** 2
+    filenames = []
+    for i, (start, stop) in enumerate([(0, 10), (10, 20), (20, 25)]):
+        filenames.append(tmp_path / f'p{i}')
+        write_look_file(filenames[-1], ['load', 'disp'], ['kN', 'mm'],
+                        [load[start:stop], disp[start:stop]])
+    return filenames, load, disp
+
+
+def test_open_series(series):
+    """Test that the files are presented as one dataset."""
+    filenames, load, disp = series
+    dataset = open_series(filenames)
+
+    assert list(dataset) == ['rec_num', 'load', 'disp']
+    assert dataset.n_rows == 25
+    assert dataset.chunk_rows == [10, 10, 5]
+    assert dataset.metadata['number of records'] == 25
+    assert dataset['disp'].units == units('mm')
+    assert_array_almost_equal(dataset['load'][:], load * units('kN'), 12)
+    np.testing.assert_array_equal(np.asarray(dataset['disp']), disp)
+    np.testing.assert_array_equal(np.asarray(dataset['rec_num']), np.arange(25.))
+
+
+def test_series_indexing(series):
+    """Test reading rows within and across files."""
+    filenames, load, disp = series
+    column = open_series(filenames)['disp']
+
+    assert column[12].m == disp[12]
+    assert column[-1].m == disp[-1]
+    np.testing.assert_array_equal(column[3:17:4].m, disp[3:17:4])
+    np.testing.assert_array_equal(column[18:5:-3].m, disp[18:5:-3])
+    assert isinstance(column[11:19].m, np.memmap)
+    with pytest.raises(IndexError):
+        column[25]
+
+
+def test_series_read(series):
+    """Test that reading a range of rows matches reading the whole files."""
+    filenames, *_ = series
+    data = open_series(filenames).read(['rec_num', 'load'], 5, 15)
+    first, _ = read_binary(filenames[0])
+    second, _ = read_binary(filenames[1])
+
+    assert list(data) == ['rec_num', 'load']
+    np.testing.assert_array_equal(data['rec_num'].m, np.arange(5., 15.))
+    np.testing.assert_array_equal(data['load'].m,
+                                  np.concatenate((first['load'].m[5:], second['load'].m[:5])))
+
+
+def test_series_float_files(tmp_path):
+    """Test files of big endian 4 byte floats."""
+    filenames = [tmp_path / 'p0', tmp_path / 'p1']
+    write_look_file(filenames[0], ['load'], ['kN'], [np.arange(4.)], bytes_per_point=4)
+    write_look_file(filenames[1], ['load'], ['kN'], [np.arange(4., 7.)], bytes_per_point=4)
+
+    np.testing.assert_array_equal(np.asarray(open_series(filenames)['load']), np.arange(7.))
+
+
+def test_series_mismatched_columns(tmp_path):
+    """Test that files with different columns or units are refused."""
+    filenames = [tmp_path / 'p0', tmp_path / 'p1']
+    write_look_file(filenames[0], ['load', 'disp'], ['kN', 'mm'], np.ones((2, 3)))
+    write_look_file(filenames[1], ['load', 'disp'], ['kN', 'um'], np.ones((2, 3)))
+
+    with pytest.raises(ValueError, match='disp'):
+        open_series(filenames)
+    with pytest.raises(ValueError):
+        open_series([])
+
+
+def test_series_header_layout_mismatch(tmp_path):
+    """Test that headers not matching the layout of the data are refused."""
+    path = tmp_path / 'short'
+    write_look_file(path, ['load', 'disp'], ['kN', 'mm'], np.ones((2, 5)))
+    with open(path, 'r+b') as f:
+        # Number of elements of the second column
+        f.seek(36 + 84 + 80)
+        f.write(struct.pack('>i', 3))
+    with pytest.raises(ValueError, match='disp'):
+        open_series([path])
+
+    path = tmp_path / 'unnamed'
+    write_look_file(path, ['load', 'no_val'], ['kN', ''], np.ones((2, 5)))
+    with pytest.raises(ValueError, match='1 named columns'):
+        open_series([path])
@@ -0,0 +1,227 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Test the `experiment` module."""
+
+import pickle
+
+import numpy as np
+import pytest
+
+from pylook import Experiment
+from pylook.calc import zero
+from pylook.testing import assert_array_almost_equal
+from pylook.units import units
+
+
+def _experiment():
+    """Make an experiment with three columns."""
+    return Experiment({'time': np.arange(10.) * units('s'),
+                       'load': np.linspace(0, 9, 10) * units('kN'),
+                       'disp': np.arange(10.) ** 2 * units('mm')})
+
+
+def test_experiment_dict_api():
+    """Test that an experiment works like a dictionary of quantities."""
+    experiment = _experiment()
+
+    assert list(experiment) == ['time', 'load', 'disp']
+    assert len(experiment) == 3
+    assert experiment.n_rows == 10
+    assert 'load' in experiment
+    assert_array_almost_equal(experiment['disp'][3], 9 * units('mm'))
+
+    disp = experiment.pop('disp')
+    experiment['disp_m'] = disp.to('m')
+
+    assert list(experiment) == ['time', 'load', 'disp_m']
+    assert_array_almost_equal(disp[3], 9 * units('mm'))
+    assert_array_almost_equal(experiment['disp_m'][3], 0.009 * units('m'))
+
+
+def test_experiment_columns_share_buffer():
+    """Test that columns are views of one buffer."""
+    experiment = _experiment()
+
+    time, load = experiment['time'], experiment['load']
+
+    assert np.shares_memory(experiment.to_array(), time.m)
+    assert np.shares_memory(experiment.to_array(), load.m)
+
+
+def test_experiment_assignment_rebinds():
+    """Test that replacing a column leaves earlier views of it alone."""
+    experiment = _experiment()
+    old = experiment['load']
+
+    experiment['load'] = old * 2
+
+    assert_array_almost_equal(old[9], 9 * units('kN'))
+    assert_array_almost_equal(experiment['load'][9], 18 * units('kN'))
+    assert list(experiment) == ['time', 'load', 'disp']
+
+
+def test_experiment_inplace_result_not_copied():
+    """Test that assigning an in place result keeps using the same buffer row."""
+    experiment = _experiment()
+
+    experiment['load'] = zero(experiment['load'], 5, inplace=True)
+
+    assert_array_almost_equal(experiment['load'][0], -5 * units('kN'))
+    assert experiment.to_array().shape == (3, 10)
+
+
+def test_experiment_row_slice_is_view():
+    """Test slicing rows gives an experiment viewing the same buffer."""
+    experiment = _experiment()
+
+    window = experiment[2:5]
+    window['load'].m[:] = 0
+
+    assert window.n_rows == 3
+    assert list(window) == list(experiment)
+    assert_array_almost_equal(experiment['load'][1:6], [1, 0, 0, 0, 5] * units('kN'))
+
+
+def test_experiment_grows():
+    """Test adding many columns."""
+    experiment = Experiment(n_rows=4)
+
+    for i in range(20):
+        experiment[f'c{i}'] = np.full(4, i) * units('m')
+
+    assert len(experiment) == 20
+    assert_array_almost_equal(experiment['c13'], np.full(4, 13) * units('m'))
+
+
+def test_experiment_views_survive_new_columns():
+    """Test that adding columns to a full buffer leaves earlier views attached."""
+    experiment = Experiment.from_buffer(np.arange(10.).reshape(2, 5), ['a', 'b'],
+                                        ['mm', 'mm'])
+    column = experiment['a']
+
+    experiment['c'] = np.ones(5) * units('mm')
+    zero(column, 2, inplace=True)
+
+    assert_array_almost_equal(experiment['a'], [-2, -1, 0, 1, 2] * units('mm'))
+    assert list(experiment) == ['a', 'b', 'c']
+    assert_array_almost_equal(experiment.to_array()[2], np.ones(5))
+
+    experiment['a'] = column
+    assert len(experiment.to_array()) == 3
+
+
+def test_experiment_first_column_sets_rows():
+    """Test that an experiment made without data takes its rows from the first column."""
+    experiment = Experiment()
+    assert experiment.n_rows is None
+
+    experiment['a'] = np.arange(6.) * units('m')
+    experiment['b'] = np.ones(6) * units('s')
+
+    assert experiment.n_rows == 6
+    assert_array_almost_equal(experiment['a'], np.arange(6.) * units('m'))
+    with pytest.raises(ValueError):
+        experiment['c'] = np.ones(3) * units('m')
+
+
+def test_experiment_keeps_dtypes():
+    """Test that columns keep their data type, stored in a buffer of that type."""
+    experiment = _experiment()
+    experiment['rec_num'] = np.arange(10)
+    experiment['flag'] = np.arange(10) % 2 == 0
+    experiment['count'] = np.arange(10, dtype=np.int32)
+    rec_num = experiment['rec_num']
+    for i in range(6):
+        experiment[f'i{i}'] = np.full(10, i)
+
+    assert experiment['rec_num'].m.dtype == np.arange(10).dtype
+    assert experiment['flag'].m.dtype == bool
+    assert experiment['count'].m.dtype == np.int32
+    assert experiment['load'].m.dtype == np.float64
+    assert np.shares_memory(rec_num.m, experiment['rec_num'].m)
+    np.testing.assert_array_equal(experiment['i5'].m, np.full(10, 5))
+    with pytest.raises(TypeError):
+        experiment.to_array()
+
+
+def test_experiment_dtypes_survive_copies():
+    """Test that pickling, copying, compacting, and slicing keep data types."""
+    experiment = _experiment()
+    experiment['rec_num'] = np.arange(10)
+    experiment['speed'] = np.full(10, 2.) * units('mm/s')
+    names = ['time', 'load', 'disp', 'rec_num', 'speed']
+
+    results = [pickle.loads(pickle.dumps(experiment)), experiment.copy(), experiment[:]]
+    experiment.compact()
+    for result in results + [experiment]:
+        assert result.names == names
+        assert result['rec_num'].m.dtype == np.arange(10).dtype
+        assert result['speed'].m.dtype == np.float64
+        np.testing.assert_array_equal(result['rec_num'].m, np.arange(10))
+    assert experiment['time'].m.base is experiment['speed'].m.base
+
+
+def test_experiment_wrong_length():
+    """Test that columns must have the right length."""
+    experiment = _experiment()
+
+    with pytest.raises(ValueError):
+        experiment['short'] = np.arange(3) * units('m')
+
+
+def test_experiment_rename():
+    """Test renaming a column in place."""
+    experiment = _experiment()
+
+    experiment.rename('load', 'force')
+
+    assert list(experiment) == ['time', 'force', 'disp']
+    assert experiment['force'].units == units('kN')
+
+
+def test_experiment_rename_missing():
+    """Test that renaming a missing column fails without changing anything."""
+    experiment = _experiment()
+
+    with pytest.raises(KeyError):
+        experiment.rename('shear', 'force')
+
+    assert list(experiment) == ['time', 'load', 'disp']
+
+
+def test_experiment_rename_existing():
+    """Test that a column cannot be renamed over another one."""
+    experiment = _experiment()
+
+    with pytest.raises(ValueError):
+        experiment.rename('load', 'disp')
+
+    assert list(experiment) == ['time', 'load', 'disp']
+    assert experiment['disp'].units == units('mm')
+
+
+def test_experiment_pickle():
+    """Test that pickling keeps only the columns in use."""
+    experiment = _experiment()
+    del experiment['time']
+    experiment.metadata['name'] = 'p655'
+
+    result = pickle.loads(pickle.dumps(experiment))
+
+    assert list(result) == ['load', 'disp']
+    assert result.to_array().shape == (2, 10)
+    assert result.metadata == {'name': 'p655'}
+    assert_array_almost_equal(result['disp'], experiment['disp'])
+
+
+def test_experiment_compact():
+    """Test that compacting removes the space left by removed columns."""
+    experiment = _experiment()
+    del experiment['load']
+
+    experiment.compact()
+
+    assert experiment.to_array().shape == (2, 10)
+    assert np.shares_memory(experiment.to_array(), experiment['disp'].m)
@@ -0,0 +1,147 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+"""Test the reduction pipeline."""
+
+import numpy as np
+import pytest
+
+import pylook.calc as lc
+from pylook.experiment import Experiment
+from pylook.pipeline import Pipeline
+from pylook.testing import assert_array_almost_equal
+from pylook.units import units
+
+
+def _raw_data(seed=0, n=200):
+    """Make columns of uncalibrated data."""
+    rng = np.random.default_rng(seed)
+    return {'Vert_Load': rng.normal(500, 50, n) * units.dimensionless,
+            'Hor_Load': rng.normal(1000, 10, n) * units.dimensionless,
+            'Vert_Disp': np.cumsum(rng.normal(1, 0.1, n)) * units.dimensionless}
+
+
+def _reduction():
+    """Record a short reduction like that of the p655 example."""
+    return (Pipeline()
+            .scale('Vert_Load', 2e-3 * units('MPa'))
+            .scale('Hor_Load', 3e-3 * units('MPa'))
+            .scale('Vert_Disp', 0.1 * units('micron'), output='Shear Displacement')
+            .rename('Vert_Load', 'Shear Stress')
+            .rename('Hor_Load', 'Normal Stress')
+            .add('remove_offset', 'Shear Stress', 50, 60, set_between=True)
+            .add('zero', 'Shear Stress', 20, mode='before')
+            .add(lc.elastic_correction, ['Normal Stress', 'Shear Displacement'],
+                 [0.5 * units('micron / MPa'), 0 * units('micron')],
+                 output='Shear Displacement')
+            .add('friction', ['Shear Stress', 'Normal Stress'], output='Friction'))
+
+
+def _reduce_by_hand(data):
+    """Run the same reduction as `_reduction` one call at a time."""
+    data = dict(data)
+    data['Shear Stress'] = data.pop('Vert_Load') * 2e-3 * units('MPa')
+    data['Normal Stress'] = data.pop('Hor_Load') * 3e-3 * units('MPa')
+    data['Shear Displacement'] = data['Vert_Disp'] * 0.1 * units('micron')
+    data['Shear Stress'] = lc.remove_offset(data['Shear Stress'], 50, 60, set_between=True)
+    data['Shear Stress'] = lc.zero(data['Shear Stress'], 20, mode='before')
+    data['Shear Displacement'] = lc.elastic_correction(
+        data['Normal Stress'], data['Shear Displacement'],
+        [0.5 * units('micron / MPa'), 0 * units('micron')])
+    data['Friction'] = lc.friction(data['Shear Stress'], data['Normal Stress'])
+    return data
+
+
+def _assert_same_columns(actual, expected):
+    """Check two sets of columns match."""
+    assert sorted(actual) == sorted(expected)
+    for name in expected:
+        assert_array_almost_equal(actual[name], expected[name], 12)
+
+
+def test_run_matches_manual_reduction():
+    """Test that replaying the steps gives the same result as calling them directly."""
+    data = _raw_data()
+    _assert_same_columns(_reduction().run(data), _reduce_by_hand(data))
+
+
+def test_run_leaves_input_unmodified():
+    """Test that running a pipeline does not write to the given columns."""
+    data = _raw_data()
+    original = {name: column.m.copy() for name, column in data.items()}
+    _reduction().run(data)
+    for name, column in data.items():
+        np.testing.assert_array_equal(column.m, original[name])
+
+
+def test_run_experiment():
+    """Test running a pipeline on an experiment container."""
+    data = _raw_data()
+    experiment = Experiment(data)
+    buffer = experiment.to_array().copy()
+    _assert_same_columns(_reduction().run(experiment), _reduce_by_hand(data))
+    np.testing.assert_array_equal(experiment.to_array(), buffer)
+
+
+def test_plan_reuses_created_columns():
+    """Test that only steps on columns made by earlier steps reuse their arrays."""
+    assert _reduction().plan() == [False, False, False, False, False, True, True, True,
+                                   False]
+
+
+def test_run_writes_into_created_column():
+    """Test that chained steps on one column write into the same array."""
+    seen = []
+
+    def record(values):
+        seen.append(values.m)
+        return values
+
+    reduction = (Pipeline()
+                 .scale('Vert_Load', 2e-3 * units('MPa'))
+                 .add(record, 'Vert_Load')
+                 .add('zero', 'Vert_Load', 20)
+                 .add(record, 'Vert_Load'))
+    reduction.run(_raw_data())
+    assert seen[0] is seen[1]
+
+
+def test_run_does_not_reuse_shared_column():
+    """Test that an array viewed by another column is not written to."""
+    reduction = (Pipeline()
+                 .scale('Vert_Load', 2e-3 * units('MPa'))
+                 .add(lambda values: values[:], 'Vert_Load', output='View')
+                 .add('zero', 'Vert_Load', 20))
+    result = reduction.run(_raw_data())
+    assert result['View'][20] != 0
+    assert result['Vert_Load'][20] == 0
+
+
+def test_add_unknown_name():
+    """Test that an unknown function name is caught when recording."""
+    with pytest.raises(ValueError):
+        Pipeline().add('not_a_function', 'Vert_Load')
+
+
+def test_copy_steps():
+    """Test that a pipeline can start from the steps of another."""
+    reduction = _reduction()
+    copy = Pipeline(reduction.steps).add('zero', 'Friction', 0)
+    assert len(copy) == len(reduction) + 1
+    assert copy.steps[:-1] == reduction.steps
+
+
+def test_repr():
+    """Test the listing of the steps."""
+    text = repr(Pipeline().rename('a', 'b').add('zero', 'b', 20, mode='before'))
+    assert text == "Pipeline([\n  rename 'a' -> 'b'\n  'b' = zero('b', 20, mode='before')\n])"
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_run_many(workers):
+    """Test reducing several experiments, serially and in parallel."""
+    datasets = [_raw_data(seed) for seed in range(3)]
+    results = _reduction().run_many(datasets, workers=workers)
+    assert len(results) == 3
+    for result, data in zip(results, datasets):
+        _assert_same_columns(result, _reduce_by_hand(data))
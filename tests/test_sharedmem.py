@@ -0,0 +1,103 @@
+# Copyright (c) 2020 Leeman Geophysical LLC.
+# Distributed under the terms of the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+"""Test handing experiment data to other processes through shared memory."""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from pylook.experiment import Experiment
+from pylook.sharedmem import attach, share
+from pylook.testing import assert_array_almost_equal
+from pylook.units import units
+
+
+def _data():
+    """Make columns of experiment data with mixed types."""
+    return {'Time': np.arange(100.) * units('s'),
+            'Shear Stress': np.linspace(0, 5, 100) * units('MPa'),
+            'rec_num': np.arange(100, dtype=np.int32)}
+
+
+def _mean_stress(descriptor):
+    """Average a column of shared data in a worker process."""
+    with attach(descriptor) as shared:
+        return float(shared.data['Shear Stress'].magnitude.mean())
+
+
+def _double_stress(descriptor):
+    """Write to a column of shared data in a worker process."""
+    with attach(descriptor) as shared:
+        column = shared.data['Shear Stress'].magnitude
+        column *= 2
+        del column
+
+
+def test_share_dict():
+    """Test that attached columns match the originals and view the shared block."""
+    data = _data()
+    with share(data) as shared:
+        with attach(shared.descriptor) as attached:
+            for name, column in data.items():
+                assert_array_almost_equal(attached.data[name], column, 12)
+            assert attached.data['rec_num'].dtype == np.int32
+            assert attached.data['Shear Stress'].units == units('MPa')
+
+
+def test_share_experiment():
+    """Test that an experiment comes back as an experiment with its metadata."""
+    experiment = Experiment(_data(), metadata={'name': 'p655'})
+    with share(experiment) as shared, attach(shared.descriptor) as attached:
+        assert isinstance(attached.data, Experiment)
+        assert attached.data.names == experiment.names
+        assert attached.data.metadata == {'name': 'p655'}
+        assert_array_almost_equal(attached.data['Time'], experiment['Time'], 12)
+        assert attached.data['rec_num'].magnitude.dtype == np.int32
+        np.testing.assert_array_equal(attached.data['rec_num'].magnitude, np.arange(100))
+
+
+def test_writes_are_shared():
+    """Test that writes in one view are seen in the other."""
+    with share(_data()) as shared, attach(shared.descriptor) as attached:
+        attached.data['Time'].magnitude[0] = -1
+        assert shared.data['Time'][0] == -1 * units('s')
+
+
+def test_worker_processes():
+    """Test reading and writing shared columns in worker processes."""
+    data = _data()
+    with share(data) as shared:
+        with ProcessPoolExecutor(2) as executor:
+            means = list(executor.map(_mean_stress, [shared.descriptor] * 3))
+            assert means == pytest.approx([data['Shear Stress'].m.mean()] * 3)
+            executor.submit(_double_stress, shared.descriptor).result()
+        assert_array_almost_equal(shared.data['Shear Stress'], 2 * data['Shear Stress'], 12)
+
+
+def test_close_in_use():
+    """Test that a block with columns still in use cannot be closed."""
+    shared = share(_data())
+    column = shared.data['Time']
+    with pytest.raises(BufferError):
+        shared.close()
+
+    # The block is still open and shared after the failed close
+    with attach(shared.descriptor) as attached:
+        assert_array_almost_equal(attached.data['Time'], shared.data['Time'], 12)
+    del column
+    shared.close()
+    assert shared.data is None
+    with pytest.raises(FileNotFoundError):
+        attach(shared.descriptor)
+
+
+def test_close_frees_block():
+    """Test that closing the owner frees the block and closing again is harmless."""
+    shared = share(_data())
+    descriptor = shared.descriptor
+    shared.close()
+    shared.close()
+    with pytest.raises(FileNotFoundError):
+        attach(descriptor)